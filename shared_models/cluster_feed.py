@@ -0,0 +1,60 @@
+"""
+Mobile cluster feed formatting shared by the API and the pipeline.
+
+The API renders /api/clusters live from these helpers, and the pipeline uses
+the same ones to pre-render snapshot files (see snapshots.py), so both paths
+produce identical payloads.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# Category names served by /api/categories
+CATEGORIES = ['سياسة', 'أمن وعسكر', 'اقتصاد', 'رياضة', 'مجتمع وثقافة', 'مقالات رأي']
+
+# Default page size of /api/clusters
+DEFAULT_FEED_LIMIT = 50
+
+def get_cards_for_clusters(cluster_repo, clusters) -> Dict[int, Dict[str, Any]]:
+    """Stored cards for the given clusters, computing any the pipeline has not written yet."""
+    cluster_ids = list(dict.fromkeys(cluster.id for cluster in clusters))
+    return cluster_repo.get_cluster_cards(cluster_ids, build_missing=True)
+
+def format_cluster_card(cluster, card: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a cluster and its card as a mobile API list item."""
+    # format as "Country/City"
+    country = card.get('top_country')
+    city = card.get('top_city')
+    if country and city:
+        location = f"{country}/{city}"
+    else:
+        location = country or city or ''
+
+    return {
+        'id': cluster.id,
+        'headline': cluster.title,
+        'description': card.get('description') or '',
+        'image_url': card.get('image_url') or '',
+        'country_city': location,
+        'first_date_of_publication': card.get('first_published_at') or '',
+        'number_of_sources': cluster.number_of_sources,
+        'bias_distribution': card.get('bias_distribution'),
+        'is_trending': cluster.is_trending
+    }
+
+def format_cluster_feed(cluster_repo, clusters) -> List[Dict[str, Any]]:
+    """Mobile list items for clusters, skipping clusters without articles"""
+    cards = get_cards_for_clusters(cluster_repo, clusters)
+
+    result = []
+    for cluster in clusters:
+        card = cards.get(cluster.id)
+        if not card or not card['article_count']:
+            continue
+        result.append(format_cluster_card(cluster, card))
+    return result
+
+def build_cluster_feed(cluster_repo, limit: int = DEFAULT_FEED_LIMIT, category: str = None,
+                       city: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """First keyset page of the mobile feed for a category/city. Returns (items, next_cursor)."""
+    clusters, next_cursor = cluster_repo.get_clusters_page(category=category, city=city, limit=limit)
+    return format_cluster_feed(cluster_repo, clusters), next_cursor
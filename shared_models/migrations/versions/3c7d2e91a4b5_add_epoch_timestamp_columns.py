@@ -0,0 +1,115 @@
+"""add_epoch_timestamp_columns
+
+Revision ID: 3c7d2e91a4b5
+Revises: 0a220c51a87d
+Create Date: 2026-10-19 10:40:12.318204
+
+"""
+import os
+from datetime import datetime
+from typing import Optional, Sequence, Union
+from zoneinfo import ZoneInfo
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7d2e91a4b5'
+down_revision: Union[str, Sequence[str], None] = '0a220c51a87d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, [(string column, epoch column), ...]); the first parseable source wins
+TIMESTAMP_COLUMNS = [
+    ('articles', [('published_at', 'published_ts'), ('created_at', 'created_ts')]),
+    ('clusters', [('published_at', 'published_ts'), ('created_at', 'created_ts')]),
+    ('user_tokens', [('updated_at', 'updated_ts'), ('created_at', 'updated_ts')]),
+]
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _to_epoch(value) -> Optional[int]:
+    """Snapshot of timezone_utils.to_epoch at the time of this migration."""
+    if value is None or value == '':
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            from dateutil import parser
+            dt = parser.parse(str(value))
+        except Exception:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=ZoneInfo(os.getenv('APP_TIMEZONE', 'Africa/Khartoum')))
+    return int(dt.timestamp())
+
+
+def _backfill(bind, table_name: str, columns) -> None:
+    """Fill the epoch columns of existing rows in id-ordered chunks."""
+    sources = [src for src, _ in columns]
+    targets = sorted({dst for _, dst in columns})
+    table = sa.table(table_name, sa.column('id', sa.Integer),
+                     *[sa.column(name, sa.String) for name in sources],
+                     *[sa.column(name, sa.Integer) for name in targets])
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, *[table.c[name] for name in sources])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id).limit(BACKFILL_CHUNK_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+
+        params = []
+        for row in rows:
+            values = dict.fromkeys(targets)
+            for src, dst in columns:
+                if values[dst] is None:
+                    values[dst] = _to_epoch(row[src])
+            params.append({'row_id': row['id'], **{f'v_{name}': value for name, value in values.items()}})
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id'))
+            .values({name: sa.bindparam(f'v_{name}') for name in targets}),
+            params
+        )
+        last_id = rows[-1]['id']
+
+
+def upgrade() -> None:
+    """Upgrade schema - add indexed epoch columns alongside the ISO string timestamps and backfill them."""
+    op.add_column('articles', sa.Column('published_ts', sa.Integer(), nullable=True))
+    op.add_column('articles', sa.Column('created_ts', sa.Integer(), nullable=True))
+    op.create_index('ix_articles_published_ts', 'articles', ['published_ts'])
+    op.create_index('ix_articles_created_ts', 'articles', ['created_ts'])
+
+    op.add_column('clusters', sa.Column('published_ts', sa.Integer(), nullable=True))
+    op.add_column('clusters', sa.Column('created_ts', sa.Integer(), nullable=True))
+    op.create_index('ix_clusters_published_ts', 'clusters', ['published_ts'])
+    op.create_index('ix_clusters_created_ts', 'clusters', ['created_ts'])
+
+    op.add_column('user_tokens', sa.Column('updated_ts', sa.Integer(), nullable=True))
+    op.create_index('ix_user_tokens_updated_ts', 'user_tokens', ['updated_ts'])
+
+    bind = op.get_bind()
+    for table_name, columns in TIMESTAMP_COLUMNS:
+        _backfill(bind, table_name, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema - remove epoch timestamp columns."""
+    op.drop_index('ix_user_tokens_updated_ts', table_name='user_tokens')
+    op.drop_column('user_tokens', 'updated_ts')
+
+    op.drop_index('ix_clusters_created_ts', table_name='clusters')
+    op.drop_index('ix_clusters_published_ts', table_name='clusters')
+    op.drop_column('clusters', 'created_ts')
+    op.drop_column('clusters', 'published_ts')
+
+    op.drop_index('ix_articles_created_ts', table_name='articles')
+    op.drop_index('ix_articles_published_ts', table_name='articles')
+    op.drop_column('articles', 'created_ts')
+    op.drop_column('articles', 'published_ts')
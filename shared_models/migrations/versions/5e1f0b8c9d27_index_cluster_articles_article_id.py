@@ -0,0 +1,28 @@
+"""index_cluster_articles_article_id
+
+Revision ID: 5e1f0b8c9d27
+Revises: 3c7d2e91a4b5
+Create Date: 2026-10-19 11:05:47.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1f0b8c9d27'
+down_revision: Union[str, Sequence[str], None] = '3c7d2e91a4b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - index cluster_articles.article_id for the unclustered anti-join."""
+    op.create_index('ix_cluster_articles_article_id', 'cluster_articles', ['article_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop cluster_articles.article_id index."""
+    op.drop_index('ix_cluster_articles_article_id', table_name='cluster_articles')
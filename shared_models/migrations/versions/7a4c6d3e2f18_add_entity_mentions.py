@@ -0,0 +1,111 @@
+"""add_entity_mentions
+
+Revision ID: 7a4c6d3e2f18
+Revises: 5e1f0b8c9d27
+Create Date: 2026-10-19 11:32:05.518840
+
+"""
+import json
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4c6d3e2f18'
+down_revision: Union[str, Sequence[str], None] = '5e1f0b8c9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MENTION_TYPES = (
+    'people', 'cities', 'regions', 'countries', 'organizations',
+    'political_parties_and_militias', 'brands', 'job_titles'
+)
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _normalize(value: str) -> str:
+    """Snapshot of text_utils.normalize_entity_value at the time of this migration."""
+    value = re.sub(r'[\u064B-\u065F\u0670]', '', value)
+    value = re.sub(r'[أإآ]', 'ا', value)
+    value = re.sub(r'ة', 'ه', value)
+    value = re.sub(r'ى', 'ي', value)
+    return ' '.join(value.lower().split())
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    return value if isinstance(value, list) else []
+
+
+def upgrade() -> None:
+    """Upgrade schema - add entity_mentions inverted index and backfill it from entities."""
+    op.create_table(
+        'entity_mentions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('article_id', sa.Integer(), nullable=True),
+        sa.Column('entity_type', sa.String(), nullable=True),
+        sa.Column('normalized_value', sa.String(), nullable=True),
+        sa.Column('display_value', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_entity_mentions_article_id', 'entity_mentions', ['article_id'])
+    op.create_index('ix_entity_mentions_type_value', 'entity_mentions', ['entity_type', 'normalized_value'])
+    op.create_index('ix_entities_article_id', 'entities', ['article_id'])
+    op.create_index('ix_entities_category', 'entities', ['category'])
+
+    # Backfill from the JSON-as-text columns in id-ordered chunks
+    bind = op.get_bind()
+    entities = sa.table('entities', sa.column('id', sa.Integer), sa.column('article_id', sa.Integer),
+                        *[sa.column(name, sa.Text) for name in MENTION_TYPES])
+    mentions = sa.table('entity_mentions', sa.column('article_id', sa.Integer),
+                        sa.column('entity_type', sa.String), sa.column('normalized_value', sa.String),
+                        sa.column('display_value', sa.String))
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(entities).where(entities.c.id > last_id)
+            .order_by(entities.c.id).limit(BACKFILL_CHUNK_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+
+        batch = []
+        for row in rows:
+            for entity_type in MENTION_TYPES:
+                seen = set()
+                for value in _as_list(row[entity_type]):
+                    if not isinstance(value, str):
+                        continue
+                    normalized = _normalize(value)
+                    if not normalized or normalized in seen:
+                        continue
+                    seen.add(normalized)
+                    batch.append({
+                        'article_id': row['article_id'],
+                        'entity_type': entity_type,
+                        'normalized_value': normalized,
+                        'display_value': value.strip()
+                    })
+        if batch:
+            bind.execute(mentions.insert(), batch)
+        last_id = rows[-1]['id']
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop entity_mentions and the entities indexes."""
+    op.drop_index('ix_entities_category', table_name='entities')
+    op.drop_index('ix_entities_article_id', table_name='entities')
+    op.drop_index('ix_entity_mentions_type_value', table_name='entity_mentions')
+    op.drop_index('ix_entity_mentions_article_id', table_name='entity_mentions')
+    op.drop_table('entity_mentions')
@@ -0,0 +1,48 @@
+"""add_cluster_cards
+
+Revision ID: 9b2e5f7a1c43
+Revises: 7a4c6d3e2f18
+Create Date: 2026-10-19 12:02:31.774506
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2e5f7a1c43'
+down_revision: Union[str, Sequence[str], None] = '7a4c6d3e2f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add denormalized cluster_cards table.
+
+    Populate it for existing clusters with:
+        python src/run_pipeline.py refresh-cards
+    """
+    op.create_table(
+        'cluster_cards',
+        sa.Column('cluster_id', sa.Integer(), nullable=False),
+        sa.Column('article_count', sa.Integer(), nullable=True),
+        sa.Column('first_article_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('image_url', sa.String(), nullable=True),
+        sa.Column('first_published_at', sa.String(), nullable=True),
+        sa.Column('nlp_category', sa.String(), nullable=True),
+        sa.Column('category_label', sa.String(), nullable=True),
+        sa.Column('top_city', sa.String(), nullable=True),
+        sa.Column('top_country', sa.String(), nullable=True),
+        sa.Column('bias_distribution', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ),
+        sa.PrimaryKeyConstraint('cluster_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop cluster_cards table."""
+    op.drop_table('cluster_cards')
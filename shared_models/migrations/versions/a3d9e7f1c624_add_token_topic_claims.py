@@ -0,0 +1,29 @@
+"""add_token_topic_claims
+
+Revision ID: a3d9e7f1c624
+Revises: f6a1c3e5b207
+Create Date: 2026-10-19 22:41:37.915204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9e7f1c624'
+down_revision: Union[str, Sequence[str], None] = 'f6a1c3e5b207'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add user_tokens.topics_claimed_ts so workers can claim topic sync batches."""
+    op.add_column('user_tokens', sa.Column('topics_claimed_ts', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop user_tokens.topics_claimed_ts, requeueing claimed tokens."""
+    op.execute(sa.text("UPDATE user_tokens SET topics_dirty = 1 WHERE topics_dirty = 2"))
+    op.drop_column('user_tokens', 'topics_claimed_ts')
@@ -0,0 +1,47 @@
+"""add_notification_jobs
+
+Revision ID: a7d1e4b8c320
+Revises: f2c6a9d4e751
+Create Date: 2026-10-19 18:37:52.114608
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d1e4b8c320'
+down_revision: Union[str, Sequence[str], None] = 'f2c6a9d4e751'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add notification_jobs queue."""
+    op.create_table(
+        'notification_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('job_type', sa.String(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('success', sa.Integer(), nullable=True),
+        sa.Column('failure', sa.Integer(), nullable=True),
+        sa.Column('pruned', sa.Integer(), nullable=True),
+        sa.Column('batches_done', sa.Integer(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.String(), nullable=True),
+        sa.Column('started_at', sa.String(), nullable=True),
+        sa.Column('finished_at', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_jobs_status', 'notification_jobs', ['status'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop notification_jobs."""
+    op.drop_index('ix_notification_jobs_status', table_name='notification_jobs')
+    op.drop_table('notification_jobs')
@@ -0,0 +1,38 @@
+"""add_token_topics
+
+Revision ID: b3e8f1c5a964
+Revises: a7d1e4b8c320
+Create Date: 2026-10-19 19:45:08.263517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f1c5a964'
+down_revision: Union[str, Sequence[str], None] = 'a7d1e4b8c320'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add FCM topic subscription columns to user_tokens.
+
+    Existing tokens start dirty, so the notification worker subscribes them
+    to their topics in bulk after the upgrade.
+    """
+    op.add_column('user_tokens', sa.Column('topics', sa.Text(), nullable=True))
+    op.add_column('user_tokens', sa.Column('subscribed_topics', sa.Text(), nullable=True))
+    op.add_column('user_tokens', sa.Column('topics_dirty', sa.Integer(), nullable=True, server_default='1'))
+    op.create_index('ix_user_tokens_topics_dirty', 'user_tokens', ['topics_dirty'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - remove FCM topic subscription columns."""
+    op.drop_index('ix_user_tokens_topics_dirty', table_name='user_tokens')
+    op.drop_column('user_tokens', 'topics_dirty')
+    op.drop_column('user_tokens', 'subscribed_topics')
+    op.drop_column('user_tokens', 'topics')
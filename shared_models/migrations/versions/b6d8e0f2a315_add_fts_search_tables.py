@@ -0,0 +1,84 @@
+"""add_fts_search_tables
+
+Revision ID: b6d8e0f2a315
+Revises: 9b2e5f7a1c43
+Create Date: 2026-10-19 12:41:09.036127
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d8e0f2a315'
+down_revision: Union[str, Sequence[str], None] = '9b2e5f7a1c43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (search table, source table, [(search column, source column), ...])
+SEARCH_SOURCES = [
+    ('cluster_search', 'clusters', [('title', 'title')]),
+    ('article_search', 'articles', [('headline', 'headline'), ('description', 'description')]),
+]
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _normalize_arabic(text: str) -> str:
+    """Snapshot of text_utils.normalize_arabic, which the index is queried with."""
+    if not text:
+        return ""
+    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
+    text = re.sub(r'[أإآ]', 'ا', text)
+    text = re.sub(r'ة', 'ه', text)
+    text = re.sub(r'ى', 'ي', text)
+    return text
+
+
+def _backfill(bind, search_table: str, source_table: str, columns) -> None:
+    """Index existing rows in id-ordered chunks, folded as SearchRepository folds them."""
+    source = sa.table(source_table, sa.column('id', sa.Integer),
+                      *[sa.column(src, sa.String) for _, src in columns])
+    insert = sa.text(
+        f"INSERT OR REPLACE INTO {search_table} (rowid, {', '.join(dst for dst, _ in columns)}) "
+        f"VALUES (:row_id, {', '.join(':' + dst for dst, _ in columns)})"
+    )
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(source.c.id, *[source.c[src] for _, src in columns])
+            .where(source.c.id > last_id)
+            .order_by(source.c.id).limit(BACKFILL_CHUNK_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+        bind.execute(insert, [
+            {'row_id': row['id'], **{dst: _normalize_arabic(row[src] or '') for dst, src in columns}}
+            for row in rows
+        ])
+        last_id = rows[-1]['id']
+    bind.execute(sa.text(f"INSERT INTO {search_table} ({search_table}) VALUES ('optimize')"))
+
+
+def upgrade() -> None:
+    """Upgrade schema - add SQLite FTS5 tables for cluster and article search, indexing existing rows."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS cluster_search USING fts5("
+               "title, tokenize='unicode61 remove_diacritics 2')")
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS article_search USING fts5("
+               "headline, description, tokenize='unicode61 remove_diacritics 2')")
+    for search_table, source_table, columns in SEARCH_SOURCES:
+        _backfill(bind, search_table, source_table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop the FTS5 search tables."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE IF EXISTS article_search")
+    op.execute("DROP TABLE IF EXISTS cluster_search")
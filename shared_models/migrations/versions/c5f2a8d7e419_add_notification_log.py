@@ -0,0 +1,40 @@
+"""add_notification_log
+
+Revision ID: c5f2a8d7e419
+Revises: b3e8f1c5a964
+Create Date: 2026-10-19 20:12:41.583270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f2a8d7e419'
+down_revision: Union[str, Sequence[str], None] = 'b3e8f1c5a964'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add notification_log of sent cluster notifications."""
+    op.create_table(
+        'notification_log',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('cluster_id', sa.Integer(), nullable=False),
+        sa.Column('notification_type', sa.String(), nullable=False),
+        sa.Column('article_count', sa.Integer(), nullable=True),
+        sa.Column('sent_at', sa.String(), nullable=True),
+        sa.Column('sent_ts', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_log_cluster_type', 'notification_log',
+                    ['cluster_id', 'notification_type'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop notification_log."""
+    op.drop_index('ix_notification_log_cluster_type', table_name='notification_log')
+    op.drop_table('notification_log')
@@ -0,0 +1,30 @@
+"""add_cluster_published_velocity
+
+Revision ID: c8e2b4f6a913
+Revises: a3d9e7f1c624
+Create Date: 2026-10-19 23:36:51.274093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2b4f6a913'
+down_revision: Union[str, Sequence[str], None] = 'a3d9e7f1c624'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add clusters.published_velocity, the coverage velocity clients were last sent."""
+    op.add_column('clusters', sa.Column('published_velocity', sa.Float(), nullable=True))
+    # Until now coverage_velocity was only written when the cluster was re-published
+    op.execute(sa.text("UPDATE clusters SET published_velocity = coverage_velocity"))
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop clusters.published_velocity."""
+    op.drop_column('clusters', 'published_velocity')
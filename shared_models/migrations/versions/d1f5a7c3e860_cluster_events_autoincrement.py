@@ -0,0 +1,40 @@
+"""cluster_events_autoincrement
+
+Revision ID: d1f5a7c3e860
+Revises: c8e2b4f6a913
+Create Date: 2026-10-19 23:58:20.613742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f5a7c3e860'
+down_revision: Union[str, Sequence[str], None] = 'c8e2b4f6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_autoincrement(bind) -> bool:
+    sql = bind.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'cluster_events'"
+    )).scalar()
+    return 'AUTOINCREMENT' in (sql or '').upper()
+
+
+def upgrade() -> None:
+    """Upgrade schema - rebuild cluster_events with AUTOINCREMENT so SQLite never reuses an event id."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or _has_autoincrement(bind):
+        return
+    # Copying the rows seeds sqlite_sequence with the current highest id
+    with op.batch_alter_table('cluster_events', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}):
+        pass
+
+
+def downgrade() -> None:
+    """Downgrade schema - nothing to undo; AUTOINCREMENT ids are valid plain ids."""
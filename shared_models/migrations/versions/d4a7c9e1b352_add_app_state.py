@@ -0,0 +1,34 @@
+"""add_app_state
+
+Revision ID: d4a7c9e1b352
+Revises: b6d8e0f2a315
+Create Date: 2026-10-19 14:11:05.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c9e1b352'
+down_revision: Union[str, Sequence[str], None] = 'b6d8e0f2a315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add app_state key/value table."""
+    op.create_table(
+        'app_state',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop app_state table."""
+    op.drop_table('app_state')
@@ -0,0 +1,77 @@
+"""add_token_interests
+
+Revision ID: d9a3b6e1f482
+Revises: c5f2a8d7e419
+Create Date: 2026-10-19 20:48:17.902614
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a3b6e1f482'
+down_revision: Union[str, Sequence[str], None] = 'c5f2a8d7e419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return None
+    return value if isinstance(value, list) else None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add token_interests inverted index and backfill category interests."""
+    op.add_column('user_tokens', sa.Column('cities', sa.Text(), nullable=True))
+    op.create_table(
+        'token_interests',
+        sa.Column('token_id', sa.Integer(), nullable=False),
+        sa.Column('interest_type', sa.String(), nullable=False),
+        sa.Column('value', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['token_id'], ['user_tokens.id'], ),
+        sa.PrimaryKeyConstraint('token_id', 'interest_type', 'value')
+    )
+    op.create_index('ix_token_interests_type_value', 'token_interests', ['interest_type', 'value', 'token_id'])
+
+    # Existing tokens follow the categories they chose, or all of them ('*')
+    bind = op.get_bind()
+    tokens = sa.table('user_tokens', sa.column('id', sa.Integer), sa.column('topics', sa.Text))
+    interests = sa.table('token_interests', sa.column('token_id', sa.Integer),
+                         sa.column('interest_type', sa.String), sa.column('value', sa.String))
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(tokens).where(tokens.c.id > last_id)
+            .order_by(tokens.c.id).limit(BACKFILL_CHUNK_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+
+        batch = []
+        for row in rows:
+            topics = _as_list(row['topics'])
+            for value in ['*'] if topics is None else sorted(set(topics)):
+                batch.append({'token_id': row['id'], 'interest_type': 'category', 'value': value})
+        if batch:
+            bind.execute(interests.insert(), batch)
+        last_id = rows[-1]['id']
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop token_interests."""
+    op.drop_index('ix_token_interests_type_value', table_name='token_interests')
+    op.drop_table('token_interests')
+    op.drop_column('user_tokens', 'cities')
@@ -0,0 +1,37 @@
+"""unique_user_token
+
+Revision ID: e4c7f0a2b896
+Revises: d9a3b6e1f482
+Create Date: 2026-10-19 21:26:43.371905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c7f0a2b896'
+down_revision: Union[str, Sequence[str], None] = 'd9a3b6e1f482'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - make user_tokens.token unique so registrations can upsert on it.
+
+    Duplicate registrations of a token are collapsed to the newest row first.
+    """
+    stale_ids = (
+        "SELECT id FROM user_tokens WHERE token IS NOT NULL AND id NOT IN "
+        "(SELECT MAX(id) FROM user_tokens WHERE token IS NOT NULL GROUP BY token)"
+    )
+    op.execute(sa.text(f"DELETE FROM token_interests WHERE token_id IN ({stale_ids})"))
+    op.execute(sa.text(f"DELETE FROM user_tokens WHERE id IN ({stale_ids})"))
+    op.create_index('ix_user_tokens_token', 'user_tokens', ['token'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop the unique token index."""
+    op.drop_index('ix_user_tokens_token', table_name='user_tokens')
@@ -0,0 +1,48 @@
+"""add_cluster_change_tracking
+
+Revision ID: e8b3f5a2d619
+Revises: d4a7c9e1b352
+Create Date: 2026-10-19 16:02:41.907315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f5a2d619'
+down_revision: Union[str, Sequence[str], None] = 'd4a7c9e1b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add cluster change sequence, updated_at and tombstones.
+
+    Existing clusters keep a NULL change_seq; clients start syncing from the
+    current sequence, so only changes made after the upgrade are reported.
+    """
+    op.add_column('clusters', sa.Column('change_seq', sa.Integer(), nullable=True))
+    op.add_column('clusters', sa.Column('updated_at', sa.String(), nullable=True))
+    op.create_index('ix_clusters_change_seq', 'clusters', ['change_seq'])
+
+    op.create_table(
+        'cluster_tombstones',
+        sa.Column('cluster_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('cluster_id')
+    )
+    op.create_index('ix_cluster_tombstones_change_seq', 'cluster_tombstones', ['change_seq'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - remove cluster change tracking."""
+    op.drop_index('ix_cluster_tombstones_change_seq', table_name='cluster_tombstones')
+    op.drop_table('cluster_tombstones')
+
+    op.drop_index('ix_clusters_change_seq', table_name='clusters')
+    op.drop_column('clusters', 'updated_at')
+    op.drop_column('clusters', 'change_seq')
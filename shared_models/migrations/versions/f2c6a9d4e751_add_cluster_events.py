@@ -0,0 +1,42 @@
+"""add_cluster_events
+
+Revision ID: f2c6a9d4e751
+Revises: e8b3f5a2d619
+Create Date: 2026-10-19 17:24:13.580926
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a9d4e751'
+down_revision: Union[str, Sequence[str], None] = 'e8b3f5a2d619'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add cluster_events change log."""
+    op.create_table(
+        'cluster_events',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('event_type', sa.String(), nullable=True),
+        sa.Column('cluster_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.String(), nullable=True),
+        sa.Column('created_ts', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_cluster_events_cluster_id', 'cluster_events', ['cluster_id'])
+    op.create_index('ix_cluster_events_created_ts', 'cluster_events', ['created_ts'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop cluster_events."""
+    op.drop_index('ix_cluster_events_created_ts', table_name='cluster_events')
+    op.drop_index('ix_cluster_events_cluster_id', table_name='cluster_events')
+    op.drop_table('cluster_events')
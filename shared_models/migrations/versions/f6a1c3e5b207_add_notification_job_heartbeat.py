@@ -0,0 +1,29 @@
+"""add_notification_job_heartbeat
+
+Revision ID: f6a1c3e5b207
+Revises: e4c7f0a2b896
+Create Date: 2026-10-19 22:14:08.502716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a1c3e5b207'
+down_revision: Union[str, Sequence[str], None] = 'e4c7f0a2b896'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add notification_jobs.heartbeat_at, bumped as a running job makes progress."""
+    op.add_column('notification_jobs', sa.Column('heartbeat_at', sa.String(), nullable=True))
+    op.execute(sa.text("UPDATE notification_jobs SET heartbeat_at = started_at WHERE status = 'running'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema - drop notification_jobs.heartbeat_at."""
+    op.drop_column('notification_jobs', 'heartbeat_at')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Table, Index, DDL, event
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.types import TypeDecorator
 import json
@@ -9,6 +9,8 @@ Base = declarative_base()
 class JSONType(TypeDecorator):
     """Custom JSON type that works with both PostgreSQL and SQLite"""
     impl = Text
+    # Stateless, so safe to include in SQLAlchemy's statement cache keys
+    cache_ok = True
 
     def process_bind_param(self, value: Any, dialect) -> str:
         if value is None:
@@ -37,7 +39,9 @@ cluster_articles = Table(
     Base.metadata,
     Column('cluster_id', Integer, ForeignKey('clusters.id'), primary_key=True),
     Column('article_id', Integer, ForeignKey('articles.id'), primary_key=True),
-    Column('similarity_score', Float)
+    Column('similarity_score', Float),
+    # The composite primary key leads with cluster_id; lookups by article need their own index
+    Index('ix_cluster_articles_article_id', 'article_id')
 )
 
 class Source(Base):
@@ -70,6 +74,10 @@ class Article(Base):
     category = Column(String)  # 'local' or 'international'
     content_hash = Column(String, unique=True)  # Hash of headline + description for deduplication
 
+    # Epoch seconds (UTC) mirrors of the string timestamps, used for range filters and ordering
+    published_ts = Column(Integer, index=True)
+    created_ts = Column(Integer, index=True)
+
     # Relationships
     source = relationship("Source", back_populates="articles")
     clusters = relationship("Cluster", secondary=cluster_articles, back_populates="articles")
@@ -88,6 +96,10 @@ class Cluster(Base):
     published_at = Column(String)
     created_at = Column(String)
 
+    # Epoch seconds (UTC) mirrors of the string timestamps, used for range filters and ordering
+    published_ts = Column(Integer, index=True)
+    created_ts = Column(Integer, index=True)
+
     # New columns for Blindspot and Trending features
     blindspot_type = Column(String)
     bias_coverage_pro = Column(Integer, default=0)
@@ -96,11 +108,17 @@ class Cluster(Base):
     bias_balance_score = Column(Float, default=0.0)
     
     coverage_velocity = Column(Float, default=0.0)
+    published_velocity = Column(Float)  # coverage_velocity when the cluster was last re-published
     is_trending = Column(Integer, default=0) # Boolean in SQLite is usually 0/1
     first_seen_at = Column(String)
     last_coverage_check = Column(String)
     coverage_history = Column(JSONType, default=dict)
 
+    # Delta sync: position in the cluster change sequence, stamped by
+    # ClusterRepository.mark_changed whenever the pipeline modifies the cluster
+    change_seq = Column(Integer, index=True)
+    updated_at = Column(String)
+
     # Relationships
     articles = relationship("Article", secondary=cluster_articles, back_populates="clusters")
 
@@ -114,11 +132,50 @@ class Cluster(Base):
         )
         session.execute(stmt)
 
+class ClusterTombstone(Base):
+    """Deleted cluster ids, kept so delta-sync clients can drop them"""
+    __tablename__ = 'cluster_tombstones'
+
+    cluster_id = Column(Integer, primary_key=True)
+    change_seq = Column(Integer, index=True)
+    deleted_at = Column(String)
+
+class ClusterEvent(Base):
+    """Append-only change log the pipeline writes and the API streams to clients (/api/stream)"""
+    __tablename__ = 'cluster_events'
+    # SQLite would otherwise reuse the id of a deleted newest row, and streams resuming
+    # after that id would skip the event that reused it
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Doubles as the SSE event id
+    event_type = Column(String)  # 'cluster_created' or 'trending_changed'
+    cluster_id = Column(Integer, index=True)
+    payload = Column(JSONType, default=dict)
+    created_at = Column(String)
+    created_ts = Column(Integer, index=True)
+
+class ClusterCard(Base):
+    """Denormalized list-view summary of a cluster, refreshed by the pipeline when membership changes"""
+    __tablename__ = 'cluster_cards'
+
+    cluster_id = Column(Integer, ForeignKey('clusters.id'), primary_key=True)
+    article_count = Column(Integer, default=0)
+    first_article_id = Column(Integer)
+    description = Column(Text)  # First article's description
+    image_url = Column(String)  # First article's image
+    first_published_at = Column(String)  # Earliest article publication time (ISO)
+    nlp_category = Column(String)  # Dominant NLP category among the articles
+    category_label = Column(String)  # nlp_category, or local/international label as fallback
+    top_city = Column(String)
+    top_country = Column(String)
+    bias_distribution = Column(JSONType)
+    updated_at = Column(String)
+
 class Entity(Base):
     __tablename__ = 'entities'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    article_id = Column(Integer, ForeignKey('articles.id'))
+    article_id = Column(Integer, ForeignKey('articles.id'), index=True)
     people = Column(JSONType, default=list)
     cities = Column(JSONType, default=list)
     regions = Column(JSONType, default=list)
@@ -127,12 +184,25 @@ class Entity(Base):
     political_parties_and_militias = Column(JSONType, default=list)
     brands = Column(JSONType, default=list)
     job_titles = Column(JSONType, default=list)
-    category = Column(String)  # NLP category like 'سياسة'
+    category = Column(String, index=True)  # NLP category like 'سياسة'
     created_at = Column(String)
 
     # Relationship
     article = relationship("Article", back_populates="entities")
 
+class EntityMention(Base):
+    """One row per (article, entity type, entity value): an inverted index over Entity's JSON lists"""
+    __tablename__ = 'entity_mentions'
+    __table_args__ = (
+        Index('ix_entity_mentions_type_value', 'entity_type', 'normalized_value'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    article_id = Column(Integer, ForeignKey('articles.id'), index=True)
+    entity_type = Column(String)  # Entity list column name, e.g. 'cities' or 'people'
+    normalized_value = Column(String)  # Folded with text_utils.normalize_entity_value
+    display_value = Column(String)  # Value as extracted by the NLP stage
+
 class User(Base):
     __tablename__ = 'users'
 
@@ -150,10 +220,93 @@ class UserToken(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     device_id = Column(String)
-    token = Column(String)
+    token = Column(String, unique=True, index=True)  # Registrations upsert on this
     platform = Column(String)  # 'android' or 'ios'
     created_at = Column(String)
     updated_at = Column(String)
+    updated_ts = Column(Integer, index=True)  # Epoch seconds (UTC) of the last registration
+
+    # Categories the device asked for (NULL = all of them), indexed in token_interests;
+    # the FCM topics it is subscribed to, and whether that still needs reconciling
+    topics = Column(JSONType)
+    subscribed_topics = Column(JSONType)
+    topics_dirty = Column(Integer, default=1, index=True)  # 0 synced, 1 queued, 2 claimed by a worker
+    topics_claimed_ts = Column(Integer)  # Epoch seconds a worker claimed the token for syncing
+    # Cities the device follows, as registered; indexed in token_interests
+    cities = Column(JSONType)
 
     # Relationship
     user = relationship("User", back_populates="tokens")
+
+class TokenInterest(Base):
+    """One row per (token, interest): inverted index from a category or city to the tokens following it"""
+    __tablename__ = 'token_interests'
+    __table_args__ = (
+        Index('ix_token_interests_type_value', 'interest_type', 'value', 'token_id'),
+    )
+
+    token_id = Column(Integer, ForeignKey('user_tokens.id'), primary_key=True)
+    interest_type = Column(String, primary_key=True)  # 'category' or 'city'
+    value = Column(String, primary_key=True)  # Category slug ('*' = all categories) or normalized city
+
+class NotificationJob(Base):
+    """Queued push notification send, processed by the API's background sender"""
+    __tablename__ = 'notification_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_type = Column(String)  # 'broadcast', 'new_cluster' or 'popular_clusters'
+    payload = Column(JSONType, default=dict)
+    status = Column(String, index=True)  # queued, running, done, failed
+
+    # Progress counters, updated as each FCM batch completes
+    total = Column(Integer, default=0)  # Recipients across all sends of the job
+    success = Column(Integer, default=0)
+    failure = Column(Integer, default=0)
+    pruned = Column(Integer, default=0)
+    batches_done = Column(Integer, default=0)
+
+    result = Column(JSONType)
+    error = Column(Text)
+    created_at = Column(String)
+    started_at = Column(String)
+    heartbeat_at = Column(String)  # Last progress from the worker running the job
+    finished_at = Column(String)
+
+class NotificationLog(Base):
+    """Last notification sent per cluster and type, so repeat runs only notify real news"""
+    __tablename__ = 'notification_log'
+    __table_args__ = (
+        Index('ix_notification_log_cluster_type', 'cluster_id', 'notification_type', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cluster_id = Column(Integer, nullable=False)
+    notification_type = Column(String, nullable=False)  # e.g. 'popular_cluster'
+    article_count = Column(Integer, default=0)  # Cluster size when last sent
+    sent_at = Column(String)
+    sent_ts = Column(Integer)
+
+class AppState(Base):
+    """Small key/value counters shared by the pipeline and the API, e.g. the data version"""
+    __tablename__ = 'app_state'
+
+    key = Column(String, primary_key=True)
+    value = Column(Integer, default=0)
+    updated_at = Column(String)
+
+# Full-text search tables (SQLite FTS5). Not ORM-mapped: rows are keyed by
+# rowid = cluster/article id and hold text already folded by normalize_arabic.
+# See repositories/search_repository.py.
+SEARCH_TABLES = {
+    'cluster_search': ('title',),
+    'article_search': ('headline', 'description'),
+}
+
+for _table_name, _columns in SEARCH_TABLES.items():
+    event.listen(Base.metadata, 'after_create', DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {_table_name} USING fts5("
+        f"{', '.join(_columns)}, tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect='sqlite'))
+    event.listen(Base.metadata, 'before_drop', DDL(
+        f"DROP TABLE IF EXISTS {_table_name}"
+    ).execute_if(dialect='sqlite'))
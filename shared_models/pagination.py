@@ -0,0 +1,31 @@
+"""
+Opaque cursor tokens for keyset pagination.
+
+A cursor is the sort key of the last row a client has seen, serialized as
+URL-safe base64 JSON so clients treat it as an opaque string.
+"""
+
+import base64
+import json
+from typing import Any, Tuple
+
+def encode_cursor(*values: Any) -> str:
+    """Encode sort-key values into an opaque URL-safe token"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[Any, ...]:
+    """
+    Decode a token produced by encode_cursor.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return tuple(values)
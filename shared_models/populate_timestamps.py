@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Script to populate epoch timestamp columns for existing rows in the database.
+
+This script should be run after the *_ts columns have been added. It walks
+each table in primary-key order and commits one chunk at a time, so it can run
+while the API and pipeline are live without holding a long write lock.
+
+Usage:
+    python populate_timestamps.py [--chunk-size 1000] [--pause 0.05]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select, update, bindparam, or_
+from shared_models.db import get_session
+from shared_models.models import Article, Cluster, UserToken
+from shared_models.timezone_utils import to_epoch
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (model, [(string column, epoch column), ...])
+TIMESTAMP_COLUMNS = [
+    (Article, [('published_at', 'published_ts'), ('created_at', 'created_ts')]),
+    (Cluster, [('published_at', 'published_ts'), ('created_at', 'created_ts')]),
+    (UserToken, [('updated_at', 'updated_ts'), ('created_at', 'updated_ts')]),
+]
+
+def populate_table(session, model, columns, chunk_size: int = 1000, pause: float = 0.0) -> int:
+    """Backfill epoch columns for one table in id-ordered chunks. Returns rows updated."""
+    source_names = [src for src, _ in columns]
+    target_names = sorted({dst for _, dst in columns})
+    table = model.__table__
+
+    missing = [table.c[name].is_(None) for name in target_names]
+    select_columns = [table.c.id] + [table.c[name] for name in source_names]
+
+    last_id = 0
+    updated = 0
+    while True:
+        rows = session.execute(
+            select(*select_columns)
+            .where(table.c.id > last_id)
+            .where(or_(*missing))
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+
+        params = []
+        for row in rows:
+            values = {}
+            for src, dst in columns:
+                # First parseable source wins (e.g. updated_at, then created_at)
+                if values.get(dst) is None:
+                    values[dst] = to_epoch(getattr(row, src))
+            params.append({'row_id': row.id, **{f'v_{k}': v for k, v in values.items()}})
+
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam('row_id'))
+            .values({name: bindparam(f'v_{name}') for name in target_names}),
+            params
+        )
+        session.commit()
+
+        updated += len(rows)
+        last_id = rows[-1].id
+        logger.info(f"{table.name}: backfilled {updated} rows (last id {last_id})")
+        if pause:
+            time.sleep(pause)
+
+    return updated
+
+def populate_timestamps(chunk_size: int = 1000, pause: float = 0.0):
+    """Populate epoch timestamp columns for all tables that have them."""
+    logger.info("Starting epoch timestamp population for existing rows...")
+
+    with get_session() as session:
+        for model, columns in TIMESTAMP_COLUMNS:
+            count = populate_table(session, model, columns, chunk_size, pause)
+            logger.info(f"Finished {model.__tablename__}: {count} rows processed")
+
+    logger.info("Timestamp population complete")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backfill epoch timestamp columns')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per committed chunk')
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks')
+    args = parser.parse_args()
+    populate_timestamps(args.chunk_size, args.pause)
@@ -0,0 +1,76 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List
+from ..models import AppState
+from ..timezone_utils import now
+
+# Bumped by the pipeline whenever it changes data the API serves
+DATA_VERSION = 'data_version'
+# Last value handed out to Cluster.change_seq / ClusterTombstone.change_seq
+CLUSTER_CHANGE_SEQ = 'cluster_change_seq'
+# Push tokens deleted after FCM rejected them / for not being refreshed in time,
+# and when the age-based cleanup last ran (epoch seconds)
+TOKENS_PRUNED_INVALID = 'tokens_pruned_invalid'
+TOKENS_PRUNED_EXPIRED = 'tokens_pruned_expired'
+TOKENS_CLEANUP_TS = 'tokens_cleanup_ts'
+# Checksum of the FCM topic list tokens were last subscribed against
+TOPICS_SIGNATURE = 'fcm_topics_signature'
+
+class AppStateRepository:
+    """Named integer counters in the app_state table"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get(self, key: str, default: int = 0) -> int:
+        """Current value of a counter, or default if it was never set"""
+        value = self.session.query(AppState.value).filter(AppState.key == key).scalar()
+        return default if value is None else value
+
+    def get_many(self, keys: List[str]) -> Dict[str, int]:
+        """Current values of several counters; missing counters read as 0"""
+        rows = self.session.query(AppState.key, AppState.value).filter(AppState.key.in_(keys)).all()
+        values = {key: 0 for key in keys}
+        values.update({key: value or 0 for key, value in rows})
+        return values
+
+    def increment(self, key: str, amount: int = 1) -> int:
+        """Atomically add to a counter, creating it if needed. Returns the new value."""
+        result = self.session.execute(
+            update(AppState)
+            .where(AppState.key == key)
+            .values(value=AppState.value + amount, updated_at=now().isoformat())
+        )
+        if result.rowcount == 0:
+            try:
+                with self.session.begin_nested():
+                    self.session.add(AppState(key=key, value=amount, updated_at=now().isoformat()))
+            except IntegrityError:
+                # Another writer created it first; add to theirs
+                return self.increment(key, amount)
+        self.session.flush()
+        return self.get(key)
+
+    def set(self, key: str, value: int):
+        """Overwrite a counter, creating it if needed"""
+        result = self.session.execute(
+            update(AppState)
+            .where(AppState.key == key)
+            .values(value=value, updated_at=now().isoformat())
+        )
+        if result.rowcount == 0:
+            try:
+                with self.session.begin_nested():
+                    self.session.add(AppState(key=key, value=value, updated_at=now().isoformat()))
+            except IntegrityError:
+                return self.set(key, value)
+        self.session.flush()
+
+    def get_data_version(self) -> int:
+        """Version stamp of the data the API serves"""
+        return self.get(DATA_VERSION)
+
+    def bump_data_version(self) -> int:
+        """Mark served data as changed. Returns the new version."""
+        return self.increment(DATA_VERSION)
@@ -1,10 +1,12 @@
 import hashlib
-import re
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, func, or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, desc, func, or_, exists
+from typing import List, Optional, Dict, Any, Iterator
 from datetime import datetime, timedelta
 from ..models import Article, Source, Entity
+from ..timezone_utils import now, to_epoch
+from ..text_utils import normalize_arabic
+from .search_repository import SearchRepository
 
 class ArticleRepository:
     def __init__(self, session: Session):
@@ -12,17 +14,7 @@ class ArticleRepository:
 
     def _normalize_arabic(self, text):
         """Normalize Arabic text by removing diacritics and standardizing characters."""
-        if not text:
-            return ""
-        # Remove diacritics (Tashkeel)
-        text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
-        # Convert أ,إ,آ to ا
-        text = re.sub(r'[أإآ]', 'ا', text)
-        # Convert ة to ه
-        text = re.sub(r'ة', 'ه', text)
-        # Convert ى to ي
-        text = re.sub(r'ى', 'ي', text)
-        return text
+        return normalize_arabic(text)
 
     def _compute_content_hash(self, headline: str, description: str) -> str:
         """Compute SHA-256 hash of normalized headline + description for deduplication."""
@@ -31,16 +23,45 @@ class ArticleRepository:
         content = f"{normalized_headline}|{normalized_description}"
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-    def get_recent_unclustered(self, hours: int = 24) -> List[Article]:
-        """Get articles published in the last N hours that haven't been clustered"""
-        # For testing, be more lenient with time filtering
-        # In production, this would use proper datetime comparison
+    def get_recent_unclustered(self, hours: int = 24, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Stream articles published in the last N hours that haven't been clustered.
+
+        Yields lightweight dicts holding only the fields clustering needs, with the
+        source URL joined in the same query. Rows are fetched through a server-side
+        cursor in batches of ``batch_size`` so memory stays bounded.
+        """
         from ..models import cluster_articles
-        return self.session.query(Article).outerjoin(
-            cluster_articles, Article.id == cluster_articles.c.article_id
+        cutoff_ts = to_epoch(now() - timedelta(hours=hours))
+
+        already_clustered = exists().where(cluster_articles.c.article_id == Article.id)
+
+        query = self.session.query(
+            Article.id,
+            Article.headline,
+            Article.description,
+            Article.published_at,
+            Article.article_url,
+            Article.image_url,
+            Source.url.label('source_url')
+        ).outerjoin(
+            Source, Article.source_id == Source.id
         ).filter(
-            cluster_articles.c.article_id.is_(None)
-        ).all()
+            Article.published_ts >= cutoff_ts,
+            ~already_clustered
+        ).order_by(
+            Article.published_ts, Article.id
+        ).execution_options(stream_results=True).yield_per(batch_size)
+
+        for row in query:
+            yield {
+                'id': row.id,
+                'source': row.source_url or '',
+                'headline': row.headline,
+                'description': row.description or '',
+                'published_at': row.published_at,
+                'article_url': row.article_url,
+                'image_url': row.image_url
+            }
 
     def insert_article(self, source_id: int, headline: str, description: str,
                       published_at: str, article_url: str, image_url: str = None,
@@ -56,20 +77,23 @@ class ArticleRepository:
             return existing_article
 
         # Create new article
-        created_at = datetime.now().isoformat()
+        created = now()
         article = Article(
             source_id=source_id,
             headline=headline,
             description=description,
             published_at=published_at,
+            published_ts=to_epoch(published_at),
             article_url=article_url,
             image_url=image_url,
-            created_at=created_at,
+            created_at=created.isoformat(),
+            created_ts=int(created.timestamp()),
             category=category,
             content_hash=content_hash
         )
         self.session.add(article)
         self.session.flush()  # Get ID without committing
+        SearchRepository(self.session).index_article(article.id, headline, description)
         return article
 
     def get_by_id(self, article_id: int) -> Optional[Article]:
@@ -78,37 +102,54 @@ class ArticleRepository:
 
     def list_by_filters(self, filters: Dict[str, Any], limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """List articles with filters"""
-        query = self.session.query(Article).join(Source)
+        # Lightweight rows with the source name joined in, instead of lazy-loading article.source
+        query = self.session.query(
+            Article.id, Article.headline, Article.description, Article.published_at,
+            Article.article_url, Article.image_url, Article.category,
+            Source.name.label('source_name')
+        ).join(Source, Source.id == Article.source_id)
 
         if 'category' in filters:
             query = query.filter(Article.category == filters['category'])
         if 'date_from' in filters:
-            query = query.filter(Article.published_at >= filters['date_from'])
+            date_from_ts = to_epoch(filters['date_from'])
+            if date_from_ts is not None:
+                query = query.filter(Article.published_ts >= date_from_ts)
         if 'date_to' in filters:
-            query = query.filter(Article.published_at <= filters['date_to'])
+            date_to_ts = to_epoch(filters['date_to'])
+            if date_to_ts is not None:
+                query = query.filter(Article.published_ts <= date_to_ts)
+        order_by = [desc(Article.published_ts), desc(Article.id)]
         if 'keyword' in filters:
-            keyword = f"%{filters['keyword']}%"
-            query = query.filter(
-                or_(
-                    Article.headline.like(keyword),
-                    Article.description.like(keyword)
+            search_repo = SearchRepository(self.session)
+            if search_repo.is_available():
+                # Ranked full-text match on normalized headline and description
+                matches = search_repo.article_matches(filters['keyword'])
+                query = query.join(matches, matches.c.article_id == Article.id)
+                order_by.insert(0, matches.c.rank)
+            else:
+                keyword = f"%{filters['keyword']}%"
+                query = query.filter(
+                    or_(
+                        Article.headline.like(keyword),
+                        Article.description.like(keyword)
+                    )
                 )
-            )
 
-        articles = query.order_by(desc(Article.published_at)).limit(limit).offset(offset).all()
+        rows = query.order_by(*order_by).limit(limit).offset(offset).all()
 
         # Convert to dictionaries for API compatibility
         result = []
-        for article in articles:
+        for row in rows:
             result.append({
-                'id': article.id,
-                'headline': article.headline,
-                'description': article.description,
-                'published_at': article.published_at,
-                'article_url': article.article_url,
-                'image_url': article.image_url,
-                'source_name': article.source.name if article.source else None,
-                'category': article.category
+                'id': row.id,
+                'headline': row.headline,
+                'description': row.description,
+                'published_at': row.published_at,
+                'article_url': row.article_url,
+                'image_url': row.image_url,
+                'source_name': row.source_name,
+                'category': row.category
             })
         return result
 
@@ -128,7 +169,9 @@ class ArticleRepository:
 
     def get_with_entities(self, article_id: int) -> Optional[Dict[str, Any]]:
         """Get article with its entities"""
-        article = self.session.query(Article).filter(Article.id == article_id).first()
+        article = self.session.query(Article).options(
+            joinedload(Article.source)
+        ).filter(Article.id == article_id).first()
         if not article:
             return None
 
@@ -1,10 +1,103 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_, cast, Text, or_
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy import desc, func, and_, or_, case, delete
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import numpy as np
-from ..models import Cluster, Article, cluster_articles, Entity
-from ..timezone_utils import now, format_datetime
+from ..models import Cluster, Article, Source, cluster_articles, Entity, EntityMention, ClusterCard, ClusterTombstone
+from ..timezone_utils import now, format_datetime, to_epoch
+from ..text_utils import normalize_entity_value
+from .search_repository import SearchRepository
+from .event_repository import EventRepository
+from .notification_log_repository import NotificationLogRepository
+from .app_state_repository import AppStateRepository, CLUSTER_CHANGE_SEQ
+from ..pagination import encode_cursor, decode_cursor
+
+# Fields returned by ClusterRepository.get_cluster_details, in response order
+CLUSTER_DETAIL_FIELDS = (
+    'id', 'title', 'number_of_sources', 'published_at', 'created_at', 'articles',
+    'blindspot_type', 'bias_balance_score', 'bias_distribution', 'is_trending', 'coverage_velocity'
+)
+ARTICLE_DETAIL_FIELDS = (
+    'id', 'headline', 'description', 'published_at', 'article_url', 'image_url',
+    'source_id', 'source_name', 'source_url', 'source_bias', 'source_owner',
+    'source_founded_at', 'source_hq_location', 'category', 'similarity_score', 'entities'
+)
+
+# Cluster columns each detail field is built from
+_CLUSTER_FIELD_COLUMNS = {
+    'title': [Cluster.title],
+    'number_of_sources': [Cluster.number_of_sources],
+    'published_at': [Cluster.published_at],
+    'created_at': [Cluster.created_at],
+    'blindspot_type': [Cluster.blindspot_type],
+    'bias_balance_score': [Cluster.bias_balance_score],
+    'bias_distribution': [Cluster.bias_coverage_pro, Cluster.bias_coverage_neutral, Cluster.bias_coverage_oppose],
+    'is_trending': [Cluster.is_trending],
+    'coverage_velocity': [Cluster.coverage_velocity],
+}
+
+# Column selected for each plain article field ('entities' comes from its own query)
+_ARTICLE_FIELD_COLUMNS = {
+    'headline': Article.headline,
+    'description': Article.description,
+    'published_at': Article.published_at,
+    'article_url': Article.article_url,
+    'image_url': Article.image_url,
+    'source_id': Source.id,
+    'source_name': Source.name,
+    'source_url': Source.url,
+    'source_bias': Source.bias,
+    'source_owner': Source.owner,
+    'source_founded_at': Source.founded_at,
+    'source_hq_location': Source.hq_location,
+    'category': Article.category,
+    'similarity_score': cluster_articles.c.similarity_score,
+}
+
+def parse_detail_fields(fields: Optional[List[str]]) -> Tuple[set, set]:
+    """
+    Split a detail field selection into cluster fields and article fields.
+
+    ``None`` selects everything. ``articles`` selects every article field and
+    ``articles.<field>`` individual ones; ids are always included. Raises
+    ValueError for unknown names.
+    """
+    if fields is None:
+        return set(CLUSTER_DETAIL_FIELDS), set(ARTICLE_DETAIL_FIELDS)
+
+    cluster_fields, article_fields = {'id'}, set()
+    for field in fields:
+        name, _, sub = field.partition('.')
+        if name == 'articles' and sub:
+            if sub not in ARTICLE_DETAIL_FIELDS:
+                raise ValueError(f'Unknown article field: {sub}')
+            article_fields.add(sub)
+        elif name in CLUSTER_DETAIL_FIELDS and not sub:
+            if name == 'articles':
+                article_fields.update(ARTICLE_DETAIL_FIELDS)
+        else:
+            raise ValueError(f'Unknown field: {field}')
+        cluster_fields.add(name)
+    if article_fields:
+        article_fields.add('id')
+    return cluster_fields, article_fields
+
+# coverage_velocity is recomputed and stored on every pipeline run; a cluster
+# whose trending flag is unchanged is only re-published (new change_seq) once
+# its velocity has moved by more than this fraction of published_velocity, the
+# value at the last re-publish, and by at least VELOCITY_MIN_CHANGE
+VELOCITY_CHANGE_TOLERANCE = 0.25
+VELOCITY_MIN_CHANGE = 0.5
+
+# UI category slugs mapped to NLP categories
+CATEGORY_MAPPING = {
+    'politics': 'سياسة',
+    'economy': 'اقتصاد',
+    'sports': 'رياضة',
+    'security': 'أمن وعسكر',
+    'culture': 'مجتمع وثقافة',
+    'opinion': 'مقالات رأي'
+}
 
 class ClusterRepository:
     def __init__(self, session: Session):
@@ -19,7 +112,7 @@ class ClusterRepository:
 
         # Get active clusters within time window
         active_clusters = self.session.query(Cluster).filter(
-            Cluster.created_at >= cutoff_time.isoformat()
+            Cluster.created_ts >= to_epoch(cutoff_time)
         ).all()
 
         best_cluster = None
@@ -48,138 +141,534 @@ class ClusterRepository:
     def create_cluster(self, title: str, number_of_sources: int,
                       published_at: str) -> Cluster:
         """Create a new cluster"""
-        created_at = now().isoformat()
+        created = now()
         cluster = Cluster(
             title=title,
             number_of_sources=number_of_sources,
             published_at=published_at,
-            created_at=created_at
+            published_ts=to_epoch(published_at),
+            created_at=created.isoformat(),
+            created_ts=int(created.timestamp())
         )
         self.session.add(cluster)
         self.session.flush()
+        SearchRepository(self.session).index_cluster(cluster.id, title)
+        self.mark_changed([cluster])
         return cluster
 
+    def mark_changed(self, clusters: List[Cluster]):
+        """
+        Stamp clusters with the next change sequence numbers and updated_at.
+
+        Called whenever the pipeline changes what a cluster looks like to clients
+        (creation, membership, trending or blindspot fields), so delta sync
+        (get_changes) reports it again.
+        """
+        if not clusters:
+            return
+        last_seq = AppStateRepository(self.session).increment(CLUSTER_CHANGE_SEQ, len(clusters))
+        updated_at = now().isoformat()
+        for seq, cluster in enumerate(clusters, start=last_seq - len(clusters) + 1):
+            cluster.change_seq = seq
+            cluster.updated_at = updated_at
+        self.session.flush()
+
+    def delete_cluster(self, cluster_id: int) -> bool:
+        """
+        Delete a cluster with its memberships, card, search entry, events and
+        notification log, leaving a tombstone
+        """
+        cluster = self.session.get(Cluster, cluster_id)
+        if not cluster:
+            return False
+
+        self.session.execute(delete(cluster_articles).where(cluster_articles.c.cluster_id == cluster_id))
+        self.session.query(ClusterCard).filter(ClusterCard.cluster_id == cluster_id).delete(synchronize_session=False)
+        SearchRepository(self.session).remove_cluster(cluster_id)
+        EventRepository(self.session).remove_cluster(cluster_id)
+        NotificationLogRepository(self.session).remove_cluster(cluster_id)
+        self.session.delete(cluster)
+
+        seq = AppStateRepository(self.session).increment(CLUSTER_CHANGE_SEQ)
+        self.session.merge(ClusterTombstone(cluster_id=cluster_id, change_seq=seq, deleted_at=now().isoformat()))
+        self.session.flush()
+        return True
+
+    def get_changes(self, cursor: Optional[str] = None,
+                    limit: int = 100) -> Tuple[List[Cluster], List[int], str, bool]:
+        """
+        Clusters created or modified, and ids of clusters deleted, after a sync cursor.
+
+        Returns (clusters, deleted_ids, next_cursor, has_more), in change order and
+        together at most ``limit`` long. Without a cursor nothing is returned and
+        next_cursor points at the current end of the change sequence, where a client
+        that has just loaded the feed starts syncing. Raises ValueError for a
+        malformed cursor.
+        """
+        if cursor is None:
+            return [], [], encode_cursor(AppStateRepository(self.session).get(CLUSTER_CHANGE_SEQ)), False
+
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        since = values[0]
+
+        # Both sides are ordered by change_seq; fetch one extra row each to detect more
+        clusters = self.session.query(Cluster).filter(
+            Cluster.change_seq > since
+        ).order_by(Cluster.change_seq).limit(limit + 1).all()
+        tombstones = self.session.query(ClusterTombstone).filter(
+            ClusterTombstone.change_seq > since
+        ).order_by(ClusterTombstone.change_seq).limit(limit + 1).all()
+
+        changes = sorted(clusters + tombstones, key=lambda change: change.change_seq)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        next_seq = changes[-1].change_seq if changes else since
+        return (
+            [change for change in changes if isinstance(change, Cluster)],
+            [change.cluster_id for change in changes if isinstance(change, ClusterTombstone)],
+            encode_cursor(next_seq),
+            has_more
+        )
+
     def update_cluster_vector(self, cluster_id: int, new_embedding: np.ndarray):
         """Update cluster's representative vector (placeholder for future embedding storage)"""
         # In a full implementation, you'd store and update cluster embeddings
         pass
 
-    def get_cluster_details(self, cluster_id: int) -> Optional[Dict[str, Any]]:
-        """Get detailed cluster information with articles and entities"""
-        cluster = self.session.query(Cluster).filter(Cluster.id == cluster_id).first()
-        if not cluster:
-            return None
+    def get_cluster_details(self, cluster_id: int, fields: Optional[List[str]] = None,
+                            articles_limit: Optional[int] = None,
+                            articles_cursor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get detailed cluster information with articles and entities.
+
+        ``fields`` restricts the result to the named cluster fields; ``articles``
+        selects every article field and ``articles.<field>`` selects single ones
+        (see CLUSTER_DETAIL_FIELDS and ARTICLE_DETAIL_FIELDS). With
+        ``articles_limit`` at most that many articles are returned, ordered by id,
+        and ``articles_next_cursor`` is set when there are more to fetch by passing
+        it back as ``articles_cursor``. Raises ValueError for unknown fields or a
+        malformed cursor.
+        """
+        after_id = None
+        if articles_cursor:
+            values = decode_cursor(articles_cursor)
+            if len(values) != 1 or not isinstance(values[0], int):
+                raise ValueError('Invalid articles cursor')
+            after_id = values[0]
+
+        return self._load_cluster_details(
+            [cluster_id], fields, articles_limit=articles_limit, after_article_id=after_id
+        ).get(cluster_id)
+
+    def get_cluster_details_many(self, cluster_ids: List[int],
+                                 fields: Optional[List[str]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Get detailed information for several clusters, keyed by cluster id.
 
-        # Get articles in cluster
-        articles_data = self.session.query(Article, cluster_articles.c.similarity_score).join(
-            cluster_articles, Article.id == cluster_articles.c.article_id
-        ).filter(cluster_articles.c.cluster_id == cluster_id).all()
-
-        articles = []
-        for article, similarity_score in articles_data:
-            entities = article.get_entities(self.session)
-            article_dict = {
-                'id': article.id,
-                'headline': article.headline,
-                'description': article.description,
-                'published_at': article.published_at,
-                'article_url': article.article_url,
-                'image_url': article.image_url,
-                'source_id': article.source.id if article.source else None,
-                'source_name': article.source.name if article.source else None,
-                'source_url': article.source.url if article.source else None,
-                'source_bias': article.source.bias if article.source else None,
-                'source_owner': article.source.owner if article.source else None,
-                'source_founded_at': article.source.founded_at if article.source else None,
-                'source_hq_location': article.source.hq_location if article.source else None,
-                'category': article.category,
-                'similarity_score': similarity_score,
-                'entities': None
-            }
+        Runs a fixed number of queries regardless of how many clusters or
+        articles there are: clusters, articles joined to their source, and entities.
+        Missing ids are left out of the result. ``fields`` is as for get_cluster_details.
+        """
+        return self._load_cluster_details(cluster_ids, fields)
+
+    def _load_cluster_details(self, cluster_ids: List[int], fields: Optional[List[str]],
+                              articles_limit: Optional[int] = None,
+                              after_article_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        if not cluster_ids:
+            return {}
+
+        cluster_fields, article_fields = parse_detail_fields(fields)
+
+        # Only the cluster columns the selected fields are built from
+        columns = {Cluster.id}
+        for field in cluster_fields:
+            columns.update(_CLUSTER_FIELD_COLUMNS.get(field, ()))
+        clusters = self.session.query(Cluster).options(
+            load_only(*columns)
+        ).filter(Cluster.id.in_(cluster_ids)).all()
+        if not clusters:
+            return {}
+        ids = [c.id for c in clusters]
+
+        articles_by_cluster = {cluster_id: [] for cluster_id in ids}
+        next_cursors = {}
+        paged = articles_limit is not None or after_article_id is not None
+        if 'articles' in cluster_fields:
+            # Article and source columns for the selected fields only; the source
+            # join is skipped when no source field is requested
+            selected = [name for name in ARTICLE_DETAIL_FIELDS if name in _ARTICLE_FIELD_COLUMNS and name in article_fields]
+            query = self.session.query(
+                cluster_articles.c.cluster_id, Article.id,
+                *(_ARTICLE_FIELD_COLUMNS[name].label(name) for name in selected)
+            ).select_from(cluster_articles).join(
+                Article, Article.id == cluster_articles.c.article_id
+            )
+            if any(name.startswith('source_') for name in selected):
+                query = query.outerjoin(Source, Source.id == Article.source_id)
+
+            query = query.filter(cluster_articles.c.cluster_id.in_(ids))
+            if after_article_id is not None:
+                query = query.filter(Article.id > after_article_id)
+            query = query.order_by(cluster_articles.c.cluster_id, Article.id)
+            if articles_limit is not None:
+                # Paging is only offered for a single cluster; fetch one extra row
+                # to know whether there is a next page
+                query = query.limit(articles_limit + 1)
+            rows = query.all()
+
+            if articles_limit is not None and len(rows) > articles_limit:
+                rows = rows[:articles_limit]
+                next_cursors[rows[-1].cluster_id] = encode_cursor(rows[-1].id)
+
+            # One IN query for every article's entities (first row per article wins)
+            entities_by_article = {}
+            article_ids = {row.id for row in rows}
+            if 'entities' in article_fields and article_ids:
+                for entities in self.session.query(Entity).filter(
+                    Entity.article_id.in_(article_ids)
+                ).order_by(Entity.id):
+                    entities_by_article.setdefault(entities.article_id, entities)
+
+            for row in rows:
+                article_dict = {'id': row.id}
+                for name in selected:
+                    article_dict[name] = getattr(row, name)
+
+                if 'entities' in article_fields:
+                    entities = entities_by_article.get(row.id)
+                    article_dict['entities'] = None
+                    if entities:
+                        article_dict['entities'] = {
+                            'people': entities.people or [],
+                            'cities': entities.cities or [],
+                            'regions': entities.regions or [],
+                            'countries': entities.countries or [],
+                            'organizations': entities.organizations or [],
+                            'political_parties_and_militias': entities.political_parties_and_militias or [],
+                            'brands': entities.brands or [],
+                            'job_titles': entities.job_titles or [],
+                            'nlp_category': entities.category
+                        }
+
+                articles_by_cluster[row.cluster_id].append(article_dict)
+
+        # Bias percentages are relative to the cluster's full article count; count
+        # it separately when the articles were not all loaded
+        article_counts = None
+        if 'bias_distribution' in cluster_fields and (paged or 'articles' not in cluster_fields):
+            article_counts = dict(self.session.query(
+                cluster_articles.c.cluster_id, func.count()
+            ).filter(cluster_articles.c.cluster_id.in_(ids)).group_by(cluster_articles.c.cluster_id).all())
+
+        details = {}
+        for cluster in clusters:
+            articles = articles_by_cluster[cluster.id]
+            detail = {'id': cluster.id}
+            for field in CLUSTER_DETAIL_FIELDS:
+                if field == 'id' or field not in cluster_fields:
+                    continue
+                if field == 'articles':
+                    detail['articles'] = articles
+                    if articles_limit is not None:
+                        detail['articles_next_cursor'] = next_cursors.get(cluster.id)
+                elif field == 'bias_distribution':
+                    total = article_counts.get(cluster.id, 0) if article_counts is not None else len(articles)
+                    detail['bias_distribution'] = self._bias_distribution(cluster, total)
+                else:
+                    detail[field] = getattr(cluster, field)
+            details[cluster.id] = detail
+        return details
+
+    def _bias_distribution(self, cluster: Cluster, total_articles: int) -> Dict[str, Any]:
+        """Bias coverage counts and percentages for a cluster"""
+        def share(count):
+            return round(((count or 0) / total_articles * 100), 1) if total_articles > 0 else 0
 
-            if entities:
-                article_dict['entities'] = {
-                    'people': entities.people or [],
-                    'cities': entities.cities or [],
-                    'regions': entities.regions or [],
-                    'countries': entities.countries or [],
-                    'organizations': entities.organizations or [],
-                    'political_parties_and_militias': entities.political_parties_and_militias or [],
-                    'brands': entities.brands or [],
-                    'job_titles': entities.job_titles or [],
-                    'nlp_category': entities.category
-                }
-
-            articles.append(article_dict)
-
-        # Calculate bias distribution
-        total_articles = len(articles)
-        bias_distribution = {
+        return {
             'pro_saf': {
                 'count': cluster.bias_coverage_pro,
-                'percentage': round((cluster.bias_coverage_pro / total_articles * 100), 1) if total_articles > 0 else 0
+                'percentage': share(cluster.bias_coverage_pro)
             },
             'neutral': {
                 'count': cluster.bias_coverage_neutral,
-                'percentage': round((cluster.bias_coverage_neutral / total_articles * 100), 1) if total_articles > 0 else 0
+                'percentage': share(cluster.bias_coverage_neutral)
             },
             'oppose_saf': {
                 'count': cluster.bias_coverage_oppose,
-                'percentage': round((cluster.bias_coverage_oppose / total_articles * 100), 1) if total_articles > 0 else 0
+                'percentage': share(cluster.bias_coverage_oppose)
             }
         }
 
-        return {
-            'id': cluster.id,
-            'title': cluster.title,
-            'number_of_sources': cluster.number_of_sources,
-            'published_at': cluster.published_at,
-            'created_at': cluster.created_at,
-            'articles': articles,
-            'blindspot_type': cluster.blindspot_type,
-            'bias_balance_score': cluster.bias_balance_score,
-            'bias_distribution': bias_distribution,
-            'is_trending': cluster.is_trending,
-            'coverage_velocity': cluster.coverage_velocity
-        }
+    def _top_mentions(self, cluster_ids: List[int], entity_type: str) -> Dict[int, str]:
+        """Most mentioned entity value of a type across each cluster's articles"""
+        rows = self.session.query(
+            cluster_articles.c.cluster_id,
+            EntityMention.normalized_value,
+            func.min(EntityMention.display_value),
+            func.count(EntityMention.id)
+        ).join(
+            cluster_articles, cluster_articles.c.article_id == EntityMention.article_id
+        ).filter(
+            cluster_articles.c.cluster_id.in_(cluster_ids),
+            EntityMention.entity_type == entity_type
+        ).group_by(
+            cluster_articles.c.cluster_id, EntityMention.normalized_value
+        ).all()
+
+        # Highest count wins, ties broken by normalized value
+        best = {}
+        for cluster_id, normalized, display, count in rows:
+            current = best.get(cluster_id)
+            if current is None or (-count, normalized) < (-current[0], current[1]):
+                best[cluster_id] = (count, normalized, display)
+        return {cluster_id: value[2] for cluster_id, value in best.items()}
+
+    def _top_categories(self, cluster_ids: List[int]) -> Dict[int, str]:
+        """Dominant NLP category for each cluster"""
+        rows = self.session.query(
+            cluster_articles.c.cluster_id, Entity.category, func.count(Entity.id)
+        ).join(
+            cluster_articles, cluster_articles.c.article_id == Entity.article_id
+        ).filter(
+            cluster_articles.c.cluster_id.in_(cluster_ids),
+            Entity.category.isnot(None),
+            Entity.category != ''
+        ).group_by(cluster_articles.c.cluster_id, Entity.category).all()
+
+        best = {}
+        for cluster_id, category, count in rows:
+            current = best.get(cluster_id)
+            if current is None or (-count, category) < (-current[0], current[1]):
+                best[cluster_id] = (count, category)
+        return {cluster_id: value[1] for cluster_id, value in best.items()}
+
+    def build_cluster_card(self, cluster_id: int) -> Optional[Dict[str, Any]]:
+        """Compute the list-view card fields for a cluster without persisting them"""
+        return self.build_cluster_cards([cluster_id]).get(cluster_id)
+
+    def build_cluster_cards(self, cluster_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Compute card fields for several clusters in a fixed number of queries, keyed by cluster id"""
+        if not cluster_ids:
+            return {}
+
+        clusters = self.session.query(Cluster).filter(Cluster.id.in_(cluster_ids)).all()
+        if not clusters:
+            return {}
+        ids = [cluster.id for cluster in clusters]
+
+        # Articles in chronological order (missing dates last)
+        rows = self.session.query(
+            cluster_articles.c.cluster_id, Article.id, Article.description, Article.image_url,
+            Article.published_at, Article.category
+        ).join(
+            cluster_articles, Article.id == cluster_articles.c.article_id
+        ).filter(
+            cluster_articles.c.cluster_id.in_(ids)
+        ).order_by(
+            Article.published_ts.is_(None), Article.published_ts, Article.id
+        ).all()
+
+        rows_by_cluster = {cluster_id: [] for cluster_id in ids}
+        for row in rows:
+            rows_by_cluster[row.cluster_id].append(row)
+
+        categories = self._top_categories(ids)
+        cities = self._top_mentions(ids, 'cities')
+        countries = self._top_mentions(ids, 'countries')
+
+        cards = {}
+        for cluster in clusters:
+            cluster_rows = rows_by_cluster[cluster.id]
+            first = cluster_rows[0] if cluster_rows else None
+
+            first_published_at = None
+            for row in cluster_rows:
+                if row.published_at:
+                    try:
+                        first_published_at = datetime.fromisoformat(row.published_at.replace('Z', '+00:00')).isoformat()
+                        break
+                    except ValueError:
+                        continue
+
+            # Dominant NLP category
+            nlp_category = categories.get(cluster.id)
+
+            # Fallback label from local/international source categories
+            category_label = nlp_category
+            if not category_label and cluster_rows:
+                source_categories = set(row.category for row in cluster_rows)
+                if 'local' in source_categories and 'international' in source_categories:
+                    category_label = 'محلي ودولي'
+                elif 'international' in source_categories:
+                    category_label = 'دولي'
+                else:
+                    category_label = 'محلي'
+
+            cards[cluster.id] = {
+                'cluster_id': cluster.id,
+                'article_count': len(cluster_rows),
+                'first_article_id': first.id if first else None,
+                'description': first.description if first else None,
+                'image_url': first.image_url if first else None,
+                'first_published_at': first_published_at,
+                'nlp_category': nlp_category,
+                'category_label': category_label,
+                'top_city': cities.get(cluster.id),
+                'top_country': countries.get(cluster.id),
+                'bias_distribution': self._bias_distribution(cluster, len(cluster_rows))
+            }
+        return cards
+
+    def refresh_cluster_card(self, cluster_id: int) -> bool:
+        """Recompute and store the card for a cluster. Call whenever membership changes."""
+        card_data = self.build_cluster_card(cluster_id)
+        if not card_data:
+            return False
+
+        card_data['updated_at'] = now().isoformat()
+        self.session.merge(ClusterCard(**card_data))
+        self.session.flush()
+        return True
+
+    def get_cluster_cards(self, cluster_ids: List[int], build_missing: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Get stored cards for several clusters in one query, keyed by cluster id.
+
+        With ``build_missing``, cards the pipeline has not written yet are computed
+        in one batch (see build_cluster_cards) instead of being left out.
+        """
+        if not cluster_ids:
+            return {}
+
+        cards = self.session.query(ClusterCard).filter(
+            ClusterCard.cluster_id.in_(cluster_ids)
+        ).all()
+
+        result = {card.cluster_id: {
+            'cluster_id': card.cluster_id,
+            'article_count': card.article_count,
+            'first_article_id': card.first_article_id,
+            'description': card.description,
+            'image_url': card.image_url,
+            'first_published_at': card.first_published_at,
+            'nlp_category': card.nlp_category,
+            'category_label': card.category_label,
+            'top_city': card.top_city,
+            'top_country': card.top_country,
+            'bias_distribution': card.bias_distribution
+        } for card in cards}
+
+        if build_missing:
+            missing = [cluster_id for cluster_id in cluster_ids if cluster_id not in result]
+            if missing:
+                result.update(self.build_cluster_cards(missing))
+        return result
 
     def get_recent_clusters(self, limit: int = 50, offset: int = 0) -> List[Cluster]:
         """Get recent clusters ordered by published date"""
         return self.session.query(Cluster).order_by(
-            desc(Cluster.published_at)
+            desc(Cluster.published_ts), desc(Cluster.id)
         ).limit(limit).offset(offset).all()
 
+    def get_popular_clusters(self, hours: int = 48, min_articles: int = 2, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Clusters created in the last `hours` with at least `min_articles` articles,
+        most articles first. One grouped query over cluster_articles, filtered on
+        the indexed created_ts.
+        """
+        from datetime import timedelta
+
+        cutoff_ts = to_epoch(now() - timedelta(hours=hours))
+        article_count = func.count(cluster_articles.c.article_id)
+
+        rows = self.session.query(
+            Cluster.id, Cluster.title, Cluster.number_of_sources, Cluster.created_at,
+            article_count.label('article_count')
+        ).join(
+            cluster_articles, cluster_articles.c.cluster_id == Cluster.id
+        ).filter(
+            Cluster.created_ts >= cutoff_ts
+        ).group_by(Cluster.id).having(
+            article_count >= min_articles
+        ).order_by(
+            desc(article_count), desc(Cluster.published_ts), desc(Cluster.id)
+        ).limit(limit).all()
+
+        return [
+            {
+                'id': row.id,
+                'title': row.title,
+                'number_of_sources': row.number_of_sources,
+                'article_count': row.article_count,
+                'created_at': row.created_at
+            }
+            for row in rows
+        ]
+
+    def get_cluster_interests(self, cluster_id: int) -> Tuple[List[str], List[str]]:
+        """
+        Category slugs and normalized cities of a cluster's articles, the keys
+        notifications are targeted by (see TokenRepository.iter_interested_token_chunks).
+        """
+        slugs = {arabic: slug for slug, arabic in CATEGORY_MAPPING.items()}
+        categories = self.session.query(Entity.category).join(
+            cluster_articles, cluster_articles.c.article_id == Entity.article_id
+        ).filter(
+            cluster_articles.c.cluster_id == cluster_id
+        ).distinct().all()
+
+        cities = self.session.query(EntityMention.normalized_value).join(
+            cluster_articles, cluster_articles.c.article_id == EntityMention.article_id
+        ).filter(
+            cluster_articles.c.cluster_id == cluster_id,
+            EntityMention.entity_type == 'cities'
+        ).distinct().all()
+
+        return (
+            sorted(slugs[category] for category, in categories if category in slugs),
+            sorted(city for city, in cities if city)
+        )
+
     def get_total_clusters(self) -> int:
         """Get total number of clusters"""
         return self.session.query(func.count(Cluster.id)).scalar()
 
     def get_all_cities(self) -> List[str]:
         """Get list of all unique cities from entities"""
-        # Fetch all cities lists
-        # Note: This fetches all rows, which might be heavy if table is huge.
-        # Optimization: In Postgres we could use distinct unnest.
-        # For SQLite/Generic JSON, we fetch and process in Python.
-        entities = self.session.query(Entity.cities).filter(
-            Entity.cities.isnot(None)
-        ).all()
-
-        unique_cities = set()
-        for entity in entities:
-            if entity.cities:
-                # entity.cities is already a list due to JSONType
-                unique_cities.update(entity.cities)
-
-        return sorted(list(unique_cities))
+        # One display value per normalized city, straight off the entity_mentions index
+        from .entity_repository import EntityRepository
+        return EntityRepository(self.session).get_distinct_values('cities')
+
+    def _clusters_mentioning(self, entity_type: str, value: str):
+        """Subquery of cluster ids with an article mentioning the given entity value"""
+        return self.session.query(cluster_articles.c.cluster_id).join(
+            EntityMention, cluster_articles.c.article_id == EntityMention.article_id
+        ).filter(
+            EntityMention.entity_type == entity_type,
+            EntityMention.normalized_value == normalize_entity_value(value)
+        )
 
-    def get_clusters_with_filters(self, query: str = None, has_entities: bool = False,
-                                category: str = None, city: str = None,
-                                limit: int = 50, offset: int = 0) -> Tuple[List[Cluster], int]:
-        """Get clusters with search and filter options"""
+    def _filtered_query(self, query: str = None, has_entities: bool = False,
+                        category: str = None, city: str = None) -> Tuple[Any, list, bool]:
+        """Build the filtered cluster query. Returns (query, order_by, is_ranked)."""
         base_query = self.session.query(Cluster)
+        # Undated clusters (unparseable published_at) sort after every dated one on any database
+        order_by = [desc(Cluster.published_ts).nulls_last(), desc(Cluster.id)]
+        ranked = False
 
-        conditions = []
         if query:
-            base_query = base_query.filter(Cluster.title.like(f'%{query}%'))
+            search_repo = SearchRepository(self.session)
+            if search_repo.is_available():
+                # Ranked full-text match on the normalized title, best matches first
+                matches = search_repo.cluster_matches(query)
+                base_query = base_query.join(matches, matches.c.cluster_id == Cluster.id)
+                order_by.insert(0, matches.c.rank)
+                ranked = True
+            else:
+                base_query = base_query.filter(Cluster.title.like(f'%{query}%'))
 
         if has_entities:
             # Clusters that have articles with entities
@@ -193,47 +682,101 @@ class ClusterRepository:
 
         if category and category != 'all':
             # Map UI category to NLP category
-            category_mapping = {
-                'politics': 'سياسة',
-                'economy': 'اقتصاد',
-                'sports': 'رياضة',
-                'security': 'أمن وعسكر',
-                'culture': 'مجتمع وثقافة',
-                'opinion': 'مقالات رأي'
-            }
-            nlp_category = category_mapping.get(category, category)
+            nlp_category = CATEGORY_MAPPING.get(category, category)
 
             base_query = base_query.filter(
                 Cluster.id.in_(
                     self.session.query(cluster_articles.c.cluster_id).join(
-                        Article, cluster_articles.c.article_id == Article.id
-                    ).join(Entity, Article.id == Entity.article_id).filter(
+                        Entity, cluster_articles.c.article_id == Entity.article_id
+                    ).filter(
                         Entity.category == nlp_category
                     )
                 )
             )
 
         if city:
-            # Filter by city in Entity.cities
-            # Using LIKE for SQLite JSON text matching as a fallback/simple solution
-            # For exact match in JSON array: like '%"City"%'
+            # Filter by city through the (entity_type, normalized_value) index
             base_query = base_query.filter(
-                Cluster.id.in_(
-                    self.session.query(cluster_articles.c.cluster_id).join(
-                        Article, cluster_articles.c.article_id == Article.id
-                    ).join(Entity, Article.id == Entity.article_id).filter(
-                        cast(Entity.cities, Text).like(f'%"{city}"%')
-                    )
-                )
+                Cluster.id.in_(self._clusters_mentioning('cities', city))
             )
 
-        clusters = base_query.order_by(desc(Cluster.published_at)).limit(limit).offset(offset).all()
+        return base_query, order_by, ranked
+
+    def get_clusters_with_filters(self, query: str = None, has_entities: bool = False,
+                                category: str = None, city: str = None,
+                                limit: int = 50, offset: int = 0,
+                                with_total: bool = True) -> Tuple[List[Cluster], Optional[int]]:
+        """Get clusters with search and filter options.
+
+        The total count repeats every filter subquery; pass ``with_total=False``
+        when the caller does not need it (total is then None).
+        """
+        base_query, order_by, _ = self._filtered_query(query, has_entities, category, city)
+
+        clusters = base_query.order_by(*order_by).limit(limit).offset(offset).all()
 
         # Get total count
-        total = base_query.count()
+        total = base_query.count() if with_total else None
 
         return clusters, total
 
+    def get_clusters_page(self, query: str = None, has_entities: bool = False,
+                          category: str = None, city: str = None,
+                          cursor: str = None, limit: int = 50) -> Tuple[List[Cluster], Optional[str]]:
+        """Get one page of clusters using keyset pagination.
+
+        ``cursor`` is the opaque token returned for the previous page (None for the
+        first page). Pages are read with an index range scan on (published_ts, id)
+        rather than OFFSET, so deep pages cost the same as the first. Clusters with
+        no published_ts come last, and a cursor past them carries a null timestamp.
+        Ranked search results have no stable keyset, so their cursor carries an
+        offset instead.
+
+        Returns:
+            tuple: (clusters, next_cursor), next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        base_query, order_by, ranked = self._filtered_query(query, has_entities, category, city)
+
+        offset = 0
+        if ranked:
+            if cursor:
+                kind, *values = decode_cursor(cursor)
+                if kind != 'o' or len(values) != 1 or not isinstance(values[0], int):
+                    raise ValueError(f"Invalid cursor: {cursor!r}")
+                offset = values[0]
+        else:
+            if cursor:
+                kind, *values = decode_cursor(cursor)
+                if kind != 'k' or len(values) != 2 or not isinstance(values[1], int) \
+                        or not (values[0] is None or isinstance(values[0], int)):
+                    raise ValueError(f"Invalid cursor: {cursor!r}")
+                last_ts, last_id = values
+                if last_ts is None:
+                    base_query = base_query.filter(Cluster.published_ts.is_(None), Cluster.id < last_id)
+                else:
+                    base_query = base_query.filter(or_(
+                        Cluster.published_ts < last_ts,
+                        and_(Cluster.published_ts == last_ts, Cluster.id < last_id),
+                        Cluster.published_ts.is_(None)
+                    ))
+
+        # Fetch one extra row to learn whether another page exists
+        rows = base_query.order_by(*order_by).limit(limit + 1).offset(offset).all()
+        clusters = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            if ranked:
+                next_cursor = encode_cursor('o', offset + limit)
+            else:
+                last = clusters[-1]
+                next_cursor = encode_cursor('k', last.published_ts, last.id)
+
+        return clusters, next_cursor
+
     def calculate_blindspot(self, cluster_id: int) -> Optional[Dict[str, Any]]:
         """
         Calculate blindspot metrics for a cluster.
@@ -247,8 +790,7 @@ class ClusterRepository:
                 'balance_score': float (0-1, where 1 is perfect balance)
             }
         """
-        cluster = self.session.query(Cluster).get(cluster_id)
-        if not cluster:
+        if not self.session.get(Cluster, cluster_id):
             return None
         
         bias_counts = {
@@ -257,16 +799,28 @@ class ClusterRepository:
             'oppose': 0
         }
         
-        # Count articles by source bias
-        for article in cluster.articles:
-            if article.source and article.source.bias:
-                bias = article.source.bias.lower()
-                if 'pro' in bias:
-                    bias_counts['pro'] += 1
-                elif 'oppose' in bias:
-                    bias_counts['oppose'] += 1
-                else:
-                    bias_counts['neutral'] += 1
+        # Count articles by source bias in one grouped query
+        rows = self.session.query(
+            Source.bias, func.count(cluster_articles.c.article_id)
+        ).select_from(cluster_articles).join(
+            Article, Article.id == cluster_articles.c.article_id
+        ).join(
+            Source, Source.id == Article.source_id
+        ).filter(
+            cluster_articles.c.cluster_id == cluster_id,
+            Source.bias.isnot(None)
+        ).group_by(Source.bias).all()
+
+        for bias, count in rows:
+            if not bias:
+                continue
+            bias = bias.lower()
+            if 'pro' in bias:
+                bias_counts['pro'] += count
+            elif 'oppose' in bias:
+                bias_counts['oppose'] += count
+            else:
+                bias_counts['neutral'] += count
         
         total = sum(bias_counts.values())
         if total == 0:
@@ -310,15 +864,22 @@ class ClusterRepository:
         if not metrics:
             return False
         
-        cluster = self.session.query(Cluster).get(cluster_id)
+        cluster = self.session.get(Cluster, cluster_id)
         if not cluster:
             return False
         
+        previous = (cluster.blindspot_type, cluster.bias_coverage_pro, cluster.bias_coverage_neutral,
+                    cluster.bias_coverage_oppose, cluster.bias_balance_score)
+
         cluster.blindspot_type = metrics['blindspot_type']
         cluster.bias_coverage_pro = metrics['pro_count']
         cluster.bias_coverage_neutral = metrics['neutral_count']
         cluster.bias_coverage_oppose = metrics['oppose_count']
         cluster.bias_balance_score = metrics['balance_score']
+
+        if previous != (cluster.blindspot_type, cluster.bias_coverage_pro, cluster.bias_coverage_neutral,
+                        cluster.bias_coverage_oppose, cluster.bias_balance_score):
+            self.mark_changed([cluster])
         
         self.session.flush()
         return True
@@ -332,28 +893,25 @@ class ClusterRepository:
         """
         from datetime import timedelta
         
-        cluster = self.session.query(Cluster).get(cluster_id)
+        cluster = self.session.get(Cluster, cluster_id)
         if not cluster:
             return False
         
         current_time = now()
-        six_hours_ago = current_time - timedelta(hours=6)
-        twelve_hours_ago = current_time - timedelta(hours=12)
+        six_hours_ago = to_epoch(current_time - timedelta(hours=6))
+        twelve_hours_ago = to_epoch(current_time - timedelta(hours=12))
         
         # Count articles in last 6 hours vs previous 6 hours
-        recent_count = 0
-        previous_count = 0
-        
-        for article in cluster.articles:
-            if article.created_at:
-                try:
-                    created = datetime.fromisoformat(article.created_at)
-                    if created > six_hours_ago:
-                        recent_count += 1
-                    elif created > twelve_hours_ago:
-                        previous_count += 1
-                except:
-                    pass
+        recent_count, previous_count = self.session.query(
+            func.coalesce(func.sum(case((Article.created_ts > six_hours_ago, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(Article.created_ts <= six_hours_ago,
+                                              Article.created_ts > twelve_hours_ago), 1), else_=0)), 0)
+        ).join(
+            cluster_articles, Article.id == cluster_articles.c.article_id
+        ).filter(
+            cluster_articles.c.cluster_id == cluster_id,
+            Article.created_ts > twelve_hours_ago
+        ).one()
         
         # Calculate velocity
         if previous_count > 0:
@@ -363,9 +921,18 @@ class ClusterRepository:
         else:
             velocity = 0.0
         
-        # Update cluster
-        cluster.coverage_velocity = round(velocity, 2)
+        # Update cluster. The stored velocity is always current, for ordering;
+        # small swings from the last published value are not re-published, but
+        # they add up until the total passes the tolerance
+        was_trending = bool(cluster.is_trending)
         cluster.is_trending = velocity > 1.5 and cluster.number_of_sources >= 3
+        cluster.coverage_velocity = round(velocity, 2)
+        published = cluster.published_velocity
+        velocity_moved = published is None or abs(cluster.coverage_velocity - published) > max(
+            VELOCITY_MIN_CHANGE, published * VELOCITY_CHANGE_TOLERANCE)
+        if was_trending != cluster.is_trending or velocity_moved:
+            cluster.published_velocity = cluster.coverage_velocity
+            self.mark_changed([cluster])
         cluster.last_coverage_check = current_time.isoformat()
         
         # Set first_seen_at if not already set
@@ -380,12 +947,11 @@ class ClusterRepository:
         from datetime import timedelta
         
         # Only consider clusters from last 48 hours
-        cutoff = datetime.now() - timedelta(hours=48)
-        cutoff_str = cutoff.isoformat()
+        cutoff_ts = to_epoch(now() - timedelta(hours=48))
         
         trending = self.session.query(Cluster)\
             .filter(Cluster.is_trending == True)\
-            .filter(Cluster.published_at >= cutoff_str)\
+            .filter(Cluster.published_ts >= cutoff_ts)\
             .order_by(desc(Cluster.coverage_velocity))\
             .limit(limit)\
             .all()
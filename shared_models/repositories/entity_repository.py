@@ -1,7 +1,35 @@
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from sqlalchemy import insert
+from typing import List, Optional, Dict, Any
 from datetime import datetime
-from ..models import Entity, Article
+from ..models import Entity, Article, EntityMention
+from ..text_utils import normalize_entity_value
+
+# Entity list columns mirrored into the entity_mentions inverted index
+MENTION_TYPES = (
+    'people', 'cities', 'regions', 'countries', 'organizations',
+    'political_parties_and_militias', 'brands', 'job_titles'
+)
+
+def build_mention_rows(article_id: int, values_by_type: Dict[str, list]) -> List[Dict[str, Any]]:
+    """Build entity_mentions rows for an article, one per distinct normalized value per type"""
+    rows = []
+    for entity_type, values in values_by_type.items():
+        seen = set()
+        for value in values or []:
+            if not isinstance(value, str):
+                continue
+            normalized = normalize_entity_value(value)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            rows.append({
+                'article_id': article_id,
+                'entity_type': entity_type,
+                'normalized_value': normalized,
+                'display_value': value.strip()
+            })
+    return rows
 
 class EntityRepository:
     def __init__(self, session: Session):
@@ -28,8 +56,21 @@ class EntityRepository:
         )
         self.session.add(entity)
         self.session.flush()
+
+        self._write_mentions(article_id, {
+            'people': people, 'cities': cities, 'regions': regions, 'countries': countries,
+            'organizations': organizations,
+            'political_parties_and_militias': political_parties_and_militias,
+            'brands': brands, 'job_titles': job_titles
+        })
         return entity
 
+    def _write_mentions(self, article_id: int, values_by_type: Dict[str, list]):
+        """Insert entity_mentions rows for the given entity lists"""
+        rows = build_mention_rows(article_id, values_by_type)
+        if rows:
+            self.session.execute(insert(EntityMention), rows)
+
     def get_by_article_id(self, article_id: int) -> Optional[Entity]:
         """Get entities for a specific article"""
         return self.session.query(Entity).filter(Entity.article_id == article_id).first()
@@ -44,9 +85,44 @@ class EntityRepository:
             if hasattr(entity, key):
                 setattr(entity, key, value)
 
+        # Keep the inverted index in step with any rewritten entity lists
+        changed_types = [key for key in kwargs if key in MENTION_TYPES]
+        if changed_types:
+            self.session.query(EntityMention).filter(
+                EntityMention.article_id == article_id,
+                EntityMention.entity_type.in_(changed_types)
+            ).delete(synchronize_session=False)
+            self._write_mentions(article_id, {key: kwargs[key] for key in changed_types})
+
         self.session.commit()
         return True
 
+    def get_distinct_values(self, entity_type: str) -> List[str]:
+        """Get one display value per distinct normalized entity of a type"""
+        from sqlalchemy import func
+
+        rows = self.session.query(
+            func.min(EntityMention.display_value)
+        ).filter(
+            EntityMention.entity_type == entity_type
+        ).group_by(EntityMention.normalized_value).all()
+
+        return sorted(row[0] for row in rows)
+
+    def get_top_values(self, entity_type: str, limit: int = 50) -> List[str]:
+        """Get the most mentioned distinct entities of a type, most mentioned first"""
+        from sqlalchemy import func
+
+        rows = self.session.query(
+            func.min(EntityMention.display_value)
+        ).filter(
+            EntityMention.entity_type == entity_type
+        ).group_by(EntityMention.normalized_value).order_by(
+            func.count(EntityMention.id).desc(), EntityMention.normalized_value
+        ).limit(limit).all()
+
+        return [row[0] for row in rows]
+
     def get_entity_stats(self) -> Dict[str, Any]:
         """Get statistics about entities in the database"""
         from sqlalchemy import func
@@ -61,8 +137,14 @@ class EntityRepository:
 
         # Most common cities, people, etc. (top 10 each)
         def get_top_entities(field):
-            # This is complex with JSON arrays - simplified version
-            return []
+            rows = self.session.query(
+                func.min(EntityMention.display_value), func.count(EntityMention.id)
+            ).filter(
+                EntityMention.entity_type == field
+            ).group_by(
+                EntityMention.normalized_value
+            ).order_by(func.count(EntityMention.id).desc()).limit(10).all()
+            return [{'value': value, 'count': count} for value, count in rows]
 
         return {
             'total_articles_with_entities': total_with_entities,
@@ -0,0 +1,53 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Any, Dict, List, Optional
+from datetime import timedelta
+from ..models import ClusterEvent
+from ..timezone_utils import now
+
+# Event types written by the pipeline
+CLUSTER_CREATED = 'cluster_created'
+TRENDING_CHANGED = 'trending_changed'
+
+class EventRepository:
+    """Cluster change log consumed by the API's event stream"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def publish(self, event_type: str, cluster_id: int, payload: Optional[Dict[str, Any]] = None) -> ClusterEvent:
+        """Append an event. It becomes visible to streams when the session commits."""
+        created = now()
+        event = ClusterEvent(
+            event_type=event_type,
+            cluster_id=cluster_id,
+            payload=payload or {},
+            created_at=created.isoformat(),
+            created_ts=int(created.timestamp())
+        )
+        self.session.add(event)
+        self.session.flush()
+        return event
+
+    def get_since(self, last_id: int, limit: int = 100) -> List[ClusterEvent]:
+        """Events after an event id, oldest first"""
+        return self.session.query(ClusterEvent).filter(
+            ClusterEvent.id > last_id
+        ).order_by(ClusterEvent.id).limit(limit).all()
+
+    def get_latest_id(self) -> int:
+        """Id of the newest event, or 0 if there are none"""
+        return self.session.query(func.max(ClusterEvent.id)).scalar() or 0
+
+    def remove_cluster(self, cluster_id: int) -> int:
+        """Delete a cluster's events. Returns the number deleted."""
+        return self.session.query(ClusterEvent).filter(
+            ClusterEvent.cluster_id == cluster_id
+        ).delete(synchronize_session=False)
+
+    def prune(self, keep_days: int = 7) -> int:
+        """Delete events older than keep_days. Returns the number deleted."""
+        cutoff_ts = int((now() - timedelta(days=keep_days)).timestamp())
+        return self.session.query(ClusterEvent).filter(
+            ClusterEvent.created_ts < cutoff_ts
+        ).delete(synchronize_session=False)
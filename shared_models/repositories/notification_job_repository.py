@@ -0,0 +1,126 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update, func
+from typing import Any, Dict, Optional
+from datetime import timedelta
+from ..models import NotificationJob
+from ..timezone_utils import now
+
+# Job lifecycle
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class NotificationJobRepository:
+    """Queue of push notification sends for the background sender"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def enqueue(self, job_type: str, payload: Optional[Dict[str, Any]] = None) -> NotificationJob:
+        """Add a queued job. Workers see it once the session commits."""
+        job = NotificationJob(
+            job_type=job_type,
+            payload=payload or {},
+            status=QUEUED,
+            total=0, success=0, failure=0, pruned=0, batches_done=0,
+            created_at=now().isoformat()
+        )
+        self.session.add(job)
+        self.session.flush()
+        return job
+
+    def get(self, job_id: int) -> Optional[NotificationJob]:
+        """Get a job by id"""
+        return self.session.get(NotificationJob, job_id)
+
+    def claim_next(self) -> Optional[NotificationJob]:
+        """
+        Mark the oldest queued job as running and return it, or None if the queue
+        is empty. The status check in the UPDATE keeps two workers from claiming
+        the same job.
+        """
+        while True:
+            job_id = self.session.query(NotificationJob.id).filter(
+                NotificationJob.status == QUEUED
+            ).order_by(NotificationJob.id).limit(1).scalar()
+            if job_id is None:
+                return None
+
+            started_at = now().isoformat()
+            claimed = self.session.execute(
+                update(NotificationJob)
+                .where(NotificationJob.id == job_id, NotificationJob.status == QUEUED)
+                .values(status=RUNNING, started_at=started_at, heartbeat_at=started_at)
+            ).rowcount
+            self.session.commit()
+            if claimed:
+                return self.get(job_id)
+
+    def add_progress(self, job_id: int, total: int = 0, success: int = 0, failure: int = 0,
+                     pruned: int = 0, batches: int = 0):
+        """Atomically add to a job's progress counters; also marks the job as still alive"""
+        self.session.execute(
+            update(NotificationJob)
+            .where(NotificationJob.id == job_id)
+            .values(
+                total=NotificationJob.total + total,
+                success=NotificationJob.success + success,
+                failure=NotificationJob.failure + failure,
+                pruned=NotificationJob.pruned + pruned,
+                batches_done=NotificationJob.batches_done + batches,
+                heartbeat_at=now().isoformat()
+            )
+        )
+        self.session.commit()
+
+    def finish(self, job_id: int, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> bool:
+        """
+        Record a job's outcome: done with its result, or failed with an error.
+        Returns False if the job was no longer running (e.g. fail_stale gave up on it).
+        """
+        finished = self.session.execute(
+            update(NotificationJob)
+            .where(NotificationJob.id == job_id, NotificationJob.status == RUNNING)
+            .values(status=FAILED if error else DONE, result=result, error=error,
+                    finished_at=now().isoformat())
+        ).rowcount
+        self.session.commit()
+        return bool(finished)
+
+    def fail_stale(self, minutes: int = 30) -> int:
+        """
+        Fail running jobs that have made no progress for this long, e.g. because
+        their worker was killed. They are not requeued: part of the audience may
+        already have been notified.
+        """
+        cutoff = (now() - timedelta(minutes=minutes)).isoformat()
+        last_alive = func.coalesce(NotificationJob.heartbeat_at, NotificationJob.started_at)
+        failed = self.session.execute(
+            update(NotificationJob)
+            .where(NotificationJob.status == RUNNING, last_alive < cutoff)
+            .values(status=FAILED, error='Worker stopped before the job finished',
+                    finished_at=now().isoformat())
+        ).rowcount
+        self.session.commit()
+        return failed
+
+    @staticmethod
+    def to_dict(job: NotificationJob) -> Dict[str, Any]:
+        """Job status with progress counters, as returned by the API"""
+        return {
+            'id': job.id,
+            'job_type': job.job_type,
+            'status': job.status,
+            'total': job.total,
+            'success': job.success,
+            'failure': job.failure,
+            'pruned': job.pruned,
+            'batches_done': job.batches_done,
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'heartbeat_at': job.heartbeat_at,
+            'finished_at': job.finished_at
+        }
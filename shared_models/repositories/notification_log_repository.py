@@ -0,0 +1,46 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable
+from ..models import NotificationLog
+from ..timezone_utils import now
+
+# Notification types recorded in the log
+POPULAR_CLUSTER = 'popular_cluster'
+
+class NotificationLogRepository:
+    """Which clusters were already pushed to users, and at what size"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get_sent_counts(self, notification_type: str, cluster_ids: Iterable[int]) -> Dict[int, int]:
+        """Article count at the last send, keyed by cluster id. Clusters never sent are absent."""
+        cluster_ids = list(cluster_ids)
+        if not cluster_ids:
+            return {}
+        rows = self.session.query(NotificationLog.cluster_id, NotificationLog.article_count).filter(
+            NotificationLog.notification_type == notification_type,
+            NotificationLog.cluster_id.in_(cluster_ids)
+        ).all()
+        return {cluster_id: article_count for cluster_id, article_count in rows}
+
+    def record_sent(self, notification_type: str, cluster_id: int, article_count: int) -> NotificationLog:
+        """Record a send, replacing the previous entry for this cluster and type"""
+        sent = now()
+        entry = self.session.query(NotificationLog).filter(
+            NotificationLog.notification_type == notification_type,
+            NotificationLog.cluster_id == cluster_id
+        ).first()
+        if entry is None:
+            entry = NotificationLog(cluster_id=cluster_id, notification_type=notification_type)
+            self.session.add(entry)
+        entry.article_count = article_count
+        entry.sent_at = sent.isoformat()
+        entry.sent_ts = int(sent.timestamp())
+        self.session.flush()
+        return entry
+
+    def remove_cluster(self, cluster_id: int) -> int:
+        """Forget every send for a cluster. Returns the number of entries deleted."""
+        return self.session.query(NotificationLog).filter(
+            NotificationLog.cluster_id == cluster_id
+        ).delete(synchronize_session=False)
@@ -0,0 +1,129 @@
+import re
+from sqlalchemy.orm import Session
+from sqlalchemy import text, inspect, Integer, Float
+from typing import Optional, Dict
+from ..models import Cluster, Article, SEARCH_TABLES
+from ..text_utils import normalize_arabic
+
+# Whether each engine (by URL) has the FTS5 search tables. Checked once per
+# process: tables added later by a migration are picked up on restart
+_search_ready: Dict[str, bool] = {}
+
+class SearchRepository:
+    """Full-text search over cluster titles and article text.
+
+    Uses SQLite FTS5 tables (see models.SEARCH_TABLES). Text is folded with
+    normalize_arabic before it is indexed and before it is queried, so hamza,
+    taa marbuta and diacritic variants match. Other databases report
+    ``is_available() == False`` and callers fall back to LIKE filtering.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def is_available(self) -> bool:
+        """Whether the FTS tables exist on the current database"""
+        bind = self.session.get_bind()
+        if bind.dialect.name != 'sqlite':
+            return False
+
+        key = str(bind.url)
+        if key not in _search_ready:
+            # Inspect on the session's own connection: checking out another one can
+            # reset the open transaction when the pool hands back the same connection
+            tables = set(inspect(self.session.connection()).get_table_names())
+            _search_ready[key] = all(name in tables for name in SEARCH_TABLES)
+        return _search_ready[key]
+
+    @staticmethod
+    def build_match_query(query: str) -> Optional[str]:
+        """Turn user input into an FTS5 MATCH expression: every term, each as a prefix"""
+        terms = re.findall(r'\w+', normalize_arabic(query or '').lower())
+        if not terms:
+            return None
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def index_cluster(self, cluster_id: int, title: str):
+        """Add or replace a cluster title in the search index"""
+        if not self.is_available():
+            return
+        self.session.execute(
+            text("INSERT OR REPLACE INTO cluster_search (rowid, title) VALUES (:id, :title)"),
+            {'id': cluster_id, 'title': normalize_arabic(title or '')}
+        )
+
+    def remove_cluster(self, cluster_id: int):
+        """Drop a cluster title from the search index"""
+        if not self.is_available():
+            return
+        self.session.execute(text("DELETE FROM cluster_search WHERE rowid = :id"), {'id': cluster_id})
+
+    def index_article(self, article_id: int, headline: str, description: str):
+        """Add or replace an article's headline and description in the search index"""
+        if not self.is_available():
+            return
+        self.session.execute(
+            text("INSERT OR REPLACE INTO article_search (rowid, headline, description) "
+                 "VALUES (:id, :headline, :description)"),
+            {'id': article_id, 'headline': normalize_arabic(headline or ''),
+             'description': normalize_arabic(description or '')}
+        )
+
+    def cluster_matches(self, query: str):
+        """Subquery of (cluster_id, rank) matching the query; lower rank is a better match"""
+        return self._matches('cluster_search', 'cluster_id', query)
+
+    def article_matches(self, query: str):
+        """Subquery of (article_id, rank) matching the query; lower rank is a better match"""
+        return self._matches('article_search', 'article_id', query)
+
+    def _matches(self, table_name: str, id_label: str, query: str):
+        match = self.build_match_query(query)
+        # An empty expression matches nothing rather than raising an FTS syntax error
+        statement = text(
+            f"SELECT rowid AS {id_label}, bm25({table_name}) AS rank FROM {table_name} "
+            f"WHERE {table_name} MATCH :match"
+        ).bindparams(match=match or '""')
+        return statement.columns(**{id_label: Integer, 'rank': Float}).subquery()
+
+    def rebuild(self, batch_size: int = 1000) -> Dict[str, int]:
+        """Rebuild both search tables from clusters and articles"""
+        if not self.is_available():
+            raise RuntimeError("Full-text search tables are not available on this database")
+
+        counts = {}
+
+        self.session.execute(text("DELETE FROM cluster_search"))
+        counts['clusters'] = 0
+        last_id = 0
+        while True:
+            rows = self.session.query(Cluster.id, Cluster.title).filter(
+                Cluster.id > last_id
+            ).order_by(Cluster.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                self.index_cluster(row.id, row.title)
+            counts['clusters'] += len(rows)
+            last_id = rows[-1].id
+            self.session.commit()
+
+        self.session.execute(text("DELETE FROM article_search"))
+        counts['articles'] = 0
+        last_id = 0
+        while True:
+            rows = self.session.query(Article.id, Article.headline, Article.description).filter(
+                Article.id > last_id
+            ).order_by(Article.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                self.index_article(row.id, row.headline, row.description)
+            counts['articles'] += len(rows)
+            last_id = rows[-1].id
+            self.session.commit()
+
+        self.session.execute(text("INSERT INTO cluster_search (cluster_search) VALUES ('optimize')"))
+        self.session.execute(text("INSERT INTO article_search (article_search) VALUES ('optimize')"))
+        self.session.commit()
+        return counts
@@ -1,42 +1,229 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-from ..models import UserToken, User
+from sqlalchemy import and_, or_, insert, update, bindparam, select, union
+from typing import List, Optional, Dict, Any, Iterator, Iterable
+from ..models import UserToken, User, TokenInterest
+from ..timezone_utils import to_epoch, now
+from ..text_utils import normalize_entity_value
+from .app_state_repository import (
+    AppStateRepository, TOKENS_PRUNED_INVALID, TOKENS_PRUNED_EXPIRED, TOKENS_CLEANUP_TS
+)
+
+# UserToken.topics_dirty: FCM topic subscriptions are up to date, need syncing,
+# or are being synced by a worker (claimed at topics_claimed_ts)
+TOPICS_SYNCED = 0
+TOPICS_DIRTY = 1
+TOPICS_CLAIMED = 2
+
+# token_interests types, and the category value meaning "every category"
+CATEGORY_INTEREST = 'category'
+CITY_INTEREST = 'city'
+ALL_CATEGORIES = '*'
+
+def build_interest_rows(token_id: int, topics: Optional[List[str]],
+                        cities: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """token_interests rows for a token's category choice (None = all) and cities"""
+    categories = [ALL_CATEGORIES] if topics is None else sorted(set(topics))
+    city_values = sorted({normalize_entity_value(city) for city in cities or []} - {''})
+    return (
+        [{'token_id': token_id, 'interest_type': CATEGORY_INTEREST, 'value': value} for value in categories] +
+        [{'token_id': token_id, 'interest_type': CITY_INTEREST, 'value': value} for value in city_values]
+    )
+
+def merge_registration(previous: Optional[Dict[str, Any]], registration: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two registrations of one token: the later wins, but omitted topics/cities keep the earlier ones"""
+    if previous is None:
+        return dict(registration)
+    merged = dict(registration)
+    for key in ('topics', 'cities'):
+        if merged.get(key) is None:
+            merged[key] = previous.get(key)
+    return merged
 
 class TokenRepository:
     def __init__(self, session: Session):
         self.session = session
 
     def store_or_update_token(self, user_id: int = None, device_id: str = None,
-                             token: str = None, platform: str = None) -> UserToken:
-        """Store new token or update existing one"""
-        if not all([device_id, token, platform]):
-            raise ValueError("device_id, token, and platform are required")
-
-        # Check if token already exists
-        existing_token = self.session.query(UserToken).filter(UserToken.token == token).first()
-
-        now = datetime.now().isoformat()
-
-        if existing_token:
-            # Update existing token
-            existing_token.user_id = user_id
-            existing_token.device_id = device_id
-            existing_token.platform = platform
-            existing_token.updated_at = now
-            return existing_token
-        else:
-            # Create new token
-            user_token = UserToken(
-                user_id=user_id,
-                device_id=device_id,
-                token=token,
-                platform=platform,
-                created_at=now
-            )
-            self.session.add(user_token)
+                             token: str = None, platform: str = None,
+                             topics: Optional[List[str]] = None,
+                             cities: Optional[List[str]] = None) -> UserToken:
+        """Store new token or update existing one.
+
+        ``topics`` are the category topics the device wants (None keeps the
+        current choice, or all categories for a new token). A changed choice
+        marks the token for topic re-subscription. ``cities`` are cities the
+        device follows (None keeps the current ones). Both are written to the
+        token_interests index used for targeted sends.
+        """
+        ids = self.upsert_tokens([{
+            'user_id': user_id, 'device_id': device_id, 'token': token,
+            'platform': platform, 'topics': topics, 'cities': cities
+        }])
+        return self.session.get(UserToken, ids[token], populate_existing=True)
+
+    def upsert_tokens(self, registrations: List[Dict[str, Any]], chunk_size: int = 500) -> Dict[str, int]:
+        """
+        Store registrations (dicts of store_or_update_token's arguments) with one
+        INSERT ... ON CONFLICT (token) DO UPDATE ... RETURNING per chunk, instead
+        of a SELECT plus INSERT or UPDATE per token. Repeated tokens are merged
+        (see merge_registration). Returns row ids by token; the caller commits.
+        """
+        latest: Dict[str, Dict[str, Any]] = {}
+        for registration in registrations:
+            if not all(registration.get(key) for key in ('device_id', 'token', 'platform')):
+                raise ValueError("device_id, token, and platform are required")
+            token = registration['token']
+            latest[token] = merge_registration(latest.get(token), registration)
+
+        current_time = now()
+        now_iso = current_time.isoformat()
+        now_ts = to_epoch(current_time)
+        insert_stmt = self._dialect_insert()
+
+        ids: Dict[str, int] = {}
+        new_ids = set()
+        pending = list(latest.values())
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            # Rows the upsert returns with another id (or none before) were inserted by it
+            existing = dict(self.session.query(UserToken.token, UserToken.id).filter(
+                UserToken.token.in_([registration['token'] for registration in chunk])
+            ).all())
+            rows = [{
+                'user_id': registration.get('user_id'),
+                'device_id': registration['device_id'],
+                'token': registration['token'],
+                'platform': registration['platform'],
+                'created_at': now_iso,
+                'updated_ts': now_ts,
+                'topics': sorted(registration['topics']) if registration.get('topics') is not None else None,
+                'cities': registration.get('cities'),
+                'topics_dirty': TOPICS_DIRTY
+            } for registration in chunk]
+
+            stmt = insert_stmt(UserToken).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserToken.token],
+                set_={
+                    'user_id': stmt.excluded.user_id,
+                    'device_id': stmt.excluded.device_id,
+                    'platform': stmt.excluded.platform,
+                    'updated_at': now_iso,
+                    'updated_ts': now_ts
+                }
+            ).returning(UserToken.id, UserToken.token)
+
+            for row in self.session.execute(stmt):
+                ids[row.token] = row.id
+                if existing.get(row.token) != row.id:
+                    new_ids.add(row.id)
+
+        interest_rows = []
+        for registration in pending:
+            token_id = ids[registration['token']]
+            if token_id in new_ids:
+                interest_rows.extend(build_interest_rows(token_id, registration.get('topics'), registration.get('cities')))
+        if interest_rows:
+            # A token another writer inserted after the lookup above already has its rows
+            self.session.execute(insert_stmt(TokenInterest).on_conflict_do_nothing(), interest_rows)
+
+        # Existing tokens that sent a category or city choice may need their index rewritten
+        changed = {ids[r['token']]: r for r in pending
+                   if ids[r['token']] not in new_ids and (r.get('topics') is not None or r.get('cities') is not None)}
+        if changed:
+            for user_token in self.session.query(UserToken).filter(
+                UserToken.id.in_(changed)
+            ).populate_existing():
+                registration = changed[user_token.id]
+                self._apply_interests(user_token, registration.get('topics'), registration.get('cities'))
             self.session.flush()
-            return user_token
+        return ids
+
+    def _dialect_insert(self):
+        """INSERT construct with ON CONFLICT support for the session's database"""
+        if self.session.get_bind().dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+
+    def _apply_interests(self, user_token: UserToken, topics: Optional[List[str]],
+                         cities: Optional[List[str]]):
+        """Record a changed category or city choice and rewrite the token's index rows"""
+        interests_changed = False
+        if topics is not None and sorted(topics) != user_token.topics:
+            user_token.topics = sorted(topics)
+            interests_changed = True
+        if cities is not None and cities != user_token.cities:
+            user_token.cities = cities
+            interests_changed = True
+        if interests_changed:
+            self._write_interests(user_token, replace=True)
+
+    def _write_interests(self, user_token: UserToken, replace: bool = False):
+        if replace:
+            self.session.query(TokenInterest).filter(
+                TokenInterest.token_id == user_token.id
+            ).delete(synchronize_session=False)
+        rows = build_interest_rows(user_token.id, user_token.topics, user_token.cities)
+        if rows:
+            self.session.execute(insert(TokenInterest), rows)
+
+    def get_interested_tokens(self, categories: List[str], cities: List[str]) -> List[str]:
+        """Tokens following any of these category slugs or cities, plus tokens following every category"""
+        return [t['token'] for chunk in self.iter_interested_token_chunks(categories, cities) for t in chunk]
+
+    def iter_interested_token_chunks(self, categories: List[str], cities: List[str],
+                                     chunk_size: int = 500) -> Iterator[List[Dict[str, str]]]:
+        """
+        Stream the tokens get_interested_tokens returns as lists of at most
+        ``chunk_size`` {'token', 'platform'} dicts.
+
+        Each chunk is a keyset query (token_id > last id seen) run once per
+        interest, each leg reading at most ``chunk_size`` ids in order from the
+        (interest_type, value, token_id) index. The legs are merged with UNION,
+        which drops tokens matching several interests, and the lowest
+        ``chunk_size`` ids are kept. A chunk therefore costs the same however
+        deep into the audience it is; an OR across interests would collect and
+        sort every remaining match first. The user_tokens table is only read by
+        primary key, and as with _iter_chunks no cursor stays open between chunks.
+        """
+        interests = [(CATEGORY_INTEREST, value) for value in sorted({ALL_CATEGORIES, *categories})]
+        interests += [(CITY_INTEREST, value)
+                      for value in sorted({normalize_entity_value(city) for city in cities} - {''})]
+
+        last_id = 0
+        while True:
+            legs = []
+            for interest_type, value in interests:
+                leg = select(TokenInterest.token_id).where(
+                    TokenInterest.interest_type == interest_type,
+                    TokenInterest.value == value,
+                    TokenInterest.token_id > last_id
+                ).order_by(TokenInterest.token_id).limit(chunk_size).subquery()
+                legs.append(select(leg.c.token_id))
+            merged = union(*legs).subquery()
+            token_ids = list(self.session.execute(
+                select(merged.c.token_id).order_by(merged.c.token_id).limit(chunk_size)
+            ).scalars())
+            if not token_ids:
+                return
+
+            rows = self.session.query(UserToken.token, UserToken.platform).filter(
+                UserToken.id.in_(token_ids),
+                UserToken.token.isnot(None)
+            ).order_by(UserToken.id).all()
+            if rows:
+                yield [{'token': row.token, 'platform': row.platform} for row in rows]
+            if len(token_ids) < chunk_size:
+                return
+            last_id = token_ids[-1]
+
+    def _delete_interests(self, token_filter) -> None:
+        """Drop index rows of the tokens matching a UserToken filter, before deleting them"""
+        self.session.query(TokenInterest).filter(
+            TokenInterest.token_id.in_(self.session.query(UserToken.id).filter(token_filter))
+        ).delete(synchronize_session=False)
 
     def get_token_by_value(self, token: str) -> Optional[UserToken]:
         """Get token by FCM token value"""
@@ -48,34 +235,169 @@ class TokenRepository:
 
     def get_all_active_tokens(self) -> List[Dict[str, str]]:
         """Get all active tokens for push notifications"""
-        tokens = self.session.query(UserToken).filter(
-            UserToken.token.isnot(None)
-        ).all()
+        return [token for chunk in self.iter_token_chunks() for token in chunk]
+
+    def iter_token_chunks(self, chunk_size: int = 500, shard: int = 0,
+                          shard_count: int = 1) -> Iterator[List[Dict[str, str]]]:
+        """Stream active tokens as lists of at most ``chunk_size`` {'token', 'platform'} dicts.
+
+        With ``shard_count`` > 1 only tokens whose row id falls in ``shard``
+        (id modulo shard_count) are yielded, letting several workers split one
+        broadcast.
+        """
+        filters = [UserToken.token.isnot(None)]
+        if shard_count > 1:
+            filters.append(UserToken.id % shard_count == shard)
+        return self._iter_chunks(filters, chunk_size)
+
+    def iter_unsubscribed_token_chunks(self, chunk_size: int = 500) -> Iterator[List[Dict[str, str]]]:
+        """Stream tokens not yet subscribed to any topic, which topic broadcasts would miss"""
+        return self._iter_chunks([UserToken.token.isnot(None), UserToken.subscribed_topics.is_(None)], chunk_size)
+
+    def _iter_chunks(self, filters, chunk_size: int) -> Iterator[List[Dict[str, str]]]:
+        """
+        Each chunk is its own keyset query (id > last id seen) selecting only the
+        token columns, so a send can start on the first chunk before the rest
+        are read and memory stays bounded. No cursor is held open between
+        chunks: on SQLite that would block progress updates and token pruning
+        for the whole send.
+        """
+        last_id = 0
+        while True:
+            rows = self.session.query(
+                UserToken.id,
+                UserToken.token,
+                UserToken.platform
+            ).filter(
+                UserToken.id > last_id,
+                *filters
+            ).order_by(UserToken.id).limit(chunk_size).all()
+            if not rows:
+                return
+
+            yield [{'token': row.token, 'platform': row.platform} for row in rows]
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1].id
 
-        return [{'token': t.token, 'platform': t.platform} for t in tokens]
+    def claim_topic_sync_batch(self, limit: int = 1000, claim_timeout: int = 600) -> List[UserToken]:
+        """
+        Claim up to ``limit`` tokens whose topic subscriptions need syncing with FCM.
+
+        The status check in the UPDATE keeps two workers from claiming the same
+        tokens. Claims older than ``claim_timeout`` seconds, left by a worker
+        that stopped mid-sync, can be claimed again.
+        """
+        now_ts = to_epoch(now())
+        claimable = or_(
+            UserToken.topics_dirty == TOPICS_DIRTY,
+            and_(UserToken.topics_dirty == TOPICS_CLAIMED, UserToken.topics_claimed_ts < now_ts - claim_timeout)
+        )
+        candidates = [row.id for row in self.session.query(UserToken.id).filter(
+            claimable
+        ).order_by(UserToken.id).limit(limit)]
+        if not candidates:
+            return []
+
+        claimed = [row.id for row in self.session.execute(
+            update(UserToken)
+            .where(UserToken.id.in_(candidates), claimable)
+            .values(topics_dirty=TOPICS_CLAIMED, topics_claimed_ts=now_ts)
+            .returning(UserToken.id)
+            .execution_options(synchronize_session=False)
+        )]
+        self.session.commit()
+        if not claimed:
+            return []
+        return self.session.query(UserToken).filter(
+            UserToken.id.in_(claimed)
+        ).order_by(UserToken.id).populate_existing().all()
+
+    def mark_topics_synced(self, subscribed: Dict[int, List[str]], failed: Iterable[int] = ()):
+        """
+        Record the topics FCM confirmed, keyed by token row id, and hand ``failed``
+        tokens back for a later pass. Tokens queued again while claimed stay queued.
+        """
+        table = UserToken.__table__
+        if subscribed:
+            self.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('token_id'), table.c.topics_dirty == TOPICS_CLAIMED)
+                .values(subscribed_topics=bindparam('synced_topics'), topics_dirty=TOPICS_SYNCED),
+                [{'token_id': token_id, 'synced_topics': topics} for token_id, topics in subscribed.items()]
+            )
+        failed = list(failed)
+        if failed:
+            self.session.execute(
+                table.update()
+                .where(table.c.id.in_(failed), table.c.topics_dirty == TOPICS_CLAIMED)
+                .values(topics_dirty=TOPICS_DIRTY)
+            )
+        self.session.commit()
+
+    def mark_all_topics_dirty(self) -> int:
+        """Queue every token for topic re-subscription (e.g. after the topic list changed)"""
+        count = self.session.query(UserToken).update(
+            {UserToken.topics_dirty: TOPICS_DIRTY}, synchronize_session=False
+        )
+        self.session.commit()
+        return count
 
     def delete_token(self, token: str) -> bool:
         """Delete a token"""
         user_token = self.get_token_by_value(token)
         if user_token:
+            self._delete_interests(UserToken.id == user_token.id)
             self.session.delete(user_token)
             self.session.commit()
             return True
         return False
 
+    def delete_tokens(self, tokens: List[str], chunk_size: int = 500) -> int:
+        """Bulk-delete tokens FCM reported as invalid. Returns the number deleted."""
+        tokens = list(set(tokens))
+        deleted_count = 0
+        for i in range(0, len(tokens), chunk_size):
+            chunk_filter = UserToken.token.in_(tokens[i:i + chunk_size])
+            self._delete_interests(chunk_filter)
+            deleted_count += self.session.query(UserToken).filter(
+                chunk_filter
+            ).delete(synchronize_session=False)
+
+        if deleted_count:
+            AppStateRepository(self.session).increment(TOKENS_PRUNED_INVALID, deleted_count)
+        self.session.commit()
+        return deleted_count
+
     def cleanup_expired_tokens(self, days_old: int = 90) -> int:
         """Remove tokens that haven't been updated in specified days"""
         from datetime import timedelta
-        cutoff_date = datetime.now() - timedelta(days=days_old)
-        cutoff_str = cutoff_date.isoformat()
+        cutoff_ts = to_epoch(now() - timedelta(days=days_old))
 
+        self._delete_interests(UserToken.updated_ts < cutoff_ts)
         deleted_count = self.session.query(UserToken).filter(
-            UserToken.updated_at < cutoff_str
-        ).delete()
+            UserToken.updated_ts < cutoff_ts
+        ).delete(synchronize_session=False)
+
+        app_state = AppStateRepository(self.session)
+        if deleted_count:
+            app_state.increment(TOKENS_PRUNED_EXPIRED, deleted_count)
+        app_state.set(TOKENS_CLEANUP_TS, to_epoch(now()))
 
         self.session.commit()
         return deleted_count
 
+    def get_prune_stats(self) -> Dict[str, Any]:
+        """Totals of pruned tokens and when the age-based cleanup last ran"""
+        counters = AppStateRepository(self.session).get_many(
+            [TOKENS_PRUNED_INVALID, TOKENS_PRUNED_EXPIRED, TOKENS_CLEANUP_TS]
+        )
+        return {
+            'invalid_tokens_pruned': counters[TOKENS_PRUNED_INVALID],
+            'expired_tokens_pruned': counters[TOKENS_PRUNED_EXPIRED],
+            'last_expired_cleanup_ts': counters[TOKENS_CLEANUP_TS] or None
+        }
+
     def get_token_stats(self) -> Dict[str, Any]:
         """Get statistics about stored tokens"""
         from sqlalchemy import func
@@ -5,7 +5,7 @@ setup(
     version="1.0.0",
     packages=find_packages(),
     install_requires=[
-        "sqlalchemy>=1.4.0",
+        "sqlalchemy>=2.0",
         "alembic>=1.7.0",
         "python-dotenv>=0.19.0",
         "pytest>=7.0.0",
@@ -0,0 +1,185 @@
+"""
+Pre-rendered JSON snapshots of the hottest API responses.
+
+The pipeline writes each response body to a versioned directory as both
+``.json`` and pre-compressed ``.json.gz`` and then atomically replaces
+``manifest.json``, which maps request keys (path plus normalized query
+string) to files and records the data version they were rendered from:
+
+    <root>/manifest.json
+    <root>/v<version>/<sha1 of key>.json
+    <root>/v<version>/<sha1 of key>.json.gz
+
+The API maps those files into memory and serves them directly when a request
+matches a snapshot key and the manifest is current, falling back to live
+queries otherwise.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import platform
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlencode
+
+from .json_utils import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = '/var/www/sudanese_news/shared/snapshots' if platform.system() != 'Windows' else '../shared_models/snapshots'
+
+# Bytes handed to the WSGI server per write when streaming a snapshot
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Query arguments that do not change a response when set to these values
+DEFAULT_ARGS = {
+    '/api/clusters': {'category': 'all', 'limit': '50', 'q': '', 'city': '', 'has_entities': ''},
+}
+
+# Snapshot versions kept on disk (older ones may still be mapped by API workers)
+KEEP_VERSIONS = 3
+
+def get_snapshot_dir() -> str:
+    """Snapshot directory from environment or default"""
+    return os.getenv('SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR)
+
+def snapshot_key(path: str, args) -> str:
+    """Normalized request key: path plus sorted query args, defaults dropped.
+
+    ``args`` is a mapping or a werkzeug MultiDict.
+    """
+    defaults = DEFAULT_ARGS.get(path, {})
+    items = args.items(multi=True) if hasattr(args, 'getlist') else args.items()
+    pairs = sorted((name, value) for name, value in items
+                   if value != '' and defaults.get(name) != value)
+    return f"{path}?{urlencode(pairs)}" if pairs else path
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class SnapshotWriter:
+    """Collects rendered responses for one data version and publishes them together"""
+
+    def __init__(self, root: str, version: int):
+        self.root = Path(root)
+        self.version = version
+        self.directory = self.root / f'v{version}'
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, key: str, payload: Any, headers: Optional[Dict[str, str]] = None):
+        """Render one response body (JSON and gzip) into the version directory"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Same serializer as the API's JSON provider, so snapshot and live bodies match
+        body = dumps_bytes(payload)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+        _write_atomic(self.directory / f'{name}.json', body)
+        _write_atomic(self.directory / f'{name}.json.gz', gzip.compress(body, compresslevel=9, mtime=0))
+
+        self.entries[key] = {'file': name, 'headers': headers or {}}
+
+    def publish(self) -> Path:
+        """Point the manifest at this version and prune old version directories"""
+        manifest = {
+            'version': self.version,
+            'created_at': int(time.time()),
+            'entries': self.entries
+        }
+        manifest_path = self.root / 'manifest.json'
+        _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+
+        versions = sorted(
+            (int(p.name[1:]) for p in self.root.glob('v*') if p.is_dir() and p.name[1:].isdigit()),
+            reverse=True
+        )
+        for old in versions[KEEP_VERSIONS:]:
+            shutil.rmtree(self.root / f'v{old}', ignore_errors=True)
+
+        return manifest_path
+
+class SnapshotReader:
+    """Serves snapshot files from memory maps, re-reading the manifest when it changes"""
+
+    def __init__(self, root: str, check_interval: float = 2.0):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_mtime = None
+        self._checked = 0.0
+        self._maps: Dict[str, mmap.mmap] = {}
+
+    def _current_manifest(self) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return self._manifest
+
+        with self._lock:
+            self._checked = now
+            manifest_path = self.root / 'manifest.json'
+            try:
+                mtime = manifest_path.stat().st_mtime_ns
+            except OSError:
+                self._manifest, self._manifest_mtime, self._maps = None, None, {}
+                return None
+
+            if mtime != self._manifest_mtime:
+                try:
+                    with open(manifest_path, 'rb') as f:
+                        self._manifest = json.load(f)
+                    self._manifest_mtime = mtime
+                    # Old maps stay valid for requests using them and close when released
+                    self._maps = {}
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not read snapshot manifest {manifest_path}: {e}")
+            return self._manifest
+
+    def _map(self, path: Path) -> Optional[mmap.mmap]:
+        key = str(path)
+        mapped = self._maps.get(key)
+        if mapped is None:
+            try:
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not map snapshot {path}: {e}")
+                return None
+            self._maps[key] = mapped
+        return mapped
+
+    def get(self, key: str, version: int, gzipped: bool = False) -> Optional[Tuple[memoryview, Dict[str, str]]]:
+        """Body and stored headers for a key, or None if there is no current snapshot.
+
+        The body is a view of the mapped file rather than a copy; pass it to
+        iter_chunks to stream it. Snapshots rendered for another data version
+        are ignored so the API never serves data older than what live queries
+        would return.
+        """
+        manifest = self._current_manifest()
+        if not manifest or manifest.get('version') != version:
+            return None
+
+        entry = manifest['entries'].get(key)
+        if not entry:
+            return None
+
+        suffix = '.json.gz' if gzipped else '.json'
+        mapped = self._map(self.root / f"v{manifest['version']}" / f"{entry['file']}{suffix}")
+        if mapped is None:
+            return None
+        return memoryview(mapped), entry.get('headers', {})
+
+def iter_chunks(body: memoryview, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a snapshot body as bytes, copying one chunk at a time"""
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size].tobytes()
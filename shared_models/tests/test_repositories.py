@@ -6,16 +6,27 @@ transactions. Uses in-memory SQLite for fast, isolated testing.
 """
 
 import pytest
+import gzip
+import json
+import time
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
-from ..models import Base, Article
+from ..models import Base, Article, EntityMention, TokenInterest, UserToken
 from ..repositories.article_repository import ArticleRepository
 from ..repositories.source_repository import SourceRepository
 from ..repositories.cluster_repository import ClusterRepository
 from ..repositories.entity_repository import EntityRepository
 from ..repositories.token_repository import TokenRepository
+from ..repositories.search_repository import SearchRepository, _search_ready
+from ..repositories.app_state_repository import AppStateRepository, DATA_VERSION
+from ..repositories.event_repository import EventRepository, CLUSTER_CREATED, TRENDING_CHANGED
+from ..repositories.notification_job_repository import NotificationJobRepository, QUEUED, RUNNING, DONE, FAILED
+from ..repositories.notification_log_repository import NotificationLogRepository, POPULAR_CLUSTER
+from ..timezone_utils import to_epoch, now
+from ..json_utils import dumps_bytes, ORJSON_AVAILABLE
+from ..snapshots import SnapshotWriter, SnapshotReader, snapshot_key, iter_chunks
 
 
 @pytest.fixture
@@ -227,15 +238,39 @@ class TestArticleRepository:
         assert retrieved is None
 
     def test_get_recent_unclustered(self, test_db, sample_data):
-        """Test getting recent unclustered articles"""
+        """Test streaming recent unclustered articles within the time window"""
+        source_repo = SourceRepository(test_db)
         article_repo = ArticleRepository(test_db)
+        cluster_repo = ClusterRepository(test_db)
 
-        # Initially all articles should be unclustered
-        articles = article_repo.get_recent_unclustered(hours=24)
-        assert len(articles) == 2
+        source = source_repo.get_or_create_source("https://example.com/rss")
+        recent_at = (now() - timedelta(hours=2)).strftime("%Y-%m-%d %H:%M:%S")
+        recent = article_repo.insert_article(
+            source_id=source.id,
+            headline="Recent headline",
+            description="Recent description",
+            published_at=recent_at,
+            article_url="https://example.com/recent"
+        )
+        clustered = article_repo.insert_article(
+            source_id=source.id,
+            headline="Clustered headline",
+            description="Clustered description",
+            published_at=recent_at,
+            article_url="https://example.com/clustered"
+        )
+        cluster = cluster_repo.create_cluster("Cluster", 1, recent_at)
+        cluster.add_article(test_db, clustered, 1.0)
 
-        # Note: Time filtering is disabled for testing purposes
-        # In production, this would filter by actual time
+        # sample_data articles are from 2025 and fall outside the window
+        articles = list(article_repo.get_recent_unclustered(hours=24))
+        assert [a['id'] for a in articles] == [recent.id]
+        assert articles[0]['source'] == "https://example.com/rss"
+        assert articles[0]['published_at'] == recent_at
+
+        # A wide enough window includes the old unclustered articles as well
+        articles = list(article_repo.get_recent_unclustered(hours=24 * 365 * 50))
+        assert len(articles) == 3
 
     def test_list_by_filters(self, test_db, sample_data):
         """Test filtering articles"""
@@ -265,6 +300,52 @@ class TestArticleRepository:
         assert updated.cluster_id == 123
 
 
+    def test_insert_article_sets_epoch_timestamps(self, test_db):
+        """Test that typed epoch columns are filled from the string timestamps"""
+        source_repo = SourceRepository(test_db)
+        article_repo = ArticleRepository(test_db)
+
+        source = source_repo.get_or_create_source("https://example.com/rss")
+        article = article_repo.insert_article(
+            source_id=source.id,
+            headline="Timestamped",
+            description="Has epoch columns",
+            published_at="2025-01-01 12:00:00",
+            article_url="https://example.com/ts"
+        )
+
+        assert article.published_ts == to_epoch("2025-01-01T12:00:00")
+        assert article.created_ts is not None
+
+    def test_list_by_filters_date_range_mixed_formats(self, test_db, sample_data):
+        """Test that date filters compare epochs, not strings of mixed formats"""
+        article_repo = ArticleRepository(test_db)
+
+        # "2025-01-15 10:30:00" sorts after "2025-01-15T..." as a string; as an epoch it does not
+        articles = article_repo.list_by_filters({"date_from": "2025-01-15 10:30:00"})
+        assert [a["headline"] for a in articles] == ["International Development"]
+
+
+class TestTimezoneUtils:
+    """Test epoch conversion helpers"""
+
+    def test_to_epoch_mixed_formats(self):
+        """Pipeline, ISO and offset-aware strings resolve to the same instant"""
+        pipeline_format = to_epoch("2025-01-15 10:00:00")
+        iso_format = to_epoch("2025-01-15T10:00:00")
+        assert pipeline_format == iso_format
+
+        aware = now()
+        assert to_epoch(aware.isoformat()) == int(aware.timestamp())
+        assert to_epoch(aware) == int(aware.timestamp())
+
+    def test_to_epoch_invalid(self):
+        """Empty or unparseable values map to None"""
+        assert to_epoch(None) is None
+        assert to_epoch("") is None
+        assert to_epoch("N/A") is None
+
+
 class TestEntityRepository:
     """Test EntityRepository functionality"""
 
@@ -285,6 +366,31 @@ class TestEntityRepository:
         # Verify entities were inserted (would need additional query methods)
         # This is tested implicitly through integration tests
 
+    def test_insert_entities_writes_mentions(self, test_db, sample_data):
+        """Test that entity lists are mirrored into entity_mentions"""
+        article_id = sample_data['articles'][0].id
+
+        mentions = test_db.query(EntityMention).filter(
+            EntityMention.article_id == article_id
+        ).all()
+        pairs = {(m.entity_type, m.display_value) for m in mentions}
+        assert ('cities', 'Khartoum') in pairs
+        assert ('people', 'Jane Smith') in pairs
+        assert all(m.normalized_value == m.display_value.lower() for m in mentions)
+
+    def test_update_entities_rewrites_mentions(self, test_db, sample_data):
+        """Test that updating an entity list replaces its mentions"""
+        entity_repo = EntityRepository(test_db)
+        article_id = sample_data['articles'][0].id
+
+        entity_repo.update_entities(article_id, cities=["Omdurman"])
+
+        cities = test_db.query(EntityMention.display_value).filter(
+            EntityMention.article_id == article_id,
+            EntityMention.entity_type == 'cities'
+        ).all()
+        assert [c[0] for c in cities] == ["Omdurman"]
+
     def test_insert_entities_empty(self, test_db, sample_data):
         """Test inserting empty entities"""
         entity_repo = EntityRepository(test_db)
@@ -357,6 +463,57 @@ class TestClusterRepository:
         assert len(clusters) == 1
         assert clusters[0].title == "Politics News"
 
+        clusters, total = cluster_repo.get_clusters_with_filters(query="News", with_total=False)
+        assert len(clusters) == 2
+        assert total is None
+
+    def test_get_clusters_page_keyset(self, test_db):
+        """Test cursor pagination walks every cluster once, newest first"""
+        cluster_repo = ClusterRepository(test_db)
+
+        # Two clusters share a timestamp so the id tiebreaker is exercised
+        created = [
+            cluster_repo.create_cluster(f"Cluster {i}", 1, f"2025-01-15T1{i // 2}:00:00")
+            for i in range(5)
+        ]
+
+        seen = []
+        cursor = None
+        while True:
+            clusters, cursor = cluster_repo.get_clusters_page(cursor=cursor, limit=2)
+            seen.extend(c.id for c in clusters)
+            if cursor is None:
+                break
+
+        expected = sorted(created, key=lambda c: (c.published_ts, c.id), reverse=True)
+        assert seen == [c.id for c in expected]
+
+    def test_get_clusters_page_undated_last(self, test_db):
+        """Test clusters without a usable date are still listed, after the dated ones"""
+        cluster_repo = ClusterRepository(test_db)
+        dated = [cluster_repo.create_cluster(f"Dated {i}", 1, f"2025-01-15T1{i}:00:00") for i in range(2)]
+        undated = [cluster_repo.create_cluster(f"Undated {i}", 1, value) for i, value in enumerate([None, "bogus", None])]
+        assert all(c.published_ts is None for c in undated)
+
+        seen = []
+        cursor = None
+        while True:
+            clusters, cursor = cluster_repo.get_clusters_page(cursor=cursor, limit=2)
+            seen.extend(c.id for c in clusters)
+            if cursor is None:
+                break
+
+        assert seen == [dated[1].id, dated[0].id] + [c.id for c in reversed(undated)]
+        clusters, _ = cluster_repo.get_clusters_with_filters(limit=10)
+        assert [c.id for c in clusters] == seen
+
+    def test_get_clusters_page_invalid_cursor(self, test_db):
+        """Test malformed cursors are rejected"""
+        cluster_repo = ClusterRepository(test_db)
+
+        with pytest.raises(ValueError):
+            cluster_repo.get_clusters_page(cursor="not-a-cursor")
+
     def test_get_cluster_details(self, test_db, sample_data):
         """Test getting detailed cluster information"""
         cluster_repo = ClusterRepository(test_db)
@@ -371,6 +528,530 @@ class TestClusterRepository:
         assert details['title'] == "Test Cluster"
         assert 'articles' in details
 
+    def test_get_cluster_details_many(self, test_db, sample_data):
+        """Test batched details use a fixed number of queries"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        cluster1 = cluster_repo.create_cluster("Cluster 1", 1, "2025-01-15T10:00:00")
+        cluster2 = cluster_repo.create_cluster("Cluster 2", 2, "2025-01-15T11:00:00")
+        cluster1.add_article(test_db, article1, 1.0)
+        cluster2.add_article(test_db, article1, 0.7)
+        cluster2.add_article(test_db, article2, 0.9)
+        test_db.flush()
+        ids = [cluster1.id, cluster2.id, 999]
+        test_db.expire_all()
+
+        statements = []
+        listen_target = test_db.get_bind()
+        def count(*args):
+            statements.append(args)
+        event.listen(listen_target, "before_cursor_execute", count)
+        try:
+            details = cluster_repo.get_cluster_details_many(ids)
+        finally:
+            event.remove(listen_target, "before_cursor_execute", count)
+
+        assert len(statements) == 3
+        assert set(details) == set(ids[:2])
+        assert len(details[ids[1]]['articles']) == 2
+        article = next(a for a in details[ids[1]]['articles'] if a['id'] == article2.id)
+        assert article['source_name'] == "Dabanga Sudan"
+        assert article['similarity_score'] == 0.9
+        assert article['entities']['cities'] == ["Port Sudan"]
+
+    def test_get_cluster_details_fields_and_article_paging(self, test_db, sample_data):
+        """Test sparse fields and keyset paging of embedded articles"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        cluster = cluster_repo.create_cluster("Cluster", 2, "2025-01-15T10:00:00")
+        cluster.add_article(test_db, article1, 1.0)
+        cluster.add_article(test_db, article2, 0.9)
+        test_db.flush()
+
+        details = cluster_repo.get_cluster_details(
+            cluster.id, fields=['title', 'bias_distribution', 'articles.headline'], articles_limit=1
+        )
+        assert set(details) == {'id', 'title', 'bias_distribution', 'articles', 'articles_next_cursor'}
+        assert details['articles'] == [{'id': article1.id, 'headline': article1.headline}]
+
+        rest = cluster_repo.get_cluster_details(
+            cluster.id, fields=['articles.headline'], articles_limit=1,
+            articles_cursor=details['articles_next_cursor']
+        )
+        assert [a['id'] for a in rest['articles']] == [article2.id]
+        assert rest['articles_next_cursor'] is None
+
+        with pytest.raises(ValueError):
+            cluster_repo.get_cluster_details(cluster.id, fields=['articles.unknown'])
+        with pytest.raises(ValueError):
+            cluster_repo.get_cluster_details(cluster.id, articles_limit=1, articles_cursor='bogus')
+
+    def test_calculate_blindspot(self, test_db, sample_data):
+        """Test bias counts come from the articles' sources"""
+        cluster_repo = ClusterRepository(test_db)
+        source1, source2 = sample_data['sources']
+        article1, article2 = sample_data['articles']
+        source1.bias = "pro_saf"
+        source2.bias = "oppose_saf"
+
+        cluster = cluster_repo.create_cluster("Cluster", 2, "2025-01-15T10:00:00")
+        cluster.add_article(test_db, article1, 1.0)
+        cluster.add_article(test_db, article2, 0.9)
+        test_db.flush()
+
+        metrics = cluster_repo.calculate_blindspot(cluster.id)
+        assert metrics['pro_count'] == 1
+        assert metrics['oppose_count'] == 1
+        assert metrics['neutral_count'] == 0
+        assert cluster_repo.calculate_blindspot(999) is None
+
+    def test_get_changes_reports_updates_and_deletions(self, test_db, sample_data):
+        """Test delta sync returns changed clusters and tombstones after a cursor"""
+        cluster_repo = ClusterRepository(test_db)
+        source1, _ = sample_data['sources']
+        article1, _ = sample_data['articles']
+        source1.bias = "pro_saf"
+
+        first = cluster_repo.create_cluster("First", 1, "2025-01-15T10:00:00")
+        clusters, deleted, cursor, has_more = cluster_repo.get_changes()
+        assert (clusters, deleted, has_more) == ([], [], False)
+
+        second = cluster_repo.create_cluster("Second", 1, "2025-01-15T11:00:00")
+        second.add_article(test_db, article1, 1.0)
+        test_db.flush()
+        assert cluster_repo.update_cluster_blindspot(second.id)
+        assert cluster_repo.delete_cluster(first.id)
+        # Unchanged blindspot data does not produce another change
+        seq = second.change_seq
+        cluster_repo.update_cluster_blindspot(second.id)
+        assert second.change_seq == seq
+
+        clusters, deleted, next_cursor, has_more = cluster_repo.get_changes(cursor)
+        assert [c.id for c in clusters] == [second.id]
+        assert deleted == [first.id]
+        assert not has_more
+        assert second.updated_at is not None
+
+        clusters, deleted, _, has_more = cluster_repo.get_changes(cursor, limit=1)
+        assert [c.id for c in clusters] == [second.id] and deleted == [] and has_more
+
+        assert cluster_repo.get_changes(next_cursor)[:2] == ([], [])
+        with pytest.raises(ValueError):
+            cluster_repo.get_changes('bogus')
+
+    def test_delete_cluster_removes_dependent_rows(self, test_db):
+        """Test deleting a cluster also drops its events and notification log, and only its own"""
+        cluster_repo = ClusterRepository(test_db)
+        event_repo = EventRepository(test_db)
+        log_repo = NotificationLogRepository(test_db)
+        doomed = cluster_repo.create_cluster("Doomed", 1, "2025-01-15T10:00:00")
+        kept = cluster_repo.create_cluster("Kept", 1, "2025-01-15T11:00:00")
+        for cluster in (doomed, kept):
+            event_repo.publish(CLUSTER_CREATED, cluster.id)
+            log_repo.record_sent(POPULAR_CLUSTER, cluster.id, 5)
+
+        assert cluster_repo.delete_cluster(doomed.id)
+        test_db.commit()
+
+        assert [e.cluster_id for e in event_repo.get_since(0)] == [kept.id]
+        assert log_repo.get_sent_counts(POPULAR_CLUSTER, [doomed.id, kept.id]) == {kept.id: 5}
+
+    def test_small_velocity_changes_not_republished(self, test_db, sample_data):
+        """Test recomputed velocity only bumps change_seq once it moves past the tolerance"""
+        cluster_repo = ClusterRepository(test_db)
+        cluster = cluster_repo.create_cluster("Cluster", 1, now().strftime("%Y-%m-%d %H:%M:%S"))
+        for article in sample_data['articles']:
+            cluster.add_article(test_db, article, 1.0)
+        test_db.flush()
+
+        assert cluster_repo.calculate_trending(cluster.id)
+        assert (cluster.coverage_velocity, cluster.published_velocity) == (2.0, 2.0)
+        seq = cluster.change_seq
+
+        # Velocity is stored for ordering even when the change is too small to publish
+        cluster.published_velocity = 1.8
+        cluster.coverage_velocity = 0.0
+        cluster_repo.calculate_trending(cluster.id)
+        assert (cluster.coverage_velocity, cluster.published_velocity, cluster.change_seq) == (2.0, 1.8, seq)
+
+        # Small steps add up against the last published value
+        cluster.published_velocity = 1.0
+        cluster_repo.calculate_trending(cluster.id)
+        assert (cluster.coverage_velocity, cluster.published_velocity) == (2.0, 2.0)
+        assert cluster.change_seq > seq
+
+    def test_get_trending_clusters_time_window(self, test_db):
+        """Test that trending clusters are filtered on the epoch column"""
+        cluster_repo = ClusterRepository(test_db)
+
+        recent = cluster_repo.create_cluster("Recent", 3, now().strftime("%Y-%m-%d %H:%M:%S"))
+        old = cluster_repo.create_cluster("Old", 3, "2020-01-01 00:00:00")
+        recent.is_trending = True
+        old.is_trending = True
+        test_db.flush()
+
+        trending = cluster_repo.get_trending_clusters(limit=10)
+        assert [c.id for c in trending] == [recent.id]
+
+    def test_get_popular_clusters(self, test_db, sample_data):
+        """Test popular clusters are recent ones ranked by article count"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        big = cluster_repo.create_cluster("Big", 2, "2025-01-15T10:00:00")
+        big.add_article(test_db, article1, 1.0)
+        big.add_article(test_db, article2, 0.9)
+        small = cluster_repo.create_cluster("Small", 1, "2025-01-15T11:00:00")
+        small.add_article(test_db, article1, 1.0)
+        old = cluster_repo.create_cluster("Old", 2, "2025-01-15T09:00:00")
+        old.add_article(test_db, article1, 1.0)
+        old.add_article(test_db, article2, 0.9)
+        old.created_ts = to_epoch(now() - timedelta(hours=72))
+        test_db.flush()
+
+        popular = cluster_repo.get_popular_clusters(hours=48, min_articles=2)
+        assert [(c['id'], c['article_count']) for c in popular] == [(big.id, 2)]
+        assert [c['id'] for c in cluster_repo.get_popular_clusters(hours=48, min_articles=1)] == [big.id, small.id]
+        assert len(cluster_repo.get_popular_clusters(hours=96, min_articles=1, limit=2)) == 2
+
+    def test_get_cluster_interests(self, test_db, sample_data):
+        """Test a cluster's category slugs and cities come from its articles' entities"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        cluster = cluster_repo.create_cluster("Story", 2, "2025-01-15T10:00:00")
+        cluster.add_article(test_db, article1, 1.0)
+        cluster.add_article(test_db, article2, 0.9)
+        test_db.flush()
+
+        categories, cities = cluster_repo.get_cluster_interests(cluster.id)
+        assert categories == ["economy", "politics"]
+        assert cities == ["khartoum", "port sudan"]
+
+
+    def test_get_all_cities(self, test_db, sample_data):
+        """Test distinct city listing from entity_mentions"""
+        entity_repo = EntityRepository(test_db)
+        cluster_repo = ClusterRepository(test_db)
+
+        # Hamza and diacritic variants fold into one city
+        entity_repo.insert_entities(article_id=sample_data['articles'][1].id, cities=["الفاشِر"])
+        entity_repo.insert_entities(article_id=sample_data['articles'][0].id, cities=["الفاشر"])
+
+        cities = cluster_repo.get_all_cities()
+        assert "Khartoum" in cities
+        assert "Port Sudan" in cities
+        assert len([c for c in cities if c.startswith("الفاش")]) == 1
+
+    def test_get_clusters_with_filters_city(self, test_db, sample_data):
+        """Test city filter through the entity_mentions index"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        cluster1 = cluster_repo.create_cluster("Khartoum story", 1, "2025-01-15T10:00:00")
+        cluster1.add_article(test_db, article1, 1.0)
+        cluster2 = cluster_repo.create_cluster("Port Sudan story", 1, "2025-01-15T11:00:00")
+        cluster2.add_article(test_db, article2, 1.0)
+
+        clusters, total = cluster_repo.get_clusters_with_filters(city="khartoum")
+        assert [c.id for c in clusters] == [cluster1.id]
+        assert total == 1
+
+
+    def test_refresh_cluster_card(self, test_db, sample_data):
+        """Test denormalized card fields computed from a cluster's articles"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        cluster = cluster_repo.create_cluster("Card Cluster", 2, "2025-01-15T10:00:00")
+        cluster.add_article(test_db, article2, 0.8)
+        cluster.add_article(test_db, article1, 1.0)
+
+        assert cluster_repo.refresh_cluster_card(cluster.id)
+
+        card = cluster_repo.get_cluster_cards([cluster.id])[cluster.id]
+        assert card['article_count'] == 2
+        # The earliest article provides the card text
+        assert card['first_article_id'] == article1.id
+        assert card['description'] == "A significant event occurred today"
+        assert card['first_published_at'] == "2025-01-15T10:00:00"
+        assert card['top_country'] == "Sudan"
+        assert card['top_city'] in ("Khartoum", "Port Sudan")
+        assert card['nlp_category'] in ("سياسة", "اقتصاد")
+        assert set(card['bias_distribution']) == {'pro_saf', 'neutral', 'oppose_saf'}
+
+    def test_get_cluster_cards_build_missing(self, test_db, sample_data):
+        """Test missing cards are computed in one batch and match stored ones"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        stored = cluster_repo.create_cluster("Stored", 2, "2025-01-15T10:00:00")
+        stored.add_article(test_db, article1, 1.0)
+        stored.add_article(test_db, article2, 0.9)
+        missing = cluster_repo.create_cluster("Missing", 2, "2025-01-15T11:00:00")
+        missing.add_article(test_db, article1, 1.0)
+        missing.add_article(test_db, article2, 0.9)
+        cluster_repo.refresh_cluster_card(stored.id)
+
+        assert set(cluster_repo.get_cluster_cards([stored.id, missing.id])) == {stored.id}
+
+        cards = cluster_repo.get_cluster_cards([stored.id, missing.id, 999], build_missing=True)
+        assert set(cards) == {stored.id, missing.id}
+        for key in ('article_count', 'first_article_id', 'top_city', 'top_country', 'nlp_category'):
+            assert cards[missing.id][key] == cards[stored.id][key]
+
+    def test_refresh_cluster_card_updates_existing(self, test_db, sample_data):
+        """Test that refreshing again overwrites the stored card"""
+        cluster_repo = ClusterRepository(test_db)
+        article1, article2 = sample_data['articles']
+
+        cluster = cluster_repo.create_cluster("Card Cluster", 1, "2025-01-15T10:00:00")
+        cluster.add_article(test_db, article1, 1.0)
+        cluster_repo.refresh_cluster_card(cluster.id)
+
+        cluster.add_article(test_db, article2, 0.9)
+        cluster_repo.refresh_cluster_card(cluster.id)
+
+        cards = cluster_repo.get_cluster_cards([cluster.id, 999])
+        assert list(cards) == [cluster.id]
+        assert cards[cluster.id]['article_count'] == 2
+
+
+class TestSearchRepository:
+    """Test full-text search over clusters and articles"""
+
+    def test_search_available_on_sqlite(self, test_db):
+        """FTS tables are created alongside the ORM tables"""
+        assert SearchRepository(test_db).is_available()
+
+    def test_availability_check_keeps_transaction(self, test_db):
+        """Checking for the FTS tables must not roll back pending inserts"""
+        _search_ready.clear()
+        cluster_repo = ClusterRepository(test_db)
+
+        cluster1 = cluster_repo.create_cluster("Cluster 1", 1, "2025-01-15T10:00:00")
+        cluster2 = cluster_repo.create_cluster("Cluster 2", 1, "2025-01-15T11:00:00")
+
+        assert cluster1.id != cluster2.id
+        assert cluster_repo.get_total_clusters() == 2
+
+    def test_missing_search_tables_checked_once(self, tmp_path):
+        """A database without FTS tables is not inspected again on every write"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        session = sessionmaker(bind=engine)()
+
+        assert not SearchRepository(session).is_available()
+        checked = len(statements)
+        SearchRepository(session).index_cluster(1, "title")
+        assert not SearchRepository(session).is_available()
+        assert len(statements) == checked
+        session.close()
+
+    def test_cluster_search_arabic_normalization(self, test_db):
+        """Hamza, taa marbuta and diacritic variants match"""
+        cluster_repo = ClusterRepository(test_db)
+        cluster = cluster_repo.create_cluster("اشتباكات في مدينة الفاشر", 2, "2025-01-15T10:00:00")
+        cluster_repo.create_cluster("أخبار الاقتصاد", 1, "2025-01-15T11:00:00")
+
+        clusters, total = cluster_repo.get_clusters_with_filters(query="مدينه الفَاشر")
+        assert [c.id for c in clusters] == [cluster.id]
+        assert total == 1
+
+    def test_cluster_search_prefix_and_rank(self, test_db):
+        """Terms match as prefixes and better matches rank first"""
+        cluster_repo = ClusterRepository(test_db)
+        weak = cluster_repo.create_cluster("Talks resume in Jeddah next week", 2, "2025-01-15T12:00:00")
+        strong = cluster_repo.create_cluster("Jeddah talks: Jeddah host confirms", 2, "2025-01-15T10:00:00")
+
+        clusters, _ = cluster_repo.get_clusters_with_filters(query="jedd")
+        assert [c.id for c in clusters] == [strong.id, weak.id]
+
+    def test_article_keyword_search(self, test_db, sample_data):
+        """Keyword filter on articles uses the article index"""
+        article_repo = ArticleRepository(test_db)
+
+        articles = article_repo.list_by_filters({"keyword": "signific"})
+        assert [a["headline"] for a in articles] == ["Breaking News: Major Event"]
+
+    def test_rebuild(self, test_db, sample_data):
+        """Rebuild repopulates both tables from the source rows"""
+        cluster_repo = ClusterRepository(test_db)
+        cluster_repo.create_cluster("Rebuilt Cluster", 1, "2025-01-15T10:00:00")
+        test_db.execute(text("DELETE FROM cluster_search"))
+        test_db.execute(text("DELETE FROM article_search"))
+
+        counts = SearchRepository(test_db).rebuild()
+        assert counts == {'clusters': 1, 'articles': 2}
+
+        clusters, _ = cluster_repo.get_clusters_with_filters(query="rebuilt")
+        assert len(clusters) == 1
+
+
+class TestAppStateRepository:
+    """Test AppStateRepository functionality"""
+
+    def test_data_version_starts_at_zero(self, test_db):
+        """Test an unset counter reads as the default"""
+        repo = AppStateRepository(test_db)
+        assert repo.get_data_version() == 0
+        assert repo.get('missing', default=7) == 7
+
+    def test_bump_data_version(self, test_db):
+        """Test bumping creates the counter and then increments it"""
+        repo = AppStateRepository(test_db)
+        assert repo.bump_data_version() == 1
+        assert repo.bump_data_version() == 2
+        assert repo.get_data_version() == 2
+        assert repo.get_many([DATA_VERSION, 'other']) == {DATA_VERSION: 2, 'other': 0}
+
+
+class TestEventRepository:
+    """Test cluster event log"""
+
+    def test_publish_and_read_since(self, test_db):
+        """Test events are read back in id order after a given id"""
+        event_repo = EventRepository(test_db)
+        assert event_repo.get_latest_id() == 0
+
+        first = event_repo.publish(CLUSTER_CREATED, 1, {'cluster_id': 1, 'title': 'عنوان'})
+        second = event_repo.publish(TRENDING_CHANGED, 2, {'cluster_id': 2, 'is_trending': True})
+
+        assert [e.id for e in event_repo.get_since(0)] == [first.id, second.id]
+        events = event_repo.get_since(first.id)
+        assert [e.event_type for e in events] == [TRENDING_CHANGED]
+        assert events[0].payload == {'cluster_id': 2, 'is_trending': True}
+        assert event_repo.get_latest_id() == second.id
+
+    def test_prune(self, test_db):
+        """Test old events are pruned"""
+        event_repo = EventRepository(test_db)
+        old = event_repo.publish(CLUSTER_CREATED, 1)
+        old.created_ts -= 10 * 86400
+        recent = event_repo.publish(CLUSTER_CREATED, 2)
+        test_db.flush()
+
+        assert event_repo.prune(keep_days=7) == 1
+        assert [e.id for e in event_repo.get_since(0)] == [recent.id]
+
+
+    def test_event_ids_not_reused(self, test_db):
+        """Test deleting the newest event does not hand its id to the next one"""
+        event_repo = EventRepository(test_db)
+        event_repo.publish(CLUSTER_CREATED, 1)
+        newest = event_repo.publish(CLUSTER_CREATED, 2)
+        seen_id = newest.id
+        event_repo.remove_cluster(2)
+        test_db.commit()
+
+        assert event_repo.publish(CLUSTER_CREATED, 3).id > seen_id
+
+class TestNotificationJobRepository:
+    """Test notification job queue"""
+
+    def test_job_lifecycle(self, test_db):
+        """Test jobs are claimed oldest first, count progress and finish"""
+        job_repo = NotificationJobRepository(test_db)
+        first = job_repo.enqueue('broadcast', {'title': 'a', 'body': 'b'})
+        second = job_repo.enqueue('popular_clusters')
+        test_db.commit()
+        assert first.status == QUEUED
+
+        claimed = job_repo.claim_next()
+        assert claimed.id == first.id and claimed.status == RUNNING
+        assert job_repo.claim_next().id == second.id
+        assert job_repo.claim_next() is None
+
+        job_repo.add_progress(first.id, total=3)
+        job_repo.add_progress(first.id, success=2, failure=1, batches=1)
+        job_repo.finish(first.id, {'success': 2, 'failure': 1})
+        job_repo.finish(second.id, error='Firebase not initialized')
+        test_db.expire_all()
+
+        status = job_repo.to_dict(job_repo.get(first.id))
+        assert status['status'] == DONE
+        assert (status['total'], status['success'], status['failure'], status['batches_done']) == (3, 2, 1, 1)
+        assert status['result'] == {'success': 2, 'failure': 1}
+        assert job_repo.get(second.id).error == 'Firebase not initialized'
+
+    def test_stale_jobs_judged_by_heartbeat(self, test_db):
+        """Test a long job making progress is not failed, and a failed job is not later marked done"""
+        job_repo = NotificationJobRepository(test_db)
+        job = job_repo.enqueue('broadcast', {'title': 'a', 'body': 'b'})
+        test_db.commit()
+        job_repo.claim_next()
+
+        job.started_at = (now() - timedelta(hours=2)).isoformat()
+        test_db.commit()
+        job_repo.add_progress(job.id, success=1, batches=1)
+        assert job_repo.fail_stale(minutes=30) == 0
+
+        job.heartbeat_at = (now() - timedelta(hours=1)).isoformat()
+        test_db.commit()
+        assert job_repo.fail_stale(minutes=30) == 1
+
+        assert not job_repo.finish(job.id, {'success': 1})
+        test_db.expire_all()
+        assert job_repo.get(job.id).status == FAILED
+
+
+class TestNotificationLogRepository:
+    """Test the sent notification ledger"""
+
+    def test_record_and_read_sent_counts(self, test_db):
+        """Test one entry is kept per cluster and type, holding the latest article count"""
+        log_repo = NotificationLogRepository(test_db)
+        assert log_repo.get_sent_counts(POPULAR_CLUSTER, []) == {}
+
+        log_repo.record_sent(POPULAR_CLUSTER, 1, 3)
+        log_repo.record_sent('new_cluster', 1, 1)
+        log_repo.record_sent(POPULAR_CLUSTER, 2, 4)
+        log_repo.record_sent(POPULAR_CLUSTER, 1, 6)
+
+        assert log_repo.get_sent_counts(POPULAR_CLUSTER, [1, 2, 3]) == {1: 6, 2: 4}
+        assert log_repo.get_sent_counts('new_cluster', [1, 2]) == {1: 1}
+
+
+class TestSnapshots:
+    """Test pipeline snapshot keys and the write/read round trip"""
+
+    def test_snapshot_key_drops_defaults(self):
+        """Test default and empty query args map to the same key"""
+        assert snapshot_key('/api/clusters', {}) == '/api/clusters'
+        assert snapshot_key('/api/clusters', {'limit': '50', 'q': '', 'category': 'all'}) == '/api/clusters'
+        assert snapshot_key('/api/clusters', {'city': 'b', 'category': 'a'}) == \
+            snapshot_key('/api/clusters', {'category': 'a', 'city': 'b'})
+        assert snapshot_key('/api/clusters', {'cursor': 'x'}) != '/api/clusters'
+
+    def test_json_paths_produce_same_bytes(self, monkeypatch):
+        """Test the orjson and stdlib encoders agree, writing Arabic as UTF-8"""
+        payload = {'title': "اشتباكات في الفاشر", 'b': [1, 2.5, None, True], 'a': "x\u0001\"y"}
+        monkeypatch.setenv('JSON_PROVIDER', 'stdlib')
+        stdlib = dumps_bytes(payload)
+        assert "الفاشر".encode('utf-8') in stdlib
+        if ORJSON_AVAILABLE:
+            monkeypatch.setenv('JSON_PROVIDER', 'orjson')
+            assert dumps_bytes(payload) == stdlib
+
+    def test_write_and_read_snapshot(self, tmp_path):
+        """Test published snapshots are served only for their data version"""
+        writer = SnapshotWriter(str(tmp_path), version=3)
+        writer.add('/api/cities', ["الخرطوم"], {'Cache-Control': 'max-age=3600'})
+        writer.publish()
+
+        reader = SnapshotReader(str(tmp_path), check_interval=0)
+        body, headers = reader.get('/api/cities', version=3)
+        assert json.loads(bytes(body)) == ["الخرطوم"]
+        assert headers == {'Cache-Control': 'max-age=3600'}
+        assert gzip.decompress(reader.get('/api/cities', version=3, gzipped=True)[0]) == body
+        assert b''.join(iter_chunks(body, chunk_size=4)) == body
+
+        assert reader.get('/api/cities', version=4) is None
+        assert reader.get('/api/clusters', version=3) is None
+
 
 class TestTokenRepository:
     """Test TokenRepository functionality"""
@@ -411,6 +1092,214 @@ class TestTokenRepository:
 
         # Verify update (would need query method)
 
+    def test_delete_tokens_and_prune_stats(self, test_db):
+        """Test bulk deletion of invalid tokens and age-based cleanup are counted"""
+        token_repo = TokenRepository(test_db)
+        for i in range(3):
+            token_repo.store_or_update_token(device_id=f"device{i}", token=f"token{i}", platform="android")
+        stale = token_repo.get_token_by_value("token2")
+        stale.updated_ts = to_epoch(datetime.now() - timedelta(days=120))
+        test_db.flush()
+
+        assert token_repo.delete_tokens(["token0", "token0", "missing"]) == 1
+        assert token_repo.cleanup_expired_tokens(days_old=90) == 1
+        assert [t['token'] for t in token_repo.get_all_active_tokens()] == ["token1"]
+
+        stats = token_repo.get_prune_stats()
+        assert stats['invalid_tokens_pruned'] == 1
+        assert stats['expired_tokens_pruned'] == 1
+        assert stats['last_expired_cleanup_ts'] is not None
+
+    def test_topic_sync_tracking(self, test_db):
+        """Test new tokens are queued for topic sync and category changes are not"""
+        token_repo = TokenRepository(test_db)
+        first = token_repo.store_or_update_token(device_id="device0", token="token0", platform="android")
+        second = token_repo.store_or_update_token(device_id="device1", token="token1", platform="ios",
+                                                  topics=["security", "politics"])
+        assert second.topics == ["politics", "security"]
+        assert [t.id for t in token_repo.claim_topic_sync_batch()] == [first.id, second.id]
+        assert [[t['token'] for t in chunk] for chunk in token_repo.iter_unsubscribed_token_chunks(1)] == \
+            [["token0"], ["token1"]]
+
+        token_repo.mark_topics_synced({first.id: ["all"], second.id: ["all"]})
+        assert token_repo.claim_topic_sync_batch() == []
+        assert list(token_repo.iter_unsubscribed_token_chunks()) == []
+
+        # Categories only target cluster pushes, so changing them needs no resubscription
+        token_repo.store_or_update_token(device_id="device1", token="token1", platform="ios", topics=["sports"])
+        assert token_repo.claim_topic_sync_batch() == []
+        assert token_repo.get_token_by_value("token1").topics == ["sports"]
+
+        assert token_repo.mark_all_topics_dirty() == 2
+        assert len(token_repo.claim_topic_sync_batch(limit=1)) == 1
+
+    def test_topic_sync_claims(self, test_db):
+        """Test workers claim disjoint topic sync batches and abandoned or failed claims come back"""
+        token_repo = TokenRepository(test_db)
+        ids = [token_repo.store_or_update_token(device_id=f"d{i}", token=f"t{i}", platform="android").id
+               for i in range(3)]
+
+        first = token_repo.claim_topic_sync_batch(limit=2)
+        second = token_repo.claim_topic_sync_batch(limit=2)
+        assert [t.id for t in first] == ids[:2]
+        assert [t.id for t in second] == ids[2:]
+        assert token_repo.claim_topic_sync_batch() == []
+
+        token_repo.mark_topics_synced({ids[0]: ["all"]}, failed=[ids[1]])
+        assert [t.id for t in token_repo.claim_topic_sync_batch()] == [ids[1]]
+        assert token_repo.get_token_by_value("t0").subscribed_topics == ["all"]
+
+        # The worker holding t2 died; its claim expires
+        test_db.query(UserToken).filter(UserToken.id == ids[2]).update(
+            {UserToken.topics_claimed_ts: to_epoch(now()) - 3600})
+        test_db.commit()
+        assert [t.id for t in token_repo.claim_topic_sync_batch(claim_timeout=600)] == [ids[2]]
+
+        # Queued again mid-sync: the stale result does not mark it synced
+        token_repo.mark_all_topics_dirty()
+        token_repo.mark_topics_synced({ids[2]: ["all"]})
+        assert ids[2] in [t.id for t in token_repo.claim_topic_sync_batch()]
+
+    def test_upsert_tokens_batch(self, test_db):
+        """Test batched registrations insert new tokens, update known ones and merge repeats"""
+        token_repo = TokenRepository(test_db)
+        known = token_repo.store_or_update_token(device_id="d0", token="known", platform="android",
+                                                 topics=["politics"])
+        known_id, created_at = known.id, known.created_at
+
+        ids = token_repo.upsert_tokens([
+            {'device_id': "d0-new", 'token': "known", 'platform': "ios"},
+            {'device_id': "d1", 'token': "fresh", 'platform': "android", 'cities': ["Khartoum"]},
+            {'device_id': "d1", 'token': "fresh", 'platform': "android", 'topics': ["sports"]},
+        ])
+        test_db.commit()
+
+        assert ids["known"] == known_id
+        known = token_repo.get_token_by_value("known")
+        assert (known.device_id, known.platform, known.created_at) == ("d0-new", "ios", created_at)
+        assert known.topics == ["politics"]
+        fresh = token_repo.get_token_by_value("fresh")
+        assert (fresh.topics, fresh.cities) == (["sports"], ["Khartoum"])
+        assert token_repo.get_interested_tokens(["sports"], []) == ["fresh"]
+        assert token_repo.get_interested_tokens([], ["khartoum"]) == ["fresh"]
+        assert test_db.query(UserToken).count() == 2
+
+        with pytest.raises(ValueError):
+            token_repo.upsert_tokens([{'token': "no-device", 'platform': "ios"}])
+
+    def test_upsert_tokens_mixed_batch_interests(self, test_db):
+        """Test one batch indexes new tokens and rewrites only existing tokens whose choice changed"""
+        token_repo = TokenRepository(test_db)
+        token_repo.store_or_update_token(device_id="d0", token="switch", platform="android",
+                                         topics=["politics"], cities=["Khartoum"])
+        token_repo.store_or_update_token(device_id="d1", token="adds-city", platform="android")
+        token_repo.store_or_update_token(device_id="d2", token="unchanged", platform="android", topics=["sports"])
+        test_db.commit()
+
+        ids = token_repo.upsert_tokens([
+            {'device_id': "d0", 'token': "switch", 'platform': "android", 'topics': ["economy"]},
+            {'device_id': "d1", 'token': "adds-city", 'platform': "android", 'cities': ["الفاشر"]},
+            {'device_id': "d2", 'token': "unchanged", 'platform': "ios"},
+            {'device_id': "d3", 'token': "new-sports", 'platform': "android", 'topics': ["sports"]},
+            {'device_id': "d4", 'token': "new-plain", 'platform': "ios"},
+        ])
+        test_db.commit()
+
+        def interests(token):
+            return sorted((row.interest_type, row.value) for row in test_db.query(TokenInterest).filter(
+                TokenInterest.token_id == ids[token]))
+
+        assert interests("switch") == [("category", "economy"), ("city", "khartoum")]
+        assert interests("adds-city") == [("category", "*"), ("city", "الفاشر")]
+        assert interests("unchanged") == [("category", "sports")]
+        assert interests("new-sports") == [("category", "sports")]
+        assert interests("new-plain") == [("category", "*")]
+        assert sorted(token_repo.get_interested_tokens(["sports"], [])) == \
+            ["adds-city", "new-plain", "new-sports", "unchanged"]
+        assert token_repo.get_interested_tokens(["politics"], ["الفاشر"]) == ["adds-city", "new-plain"]
+
+    def test_upsert_tokens_same_instant(self, test_db, monkeypatch):
+        """Test a token registered again within the same clock tick is not taken for a new row"""
+        from ..repositories import token_repository
+        instant = now()
+        monkeypatch.setattr(token_repository, 'now', lambda: instant)
+        token_repo = TokenRepository(test_db)
+        first = token_repo.store_or_update_token(device_id="d0", token="t0", platform="android", topics=["sports"])
+
+        again = token_repo.store_or_update_token(device_id="d0", token="t0", platform="android")
+        token_repo.upsert_tokens([{'device_id': "d0", 'token': "t0", 'platform': "ios", 'topics': ["culture"]}])
+        test_db.commit()
+
+        assert again.id == first.id
+        assert [(row.interest_type, row.value) for row in test_db.query(TokenInterest)] == [("category", "culture")]
+
+    def test_token_timestamps_are_current_epoch(self, test_db):
+        """Test updated_ts and the cleanup timestamp are real epoch seconds, whatever the host timezone"""
+        token_repo = TokenRepository(test_db)
+        token = token_repo.store_or_update_token(device_id="d0", token="t0", platform="android")
+        token_repo.cleanup_expired_tokens(days_old=90)
+
+        assert abs(token.updated_ts - time.time()) < 60
+        assert abs(token_repo.get_prune_stats()['last_expired_cleanup_ts'] - time.time()) < 60
+        assert token_repo.get_token_by_value("t0") is not None
+
+    def test_iter_token_chunks(self, test_db):
+        """Test tokens stream in bounded chunks and shards partition them"""
+        token_repo = TokenRepository(test_db)
+        for i in range(7):
+            token_repo.store_or_update_token(device_id=f"d{i}", token=f"t{i}", platform="android")
+
+        chunks = list(token_repo.iter_token_chunks(chunk_size=3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert chunks[0][0] == {'token': "t0", 'platform': "android"}
+        assert [t['token'] for chunk in chunks for t in chunk] == [f"t{i}" for i in range(7)]
+        assert token_repo.get_all_active_tokens() == [t for chunk in chunks for t in chunk]
+
+        shards = [[t['token'] for chunk in token_repo.iter_token_chunks(2, shard, 3) for t in chunk]
+                  for shard in range(3)]
+        assert sorted(sum(shards, [])) == sorted(f"t{i}" for i in range(7))
+        assert all(shards)
+
+    def test_interest_targeting(self, test_db):
+        """Test category and city interests resolve to tokens and are dropped with their token"""
+        token_repo = TokenRepository(test_db)
+        token_repo.store_or_update_token(device_id="d0", token="everything", platform="android")
+        token_repo.store_or_update_token(device_id="d1", token="politics", platform="android", topics=["politics"])
+        token_repo.store_or_update_token(device_id="d2", token="fasher", platform="ios",
+                                         topics=["sports"], cities=["الفاشِر"])
+
+        assert sorted(token_repo.get_interested_tokens(["politics"], [])) == ["everything", "politics"]
+        assert sorted(token_repo.get_interested_tokens(["economy"], ["الفاشر"])) == ["everything", "fasher"]
+        assert token_repo.get_interested_tokens([], []) == ["everything"]
+        # A token following a category and a city appears once, in id-ordered chunks
+        chunks = list(token_repo.iter_interested_token_chunks(["sports", "politics"], ["الفاشر"], chunk_size=2))
+        assert [[t['token'] for t in chunk] for chunk in chunks] == [["everything", "politics"], ["fasher"]]
+
+        # Changing the choice rewrites the index
+        token_repo.store_or_update_token(device_id="d1", token="politics", platform="android", topics=["economy"])
+        assert sorted(token_repo.get_interested_tokens(["economy"], [])) == ["everything", "politics"]
+
+        token_repo.delete_tokens(["fasher"])
+        assert sorted(token_repo.get_interested_tokens(["sports"], ["الفاشر"])) == ["everything"]
+        assert test_db.query(TokenInterest).filter(TokenInterest.value == "الفاشر").count() == 0
+
+
+    def test_interested_token_chunks_merge_legs(self, test_db):
+        """Test chunks merge every matching interest in id order, listing each token once"""
+        token_repo = TokenRepository(test_db)
+        choices = [
+            (["sports"], None), (["politics"], ["Khartoum"]), (["culture"], None),
+            (["sports", "politics"], ["Khartoum"]), (None, None), (["culture"], ["Khartoum"]),
+            (["sports"], None), (["economy"], None), (["politics"], None),
+        ]
+        for i, (topics, cities) in enumerate(choices):
+            token_repo.store_or_update_token(device_id=f"d{i}", token=f"t{i}", platform="android",
+                                             topics=topics, cities=cities)
+
+        chunks = list(token_repo.iter_interested_token_chunks(["sports", "politics"], ["khartoum"], chunk_size=3))
+        assert [[t['token'] for t in chunk] for chunk in chunks] == [
+            ["t0", "t1", "t3"], ["t4", "t5", "t6"], ["t8"]
+        ]
 
 class TestDatabaseTransactions:
     """Test database transaction behavior"""
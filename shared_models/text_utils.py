@@ -0,0 +1,27 @@
+"""
+Text normalization utilities shared by the pipeline and repositories.
+
+Arabic headlines and entity names arrive with inconsistent hamza forms,
+taa marbuta, alif maqsoora and diacritics. Folding them the same way
+everywhere keeps deduplication, filtering and lookups consistent.
+"""
+
+import re
+
+def normalize_arabic(text: str) -> str:
+    """Normalize Arabic text by removing diacritics and standardizing characters."""
+    if not text:
+        return ""
+    # Remove diacritics (Tashkeel)
+    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
+    # Convert أ,إ,آ to ا
+    text = re.sub(r'[أإآ]', 'ا', text)
+    # Convert ة to ه
+    text = re.sub(r'ة', 'ه', text)
+    # Convert ى to ي
+    text = re.sub(r'ى', 'ي', text)
+    return text
+
+def normalize_entity_value(value: str) -> str:
+    """Fold an entity name into the key used for lookups (Arabic folding, case, whitespace)."""
+    return ' '.join(normalize_arabic(value or '').lower().split())
@@ -117,3 +117,47 @@ def parse_datetime(date_str: str) -> Optional[datetime]:
         return to_app_timezone(dt)
     except Exception:
         return None
+
+def to_epoch(value) -> Optional[int]:
+    """
+    Convert a datetime or date string to integer epoch seconds (UTC).
+
+    Accepts the mixed formats found in the database: ``YYYY-MM-DD HH:MM:SS``
+    from the pipeline, ISO strings with ``T`` and an offset from ``now()``,
+    and a trailing ``Z``. Naive values are assumed to be in application timezone.
+
+    Args:
+        value: Datetime object or date string
+
+    Returns:
+        int: Epoch seconds, or None if the value is empty or unparseable
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                dt = parse_datetime(str(value))
+            except ImportError:
+                dt = None
+            if dt is None:
+                return None
+    return int(to_utc(dt).timestamp())
+
+def from_epoch(ts: Optional[int]) -> Optional[datetime]:
+    """
+    Convert epoch seconds to a datetime in application timezone.
+
+    Args:
+        ts: Epoch seconds
+
+    Returns:
+        datetime: Datetime in application timezone, or None
+    """
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, get_app_timezone())
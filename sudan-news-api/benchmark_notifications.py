@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Load test broadcast notifications against the local FCM stand-in.
+
+Seeds N push tokens, then times NotificationService.send_to_all_users end to
+end (token query, batching, concurrent sends, retries, pruning) for every
+combination of multicast batch size and sender thread count. Sends go through
+src.fcm_transport.HttpTransport to mock_fcm_server.py, started in-process
+unless --fcm-url points at one already running.
+
+The tokens are written to a scratch SQLite database unless --database is
+given; every run starts from the same N tokens, since pruning deletes some.
+
+Usage:
+    python benchmark_notifications.py [--tokens 20000] [--batch-sizes 100,500]
+                                      [--workers 1,4,8] [--latency-ms 50]
+                                      [--unregistered-rate 0.02] [--error-rate 0.01]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mock_fcm_server import MockFCMServer, add_config_arguments, config_from_args
+
+def int_list(value: str):
+    return [int(part) for part in value.split(',') if part]
+
+def seed_tokens(count: int):
+    """Replace every push token with `count` fresh ones"""
+    from sqlalchemy import insert
+    from shared_models.db import get_session
+    from shared_models.models import UserToken, TokenInterest
+    from shared_models.timezone_utils import to_epoch, now as app_now
+
+    now = app_now()
+    with get_session() as session:
+        session.query(TokenInterest).delete()
+        session.query(UserToken).delete()
+        rows = [{
+            'device_id': f'bench-device-{i}',
+            'token': f'bench-token-{i:08d}',
+            'platform': 'android' if i % 3 else 'ios',
+            'created_at': now.isoformat(),
+            'updated_ts': to_epoch(now)
+        } for i in range(count)]
+        for start in range(0, len(rows), 5000):
+            session.execute(insert(UserToken), rows[start:start + 5000])
+        session.commit()
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark broadcast throughput against a mock FCM')
+    parser.add_argument('--tokens', type=int, default=10000, help='Tokens to seed')
+    parser.add_argument('--batch-sizes', type=int_list, default=[100, 250, 500],
+                        help='Comma-separated FCM_BATCH_SIZE values (max 500)')
+    parser.add_argument('--workers', type=int_list, default=[1, 4, 8],
+                        help='Comma-separated FCM_MAX_WORKERS values')
+    parser.add_argument('--runs', type=int, default=1, help='Broadcasts per combination')
+    parser.add_argument('--database', help='DATABASE_URL to seed (default: a scratch SQLite file)')
+    parser.add_argument('--fcm-url', help='Use a running mock_fcm_server.py instead of an embedded one')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    # Retries and pruning show up in the table; keep their log lines out of it
+    logging.basicConfig(level=logging.ERROR)
+
+    scratch = None
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    else:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        os.environ['DATABASE_URL'] = f'sqlite:///{scratch.name}'
+    # Measure per-device fan-out rather than a single topic message
+    os.environ['FCM_USE_TOPICS'] = '0'
+    os.environ['FCM_TRANSPORT'] = 'http'
+
+    server = None
+    fcm_url = args.fcm_url
+    if not fcm_url:
+        server = MockFCMServer(('127.0.0.1', 0), config_from_args(args))
+        server.start_in_thread()
+        fcm_url = server.url
+
+    from shared_models.db import engine
+    from shared_models.models import Base
+    import src.notification_service as notification_service_module
+    from src.fcm_transport import HttpTransport
+
+    Base.metadata.create_all(engine)
+    service = notification_service_module.NotificationService(HttpTransport(fcm_url))
+    notification_service_module.FCM_RETRY_BACKOFF = 0.05
+
+    print(f"{args.tokens} tokens, mock FCM at {fcm_url}")
+    print(f"{'batch':>6} {'workers':>7} {'elapsed_s':>9} {'tokens/s':>9} {'p50_ms':>8} {'p95_ms':>8} "
+          f"{'max_ms':>8} {'retries':>7} {'success':>8} {'failure':>8} {'pruned':>7}")
+    try:
+        for batch_size in args.batch_sizes:
+            for workers in args.workers:
+                notification_service_module.FCM_BATCH_SIZE = min(batch_size, 500)
+                notification_service_module.FCM_MAX_WORKERS = workers
+                for _ in range(args.runs):
+                    seed_tokens(args.tokens)
+                    started = time.perf_counter()
+                    result = service.send_to_all_users('Benchmark', 'Load test', {'type': 'benchmark'})
+                    elapsed = time.perf_counter() - started
+                    if 'error' in result:
+                        print(f"{batch_size:>6} {workers:>7} failed: {result['error']}")
+                        continue
+
+                    latencies = [batch['latency_ms'] for batch in result['batches']]
+                    retries = sum(batch['attempts'] - 1 for batch in result['batches'])
+                    print(f"{batch_size:>6} {workers:>7} {elapsed:>9.2f} {args.tokens / elapsed:>9.0f} "
+                          f"{statistics.median(latencies):>8.1f} {percentile(latencies, 0.95):>8.1f} "
+                          f"{max(latencies):>8.1f} {retries:>7} {result['success']:>8} "
+                          f"{result['failure']:>8} {result['pruned']:>7}")
+    finally:
+        if server:
+            server.shutdown()
+        if scratch:
+            os.unlink(scratch.name)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization time and bytes on the wire per API endpoint.
+
+Fetches each endpoint once through the Flask test client against the database
+in DATABASE_URL, then re-serializes the payload with the stdlib encoder
+(Flask's default: ASCII-escaped) and with orjson, and compresses both with
+gzip and brotli (when installed).
+
+Usage:
+    python benchmark_responses.py [--iterations 200] [URL ...]
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.app import app
+from src.compression import BROTLI_AVAILABLE
+from shared_models.json_utils import ORJSON_AVAILABLE
+
+if BROTLI_AVAILABLE:
+    import brotli
+if ORJSON_AVAILABLE:
+    import orjson
+
+def stdlib_dumps(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def orjson_dumps(payload) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+def time_per_call(func, payload, iterations: int) -> float:
+    """Mean milliseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(payload)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+def wire_sizes(body: bytes) -> str:
+    sizes = [f"{len(body):>9}", f"{len(gzip.compress(body, compresslevel=6)):>8}"]
+    sizes.append(f"{len(brotli.compress(body, quality=5)):>8}" if BROTLI_AVAILABLE else f"{'-':>8}")
+    return ' '.join(sizes)
+
+def default_urls(client):
+    urls = ['/api/clusters', '/api/cities', '/api/categories', '/api/articles']
+    clusters = client.get('/api/clusters?limit=1').get_json() or []
+    if clusters:
+        urls.insert(1, f"/api/cluster/{clusters[0]['id']}")
+    return urls
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API serialization and compression')
+    parser.add_argument('--iterations', type=int, default=200, help='Serializations timed per endpoint')
+    parser.add_argument('urls', nargs='*', help='Endpoints to benchmark (default: main read endpoints)')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    urls = args.urls or default_urls(client)
+
+    serializers = [('stdlib', stdlib_dumps)]
+    if ORJSON_AVAILABLE:
+        serializers.append(('orjson', orjson_dumps))
+
+    print(f"{'endpoint':<28} {'encoder':<7} {'ms/dump':>8} {'identity':>9} {'gzip':>8} {'brotli':>8}")
+    for url in urls:
+        response = client.get(url)
+        if response.status_code != 200:
+            print(f"{url:<28} HTTP {response.status_code}, skipped")
+            continue
+        payload = response.get_json()
+
+        for name, dumps in serializers:
+            elapsed = time_per_call(dumps, payload, args.iterations)
+            print(f"{url[:28]:<28} {name:<7} {elapsed:>8.3f} {wire_sizes(dumps(payload))}")
+
+if __name__ == '__main__':
+    main()
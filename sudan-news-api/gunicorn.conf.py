@@ -1,3 +1,5 @@
+import os
+
 # Logging
 loglevel = "info"
 # USE ABSOLUTE PATHS:
@@ -8,6 +10,12 @@ access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
 # Process naming
 proc_name = "sudan-news-api"
 
+# Worker class: "sync" by default. Use an async class such as "gevent"
+# (pip install gevent) so long-lived /api/stream connections do not each
+# occupy a worker; raise STREAM_MAX_SECONDS for the API when doing so.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
 # Server mechanics
 # USE ABSOLUTE PATH:
 pidfile = "/var/www/sudanese_news/shared/logs/gunicorn.pid"
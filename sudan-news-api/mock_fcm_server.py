@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for FCM, for load testing notification sends without Firebase.
+
+Speaks the JSON protocol of src.fcm_transport.HttpTransport. Run the API or
+the notification worker with FCM_TRANSPORT=http and FCM_MOCK_URL pointing here.
+
+Latency is simulated per request plus per token, as the Admin SDK sends a
+multicast as one HTTP call per device. Failures can be injected:
+
+- whole requests answered 503 UNAVAILABLE (--error-rate), which the service retries
+- individual tokens answered UNAVAILABLE (--token-error-rate)
+- tokens answered UNREGISTERED (--unregistered-rate, or any token starting with
+  "unregistered"). The choice is a hash of the token, so the same tokens stay
+  unregistered across retries and runs, like uninstalled apps.
+
+GET /stats returns request and message counters; POST /reset clears them.
+
+Usage:
+    python mock_fcm_server.py [--port 8099] [--latency-ms 20] [--per-token-ms 0.5]
+                              [--error-rate 0.01] [--unregistered-rate 0.02]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockFCMConfig:
+    """Simulated latency and error rates"""
+
+    def __init__(self, latency_ms: float = 20.0, per_token_ms: float = 0.5, jitter_ms: float = 10.0,
+                 error_rate: float = 0.0, token_error_rate: float = 0.0, unregistered_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.per_token_ms = per_token_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.token_error_rate = token_error_rate
+        self.unregistered_rate = unregistered_rate
+
+    def is_unregistered(self, token: str) -> bool:
+        if token.startswith('unregistered'):
+            return True
+        return (zlib.crc32(token.encode('utf-8')) % 10000) < self.unregistered_rate * 10000
+
+class MockFCMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, config: MockFCMConfig):
+        super().__init__(address, MockFCMHandler)
+        self.config = config
+        self._lock = threading.Lock()
+        self._message_ids = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'failed_requests': 0, 'messages': 0,
+                          'delivered': 0, 'unregistered': 0, 'unavailable': 0}
+
+    def count(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self.stats[name] += value
+
+    def next_message_id(self) -> str:
+        with self._lock:
+            self._message_ids += 1
+            return f"projects/mock/messages/{self._message_ids}"
+
+    def start_in_thread(self) -> threading.Thread:
+        """Serve from a daemon thread, e.g. inside a benchmark"""
+        thread = threading.Thread(target=self.serve_forever, name='mock-fcm', daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class MockFCMHandler(BaseHTTPRequestHandler):
+    server: MockFCMServer
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, code: str, message: str):
+        self._reply(status, {'error': {'status': code, 'message': message}})
+
+    def _simulate_latency(self, tokens: int):
+        config = self.server.config
+        delay_ms = config.latency_ms + config.per_token_ms * tokens + random.uniform(0, config.jitter_ms)
+        time.sleep(delay_ms / 1000)
+
+    def _token_result(self, token: str) -> dict:
+        config = self.server.config
+        if config.is_unregistered(token):
+            self.server.count(unregistered=1)
+            return {'error': {'status': 'UNREGISTERED', 'message': 'Requested entity was not found.'}}
+        if random.random() < config.token_error_rate:
+            self.server.count(unavailable=1)
+            return {'error': {'status': 'UNAVAILABLE', 'message': 'The service is currently unavailable.'}}
+        self.server.count(delivered=1)
+        return {'name': self.server.next_message_id()}
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.server._lock:
+                return self._reply(200, dict(self.server.stats))
+        self._error(404, 'NOT_FOUND', f'No route {self.path}')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return self._error(400, 'INVALID_ARGUMENT', 'Body is not JSON')
+
+        if self.path == '/reset':
+            self.server.reset_stats()
+            return self._reply(200, {})
+
+        tokens = payload.get('tokens') or []
+        self.server.count(requests=1)
+        self._simulate_latency(max(1, len(tokens)))
+        if random.random() < self.server.config.error_rate:
+            self.server.count(failed_requests=1)
+            return self._error(503, 'UNAVAILABLE', 'The service is currently unavailable.')
+
+        if self.path == '/v1/send':
+            self.server.count(messages=1)
+            if payload.get('topic'):
+                self.server.count(delivered=1)
+                return self._reply(200, {'name': self.server.next_message_id()})
+            result = self._token_result(payload.get('token') or '')
+            if 'error' in result:
+                code = result['error']['status']
+                return self._error(404 if code == 'UNREGISTERED' else 503, code, result['error']['message'])
+            return self._reply(200, result)
+
+        if self.path == '/v1/send_multicast':
+            self.server.count(messages=len(tokens))
+            return self._reply(200, {'responses': [self._token_result(token) for token in tokens]})
+
+        if self.path in ('/v1/topics:subscribe', '/v1/topics:unsubscribe'):
+            config = self.server.config
+            return self._reply(200, {'results': [
+                {'error': 'NOT_FOUND'} if config.is_unregistered(token) else {} for token in tokens
+            ]})
+
+        self._error(404, 'NOT_FOUND', f'No route {self.path}')
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Latency and failure options, shared with benchmark_notifications.py"""
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Base latency per request')
+    parser.add_argument('--per-token-ms', type=float, default=0.5, help='Extra latency per token in a request')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Random extra latency, up to this much')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered 503')
+    parser.add_argument('--token-error-rate', type=float, default=0.0,
+                        help='Fraction of tokens answered UNAVAILABLE')
+    parser.add_argument('--unregistered-rate', type=float, default=0.0,
+                        help='Fraction of tokens answered UNREGISTERED')
+
+def config_from_args(args) -> MockFCMConfig:
+    return MockFCMConfig(args.latency_ms, args.per_token_ms, args.jitter_ms,
+                         args.error_rate, args.token_error_rate, args.unregistered_rate)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local FCM stand-in for load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockFCMServer((args.host, args.port), config_from_args(args))
+    print(f"Mock FCM listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -6,11 +6,14 @@ Flask application providing REST API and web interface for Sudanese news events.
 This service is read-only for event data and uses the shared repository pattern.
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, g, has_request_context
 from flask_cors import CORS
 import os
 import sys
 import json
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import logging
 from pathlib import Path
@@ -29,21 +32,130 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 # Import shared models and repositories
-from shared_models.db import get_session
+from sqlalchemy import event
+from shared_models.db import get_session, engine
 from shared_models.repositories.cluster_repository import ClusterRepository
 from shared_models.repositories.token_repository import TokenRepository
 from shared_models.repositories.article_repository import ArticleRepository
 from shared_models.repositories.source_repository import SourceRepository
+from shared_models.repositories.app_state_repository import AppStateRepository
+from shared_models.repositories.event_repository import EventRepository
+from shared_models.repositories.notification_job_repository import NotificationJobRepository
 from shared_models.timezone_utils import now, to_app_timezone
+from shared_models.cluster_feed import CATEGORIES, get_cards_for_clusters, format_cluster_feed
+from shared_models.snapshots import SnapshotReader, get_snapshot_dir
+from shared_models.json_utils import dumps_bytes
 
 # Import notification service
-from .notification_service import notification_service
+from .notification_service import notification_service, CATEGORY_TOPICS
+from .notification_worker import NotificationWorker, BROADCAST, NEW_CLUSTER, POPULAR_CLUSTERS
+from .response_cache import ResponseCache, cached_response
+from .compression import init_compression
+from .json_provider import FastJSONProvider
+from .event_stream import EventBroadcaster
+from .token_buffer import TokenRegistrationBuffer
 
 # Setup Flask app
 app = Flask(__name__,
             template_folder=str(Path(__file__).parent.parent / 'templates'),
             static_folder=str(Path(__file__).parent.parent / 'static'))
-CORS(app)
+# Expose the pagination cursor header to browser clients
+CORS(app, expose_headers=['X-Next-Cursor'])
+
+# orjson-backed JSON when available (JSON_PROVIDER=stdlib to disable)
+app.json = FastJSONProvider(app)
+
+# Negotiated brotli/gzip for text responses of at least COMPRESS_MIN_SIZE bytes
+compressor = init_compression(app, min_size=int(os.getenv('COMPRESS_MIN_SIZE', 1024)))
+
+# Per-request query counting: every statement run while serving a request is
+# counted and logged with the response, so N+1 regressions show up in the logs
+@event.listens_for(engine, 'before_cursor_execute')
+def count_request_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def log_request_queries(response):
+    elapsed_ms = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+    logger.info(f"{request.method} {request.full_path.rstrip('?')} -> {response.status_code}: "
+                f"{g.get('query_count', 0)} queries in {elapsed_ms:.1f}ms")
+    return response
+
+def load_data_version():
+    """Current data version from app_state (bumped by the pipeline after each run)"""
+    with get_session() as session:
+        return AppStateRepository(session).get_data_version()
+
+# Response cache shared by the read-only endpoints, invalidated by the data version.
+# Set RESPONSE_CACHE_PATH to a local file to share entries between gunicorn workers.
+response_cache = ResponseCache(
+    load_data_version,
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', 300)),
+    version_ttl=float(os.getenv('DATA_VERSION_TTL', 5)),
+    shared_path=os.getenv('RESPONSE_CACHE_PATH') or None
+)
+
+# Pipeline-rendered snapshots of the hottest responses (see shared_models/snapshots.py)
+snapshot_reader = SnapshotReader(get_snapshot_dir()) if os.getenv('SNAPSHOTS_ENABLED', '1') == '1' else None
+
+def load_events(last_id, limit):
+    """Cluster events after an id as (id, type, JSON data) tuples"""
+    with get_session() as session:
+        return [
+            (e.id, e.event_type, dumps_bytes(e.payload).decode('utf-8').rstrip('\n'))
+            for e in EventRepository(session).get_since(last_id, limit)
+        ]
+
+def load_latest_event_id():
+    with get_session() as session:
+        return EventRepository(session).get_latest_id()
+
+# Fan-out of pipeline events to /api/stream connections, one poller per worker
+event_broadcaster = EventBroadcaster(
+    load_events, load_latest_event_id,
+    poll_interval=float(os.getenv('STREAM_POLL_INTERVAL', 1))
+)
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+# Keep below the gunicorn timeout with sync workers; raise it with gevent
+STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', 25))
+
+# Sends queued notification jobs from a thread of each worker process; set
+# NOTIFICATION_WORKER_ENABLED=0 when running src/notification_worker.py separately
+notification_worker = NotificationWorker(
+    notification_service, poll_interval=float(os.getenv('NOTIFICATION_WORKER_POLL_INTERVAL', 2))
+)
+if os.getenv('NOTIFICATION_WORKER_ENABLED', '1') == '1':
+    @app.before_request
+    def start_notification_worker():
+        notification_worker.start()
+
+def store_token_registrations(registrations):
+    with get_session() as session:
+        TokenRepository(session).upsert_tokens(registrations)
+        session.commit()
+
+# Coalesces repeated token registrations into periodic batch upserts (off by default)
+token_buffer = TokenRegistrationBuffer(
+    store_token_registrations,
+    flush_interval=float(os.getenv('TOKEN_BUFFER_FLUSH_SECONDS', 2)),
+    max_pending=int(os.getenv('TOKEN_BUFFER_MAX_PENDING', 500))
+) if os.getenv('TOKEN_BUFFER_ENABLED', '0') == '1' else None
+
+# Cached total counts for offset-paginated pages: {filter key: (expires_at, total)}.
+# Keys include free-text queries, so the least recently used are evicted past the limit.
+TOTAL_COUNT_TTL = int(os.getenv('TOTAL_COUNT_TTL', 300))
+TOTAL_COUNT_MAX_ENTRIES = int(os.getenv('TOTAL_COUNT_MAX_ENTRIES', 1024))
+_total_counts = OrderedDict()
+_total_counts_lock = threading.Lock()
+
+# Upper bound on changes returned per /api/clusters/changes request
+MAX_CHANGES_LIMIT = 500
 
 # Bias data is now stored in the database, not in a separate JSON file
 # The ClusterRepository now returns bias and other source details directly
@@ -110,14 +222,62 @@ def bias_arabic_filter(bias_value):
     }
     return bias_mapping.get(bias_value, 'غير محدد')
 
+# Pagination helpers
+
+def get_cached_total(key, compute):
+    """Return a cached total count for a filter combination, recomputing after TOTAL_COUNT_TTL seconds."""
+    with _total_counts_lock:
+        cached = _total_counts.get(key)
+        if cached and cached[0] > time.monotonic():
+            _total_counts.move_to_end(key)
+            return cached[1]
+
+    total = compute()
+    with _total_counts_lock:
+        _total_counts[key] = (time.monotonic() + TOTAL_COUNT_TTL, total)
+        _total_counts.move_to_end(key)
+        while len(_total_counts) > TOTAL_COUNT_MAX_ENTRIES:
+            _total_counts.popitem(last=False)
+    return total
+
+def fetch_cluster_page(cluster_repo, per_page, q, has_entities, category, city,
+                       cursor=None, page=None, with_total=True):
+    """Fetch one page of clusters for the list endpoints.
+
+    Uses keyset pagination unless an explicit ``page`` number is requested, in which
+    case the legacy offset path is used. Returns (clusters, next_cursor, total);
+    total is only computed (and cached) for offset pages when ``with_total`` is set.
+    """
+    filters = dict(
+        query=q if q else None,
+        has_entities=has_entities == '1',
+        category=category if category != 'all' else None,
+        city=city if city else None
+    )
+
+    if page is None:
+        clusters, next_cursor = cluster_repo.get_clusters_page(cursor=cursor, limit=per_page, **filters)
+        return clusters, next_cursor, None
+
+    offset = (page - 1) * per_page
+    clusters, _ = cluster_repo.get_clusters_with_filters(
+        limit=per_page, offset=offset, with_total=False, **filters
+    )
+    total = None
+    if with_total:
+        key = tuple(sorted(filters.items()))
+        total = get_cached_total(key, lambda: cluster_repo.get_clusters_with_filters(limit=0, **filters)[1])
+    return clusters, None, total
+
 # Web Routes (unchanged)
 
 @app.route('/')
+@cached_response(response_cache)
 def index():
     """Homepage showing recent clusters with pagination and search/filter."""
     per_page = 100  # Number of clusters per page
-    page = int(request.args.get('page', 1))
-    offset = (page - 1) * per_page
+    cursor = request.args.get('cursor') or None
+    page = request.args.get('page', type=int)
 
     q = request.args.get('q', '').strip()
     has_entities = request.args.get('has_entities', '')
@@ -131,81 +291,66 @@ def index():
             # Get all cities for the filter dropdown
             all_cities = cluster_repo.get_all_cities()
 
-            if q or has_entities or (category and category != 'all') or city:
-                clusters, total_clusters = cluster_repo.get_clusters_with_filters(
-                    query=q if q else None,
-                    has_entities=has_entities == '1',
-                    category=category if category != 'all' else None,
-                    city=city if city else None,
-                    limit=per_page,
-                    offset=offset
-                )
-            else:
-                clusters = cluster_repo.get_recent_clusters(per_page, offset)
-                total_clusters = cluster_repo.get_total_clusters()
+            clusters, next_cursor, total_clusters = fetch_cluster_page(
+                cluster_repo, per_page, q, has_entities, category, city,
+                cursor=cursor, page=page if page and not cursor else None
+            )
 
             # Fetch war news for sidebar (Security category)
             war_clusters, _ = cluster_repo.get_clusters_with_filters(
                 category='security',
-                limit=5
+                limit=5,
+                with_total=False
             )
             
             # Fetch trending clusters
             trending_clusters = cluster_repo.get_trending_clusters(limit=5)
+
+            # Card data for both lists in one batch
+            cards = get_cards_for_clusters(cluster_repo, clusters + trending_clusters)
             
             # Detach trending clusters from session to use outside
             session.expunge_all()
+    except ValueError:
+        return render_template('error.html', error="Invalid page cursor."), 400
     except Exception as e:
         logger.error(f"Error in index route: {e}")
         return render_template('error.html', error="An error occurred while loading the page."), 500
 
-    total_pages = (total_clusters + per_page - 1) // per_page  # Ceiling division
+    # Page numbers only apply to the offset-paginated view
+    page = page or 1
+    total_pages = 0
+    page_numbers = []
+    if total_clusters is not None:
+        total_pages = (total_clusters + per_page - 1) // per_page  # Ceiling division
 
-    # Calculate page numbers to display (current page +/- 2)
-    start_page = max(1, page - 2)
-    end_page = min(total_pages + 1, page + 3)
-    page_numbers = list(range(start_page, end_page))
+        # Calculate page numbers to display (current page +/- 2)
+        start_page = max(1, page - 2)
+        end_page = min(total_pages + 1, page + 3)
+        page_numbers = list(range(start_page, end_page))
 
-    # Helper to enrich clusters with article data
+    # Helper to enrich clusters with their denormalized card data
     def enrich_clusters(cluster_list):
         for cluster in cluster_list:
-            with get_session() as session:
-                cluster_repo = ClusterRepository(session)
-                cluster_data = cluster_repo.get_cluster_details(cluster.id)
-
-                if cluster_data and cluster_data['articles']:
-                    # Add first article to cluster for template rendering
-                    setattr(cluster, 'first_article', cluster_data['articles'][0])
-                    
-                    # Add bias distribution data if available
-                    if cluster_data.get('bias_distribution'):
-                        setattr(cluster, 'bias_distribution', cluster_data['bias_distribution'])
-                    
-                    # Use NLP categories for labeling if available
-                    nlp_categories = []
-                    for article in cluster_data['articles']:
-                        if article.get('nlp_category'):
-                            nlp_categories.append(article['nlp_category'])
-                    if nlp_categories:
-                        # Use the first NLP category as label
-                        setattr(cluster, 'category_label', nlp_categories[0])
-                else:
-                    # Fallback to local/international
-                    # Note: cluster_data might be None if cluster deleted but still in list? Unlikely but possible.
-                    if cluster_data and cluster_data.get('articles'):
-                        categories = set(article['category'] for article in cluster_data['articles'])
-                        if 'local' in categories and 'international' in categories:
-                            setattr(cluster, 'category_label', 'محلي ودولي')
-                        elif 'international' in categories:
-                            setattr(cluster, 'category_label', 'دولي')
-                        else:
-                            setattr(cluster, 'category_label', 'محلي')
+            card = cards.get(cluster.id)
+            if not card or not card['article_count']:
+                continue
+
+            # Add first article to cluster for template rendering
+            setattr(cluster, 'first_article', {
+                'id': card['first_article_id'],
+                'description': card['description'],
+                'image_url': card['image_url']
+            })
+            setattr(cluster, 'image_url', card['image_url'])
+            setattr(cluster, 'bias_distribution', card['bias_distribution'])
+            setattr(cluster, 'category_label', card['category_label'])
 
     # Enrich both lists
     enrich_clusters(clusters)
     enrich_clusters(trending_clusters)
 
-    return render_template('index.html', clusters=clusters, page=page, total_pages=total_pages, page_numbers=page_numbers, all_cities=all_cities, current_city=city, war_clusters=war_clusters, trending_clusters=trending_clusters)
+    return render_template('index.html', clusters=clusters, page=page, next_cursor=next_cursor, total_pages=total_pages, page_numbers=page_numbers, all_cities=all_cities, current_city=city, war_clusters=war_clusters, trending_clusters=trending_clusters)
 
 @app.route('/event/<int:cluster_id>')
 def event(cluster_id):
@@ -243,11 +388,16 @@ def source(source_id):
 # API Routes (maintaining exact same responses)
 
 @app.route('/api/clusters')
+@cached_response(response_cache, snapshots=snapshot_reader)
 def api_clusters():
-    """API endpoint for recent clusters formatted for mobile app."""
+    """API endpoint for recent clusters formatted for mobile app.
+
+    Pages with an opaque ``cursor`` (returned in the ``X-Next-Cursor`` header);
+    the legacy ``page`` parameter is still accepted.
+    """
     per_page = int(request.args.get('limit', 50))
-    page = int(request.args.get('page', 1))
-    offset = (page - 1) * per_page
+    cursor = request.args.get('cursor') or None
+    page = request.args.get('page', type=int)
 
     q = request.args.get('q', '').strip()
     has_entities = request.args.get('has_entities', '')
@@ -257,97 +407,78 @@ def api_clusters():
     try:
         with get_session() as session:
             cluster_repo = ClusterRepository(session)
-
-            if q or has_entities or (category and category != 'all') or city:
-                clusters, _ = cluster_repo.get_clusters_with_filters(
-                    query=q if q else None,
-                    has_entities=has_entities == '1',
-                    category=category if category != 'all' else None,
-                    city=city if city else None,
-                    limit=per_page,
-                    offset=offset
-                )
-            else:
-                clusters = cluster_repo.get_recent_clusters(per_page, offset)
+            clusters, next_cursor, _ = fetch_cluster_page(
+                cluster_repo, per_page, q, has_entities, category, city,
+                cursor=cursor, page=page if page and not cursor else None, with_total=False
+            )
+            # Format for mobile API (maintain exact same structure)
+            result = format_cluster_feed(cluster_repo, clusters)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         logger.error(f"Error in api_clusters: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-    # Format for mobile API (maintain exact same structure)
-    result = []
-    for cluster in clusters:
-        with get_session() as session:
-            cluster_repo = ClusterRepository(session)
-            cluster_data = cluster_repo.get_cluster_details(cluster.id)
+    # Add caching headers
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'max-age=300'  # 5 minutes
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
-            if not cluster_data or not cluster_data['articles']:
-                continue
+@app.route('/api/clusters/changes')
+@cached_response(response_cache)
+def api_cluster_changes():
+    """API endpoint for delta sync of the mobile feed.
 
-            articles = cluster_data['articles']
-
-            # headline: cluster title
-            headline = cluster.title
-
-            # description: first article's description
-            description = articles[0]['description'] if articles else ''
-
-            # image_url: first article's image_url
-            image_url = articles[0]['image_url'] if articles else ''
-
-            # first_date_of_publication: min published_at
-            dates = []
-            for a in articles:
-                if a['published_at']:
-                    try:
-                        dates.append(datetime.fromisoformat(a['published_at'].replace('Z','+00:00')))
-                    except:
-                        pass
-            first_date = min(dates) if dates else None
-            first_date_str = first_date.isoformat() if first_date else ''
-
-            # number_of_sources: already there
-            number_of_sources = cluster.number_of_sources
-
-            # country/city: collect unique cities and countries
-            cities = set()
-            countries = set()
-            for article in articles:
-                if article.get('entities'):
-                    cities.update(article['entities'].get('cities', []))
-                    countries.update(article['entities'].get('countries', []))
-
-            # format as "Country/City"
-            location = ''
-            if countries and cities:
-                location = f"{list(countries)[0]}/{list(cities)[0]}"
-            elif countries:
-                location = list(countries)[0]
-            elif cities:
-                location = list(cities)[0]
-
-            result.append({
-                'id': cluster.id,
-                'headline': headline,
-                'description': description,
-                'image_url': image_url,
-                'country_city': location,
-                'first_date_of_publication': first_date_str,
-                'number_of_sources': number_of_sources,
-                'bias_distribution': cluster_data.get('bias_distribution'),
-                'is_trending': cluster.is_trending
-            })
+    Returns clusters created or modified after ``since`` (formatted like
+    ``/api/clusters`` items), ids of deleted clusters and the cursor to pass as
+    ``since`` next time. Without ``since`` only the current cursor is returned.
+    """
+    since = request.args.get('since') or None
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_CHANGES_LIMIT)
+
+    try:
+        with get_session() as session:
+            cluster_repo = ClusterRepository(session)
+            clusters, deleted, cursor, has_more = cluster_repo.get_changes(since, limit)
+            result = {
+                'clusters': format_cluster_feed(cluster_repo, clusters),
+                'deleted': deleted,
+                'cursor': cursor,
+                'has_more': has_more
+            }
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
-    # Add caching headers
     response = jsonify(result)
-    response.headers['Cache-Control'] = 'max-age=300'  # 5 minutes
+    response.headers['Cache-Control'] = 'max-age=60'  # 1 minute
     return response
 
 @app.route('/api/cluster/<int:cluster_id>')
+@cached_response(response_cache)
 def api_cluster(cluster_id):
-    """API endpoint for cluster details."""
-    with get_session() as session:
-        cluster_repo = ClusterRepository(session)
-        cluster = cluster_repo.get_cluster_details(cluster_id)
+    """API endpoint for cluster details.
+
+    ``fields`` is a comma-separated list of fields to return (``articles.<field>``
+    for article fields); ``articles_limit`` caps the embedded articles and the
+    returned ``articles_next_cursor`` is passed back as ``articles_cursor``.
+    """
+    fields = request.args.get('fields', '').strip()
+    fields = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+    articles_limit = request.args.get('articles_limit', type=int)
+    if 'articles_limit' in request.args and (articles_limit is None or articles_limit < 1):
+        return jsonify({'error': 'articles_limit must be a positive integer'}), 400
+
+    try:
+        with get_session() as session:
+            cluster_repo = ClusterRepository(session)
+            cluster = cluster_repo.get_cluster_details(
+                cluster_id, fields=fields, articles_limit=articles_limit,
+                articles_cursor=request.args.get('articles_cursor') or None
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     if cluster:
         # Bias and other source details are now included in the article data from the repository
@@ -358,6 +489,7 @@ def api_cluster(cluster_id):
     return jsonify({'error': 'Cluster not found'}), 404
 
 @app.route('/api/categories')
+@cached_response(response_cache, snapshots=snapshot_reader)
 def api_categories():
     """API endpoint for unique categories from entities."""
     with get_session() as session:
@@ -365,13 +497,14 @@ def api_categories():
         # Get categories from cluster filtering (this approximates the original logic)
         _, _ = cluster_repo.get_clusters_with_filters(limit=1, offset=0)
         # For now, return static categories (can be enhanced later)
-        categories = ['سياسة', 'أمن وعسكر', 'اقتصاد', 'رياضة', 'مجتمع وثقافة', 'مقالات رأي']
+        categories = CATEGORIES
 
     response = jsonify(categories)
     response.headers['Cache-Control'] = 'max-age=3600'  # 1 hour
     return response
 
 @app.route('/api/cities')
+@cached_response(response_cache, snapshots=snapshot_reader)
 def api_cities():
     """API endpoint for unique cities from entities."""
     with get_session() as session:
@@ -383,6 +516,7 @@ def api_cities():
     return response
 
 @app.route('/api/articles')
+@cached_response(response_cache)
 def api_articles():
     """API endpoint for articles with filtering."""
     filters = {}
@@ -413,16 +547,34 @@ def api_register_token():
     token = data.get('token')
     platform = data.get('platform')
 
+    topics = data.get('topics')
+    cities = data.get('cities')
+
     if not all([device_id, token, platform]):
         return jsonify({'error': 'Missing required fields'}), 400
+    if topics is not None and (not isinstance(topics, list) or any(t not in CATEGORY_TOPICS for t in topics)):
+        return jsonify({'error': f"topics must be a list of: {', '.join(CATEGORY_TOPICS)}"}), 400
+    if cities is not None and (not isinstance(cities, list) or not all(isinstance(c, str) and c.strip() for c in cities)):
+        return jsonify({'error': 'cities must be a list of city names'}), 400
+
+    if token_buffer is not None:
+        token_buffer.add({'user_id': user_id, 'device_id': device_id, 'token': token,
+                          'platform': platform, 'topics': topics, 'cities': cities})
+        return jsonify({'success': True, 'queued': True})
 
     try:
         with get_session() as session:
             token_repo = TokenRepository(session)
-            token_repo.store_or_update_token(user_id, device_id, token, platform)
+            user_token = token_repo.store_or_update_token(user_id, device_id, token, platform, topics, cities)
             session.commit()
+            chosen, followed_cities = user_token.topics, user_token.cities
 
-        return jsonify({'success': True})
+        # FCM subscriptions are applied in bulk by the notification worker
+        return jsonify({
+            'success': True,
+            'topics': chosen if chosen is not None else CATEGORY_TOPICS,
+            'cities': followed_cities or []
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -443,46 +595,52 @@ def api_send_notification():
         return jsonify({'error': 'Title and body are required'}), 400
 
     try:
-        result = notification_service.send_to_all_users(title, body, data_payload)
-        return jsonify(result)
+        return enqueue_notification_job(BROADCAST, {'title': title, 'body': body, 'data': data_payload})
     except Exception as e:
-        logger.error(f"Error sending notification: {e}")
+        logger.error(f"Error queueing notification: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/notify_new_cluster/<int:cluster_id>', methods=['POST'])
 def api_notify_new_cluster(cluster_id):
     """API endpoint to send notification for a new cluster."""
     try:
-        result = notification_service.send_new_cluster_notification(cluster_id)
-        return jsonify(result)
+        return enqueue_notification_job(NEW_CLUSTER, {'cluster_id': cluster_id})
     except Exception as e:
-        logger.error(f"Error sending new cluster notification: {e}")
+        logger.error(f"Error queueing new cluster notification: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/notify_popular_clusters', methods=['POST'])
 def api_notify_popular_clusters():
     """API endpoint to send notifications for popular clusters."""
     try:
-        popular_clusters = notification_service.get_popular_clusters_for_notification()
-
-        results = []
-        for cluster in popular_clusters:
-            result = notification_service.send_popular_cluster_notification(cluster['id'])
-            results.append({
-                'cluster_id': cluster['id'],
-                'title': cluster['title'],
-                'sources': cluster['number_of_sources'],
-                'notification_result': result
-            })
-
-        return jsonify({
-            'total_clusters': len(popular_clusters),
-            'results': results
-        })
+        return enqueue_notification_job(POPULAR_CLUSTERS)
     except Exception as e:
-        logger.error(f"Error sending popular cluster notifications: {e}")
+        logger.error(f"Error queueing popular cluster notifications: {e}")
         return jsonify({'error': str(e)}), 500
 
+def enqueue_notification_job(job_type, payload=None):
+    """Queue a notification job for the background sender and answer 202 with its id"""
+    with get_session() as session:
+        job = NotificationJobRepository(session).enqueue(job_type, payload)
+        session.commit()
+        job_id = job.id
+
+    response = jsonify({'job_id': job_id, 'status': 'queued',
+                        'status_url': f'/api/notification_jobs/{job_id}'})
+    response.status_code = 202
+    response.headers['Location'] = f'/api/notification_jobs/{job_id}'
+    return response
+
+@app.route('/api/notification_jobs/<int:job_id>')
+def api_notification_job(job_id):
+    """API endpoint for the status and progress counters of a notification job."""
+    with get_session() as session:
+        job_repo = NotificationJobRepository(session)
+        job = job_repo.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_repo.to_dict(job))
+
 @app.route('/api/notification_stats')
 def api_notification_stats():
     """API endpoint to get notification statistics."""
@@ -490,11 +648,13 @@ def api_notification_stats():
         with get_session() as session:
             token_repo = TokenRepository(session)
             stats = token_repo.get_token_stats()
+            prune_stats = token_repo.get_prune_stats()
 
         popular_clusters = notification_service.get_popular_clusters_for_notification()
 
         return jsonify({
             'token_stats': stats,
+            'pruned_tokens': prune_stats,
             'popular_clusters_count': len(popular_clusters),
             'popular_clusters': popular_clusters,
             'firebase_initialized': bool(notification_service._is_initialized())
@@ -503,6 +663,38 @@ def api_notification_stats():
         logger.error(f"Error getting notification stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events stream of cluster_created and trending_changed events.
+
+    Resumes after the ``Last-Event-ID`` header (or ``last_event_id`` parameter);
+    new connections start at the newest event. Idle streams get comment heartbeats.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id:
+        try:
+            after_id = int(last_event_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    else:
+        after_id = event_broadcaster.latest_id()
+
+    response = Response(
+        event_broadcaster.stream(after_id, heartbeat=STREAM_HEARTBEAT, max_seconds=STREAM_MAX_SECONDS),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/cache_stats')
+def api_cache_stats():
+    """API endpoint for response cache hit/miss counters of this worker."""
+    return jsonify({**response_cache.stats(), 'compression': compressor.stats(),
+                    'stream': event_broadcaster.stats(),
+                    'token_buffer': token_buffer.stats() if token_buffer is not None else None})
+
 # Health check endpoint
 @app.route('/health')
 def health():
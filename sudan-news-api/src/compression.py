@@ -0,0 +1,131 @@
+"""
+Negotiated response compression for the Flask app.
+
+Text responses at or above a size threshold are compressed with brotli (when
+the ``brotli`` package is installed and the client accepts it) or gzip. The
+compressed body of a response with a strong ETag is determined by that ETag
+and the encoding, so it is kept in a small LRU and reused instead of being
+compressed again; cached API responses therefore pay for compression once per
+data version.
+"""
+
+import gzip
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import request
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Appended to a strong ETag for each encoded representation
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain',
+    'application/javascript', 'text/javascript', 'image/svg+xml'
+}
+
+class Compressor:
+    """after_request hook that compresses responses and caches compressed bodies"""
+
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5,
+                 cache_size: int = 256):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'compressed': 0, 'cache_hits': 0, 'skipped_small': 0,
+                          'bytes_in': 0, 'bytes_out': 0}
+
+    def choose_encoding(self, accept_encodings) -> Optional[str]:
+        """Best supported encoding the client accepts, or None"""
+        if BROTLI_AVAILABLE and accept_encodings['br'] > 0:
+            return 'br'
+        if accept_encodings['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _store(self, key: Tuple[str, str], body: bytes):
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _count(self, **amounts: int):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._counters[name] += amount
+
+    def after_request(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_size:
+            self._count(skipped_small=1)
+            return response
+
+        encoding = self.choose_encoding(request.accept_encodings)
+        if not encoding:
+            return response
+
+        etag, weak = response.get_etag()
+        cache_key = (etag, encoding) if etag and not weak else None
+        body = self._cached(cache_key) if cache_key else None
+        if body is not None:
+            self._count(cache_hits=1)
+        else:
+            body = self.compress(data, encoding)
+            if cache_key:
+                self._store(cache_key, body)
+
+        self._count(compressed=1, bytes_in=len(data), bytes_out=len(body))
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+        return response
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._cache)
+        saved = counters['bytes_in'] - counters['bytes_out']
+        return {
+            **counters,
+            'saved_ratio': round(saved / counters['bytes_in'], 3) if counters['bytes_in'] else 0.0,
+            'cached_bodies': entries,
+            'brotli_available': BROTLI_AVAILABLE
+        }
+
+def init_compression(app, **kwargs) -> Compressor:
+    """Register response compression on a Flask app"""
+    compressor = Compressor(**kwargs)
+    app.after_request(compressor.after_request)
+    return compressor
@@ -0,0 +1,142 @@
+"""
+Server-Sent Events for /api/stream.
+
+The pipeline appends cluster events to the cluster_events table (see
+EventRepository) in the same transaction as the changes they describe. Each
+API worker runs a single background poller that reads new rows and wakes every
+connected stream, so the number of open streams does not multiply database
+load. Recent events are kept in memory for clients resuming with
+Last-Event-ID; older ones are replayed from the table.
+
+Streams hold a connection open, so production deployments should run gunicorn
+with an async worker class (GUNICORN_WORKER_CLASS=gevent, see gunicorn.conf.py).
+Under sync workers streams are closed after STREAM_MAX_SECONDS and clients
+reconnect, resuming from the last event they saw.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (event id, event type, JSON data)
+Event = Tuple[int, str, str]
+
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 5000
+
+def format_event(event: Event) -> str:
+    """One SSE message"""
+    event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+class EventBroadcaster:
+    """Polls the event log in one thread per process and fans events out to streams"""
+
+    def __init__(self, loader: Callable[[int, int], List[Event]], latest_loader: Callable[[], int],
+                 poll_interval: float = 1.0, buffer_size: int = 500, batch_size: int = 100):
+        self.loader = loader
+        self.latest_loader = latest_loader
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+
+        self._condition = threading.Condition()
+        self._events: "deque[Event]" = deque()
+        # Buffered events cover ids after _floor up to _last_id
+        self._floor = 0
+        self._last_id = 0
+        self._subscribers = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._last_id = self._floor = self.latest_loader()
+            self._thread = threading.Thread(target=self._run, name='event-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Event poll failed: {e}")
+
+    def poll(self) -> int:
+        """Read events newer than the last one seen and wake waiting streams"""
+        count = 0
+        while True:
+            events = self.loader(self._last_id, self.batch_size)
+            if not events:
+                return count
+            with self._condition:
+                self._events.extend(events)
+                while len(self._events) > self.buffer_size:
+                    self._floor = self._events.popleft()[0]
+                self._last_id = events[-1][0]
+                self._condition.notify_all()
+            count += len(events)
+            if len(events) < self.batch_size:
+                return count
+
+    def latest_id(self) -> int:
+        """Id of the newest event seen, where new streams start"""
+        self._ensure_started()
+        with self._condition:
+            return self._last_id
+
+    def _buffered_after(self, after_id: int) -> Optional[List[Event]]:
+        if after_id < self._floor:
+            return None
+        return [event for event in self._events if event[0] > after_id]
+
+    def wait(self, after_id: int, timeout: float) -> List[Event]:
+        """Events after an id, blocking up to timeout when there are none yet"""
+        self._ensure_started()
+        with self._condition:
+            events = self._buffered_after(after_id)
+            if events == []:
+                self._condition.wait(timeout)
+                events = self._buffered_after(after_id)
+
+        if events is None:
+            # Older than the in-memory buffer: replay from the table
+            events = self.loader(after_id, self.batch_size)
+        return events
+
+    def stream(self, after_id: int, heartbeat: float = 15.0, max_seconds: float = 300.0) -> Iterator[str]:
+        """SSE messages for events after an id, with comment heartbeats while idle"""
+        with self._condition:
+            self._subscribers += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            deadline = time.monotonic() + max_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = self.wait(after_id, min(heartbeat, remaining))
+                if not events:
+                    yield ": heartbeat\n\n"
+                    continue
+                for event in events:
+                    yield format_event(event)
+                after_id = events[-1][0]
+        finally:
+            with self._condition:
+                self._subscribers -= 1
+
+    def stats(self):
+        """Stream counters for this worker process"""
+        with self._condition:
+            return {
+                'subscribers': self._subscribers,
+                'last_event_id': self._last_id,
+                'buffered_events': len(self._events)
+            }
@@ -0,0 +1,127 @@
+"""
+Pluggable FCM delivery for the NotificationService.
+
+FirebaseTransport calls the Firebase Admin SDK and is what production uses.
+HttpTransport speaks a small JSON protocol to mock_fcm_server.py, so
+broadcasts can be load tested without Firebase. It hands back the same
+SendResponse, BatchResponse and TopicManagementResponse objects and raises
+the same firebase_admin exceptions as the SDK, so the service's retry and
+pruning logic runs unchanged.
+
+Select the transport with FCM_TRANSPORT (firebase or http) and point the
+http transport at the mock with FCM_MOCK_URL.
+"""
+
+import os
+import threading
+from typing import List
+
+import requests
+from firebase_admin import messaging, exceptions
+
+# FCM error status -> exception raised by the Admin SDK
+_ERRORS = {
+    'UNREGISTERED': messaging.UnregisteredError,
+    'SENDER_ID_MISMATCH': messaging.SenderIdMismatchError,
+    'QUOTA_EXCEEDED': messaging.QuotaExceededError,
+    'INVALID_ARGUMENT': exceptions.InvalidArgumentError,
+    'NOT_FOUND': exceptions.NotFoundError,
+    'UNAVAILABLE': exceptions.UnavailableError,
+    'INTERNAL': exceptions.InternalError,
+    'DEADLINE_EXCEEDED': exceptions.DeadlineExceededError,
+    'RESOURCE_EXHAUSTED': exceptions.ResourceExhaustedError,
+}
+
+def error_from_status(status: str, message: str = '') -> exceptions.FirebaseError:
+    """The firebase_admin exception for an FCM error status"""
+    error_class = _ERRORS.get(status)
+    if error_class is None:
+        return exceptions.UnknownError(message or status)
+    return error_class(message or status)
+
+class FirebaseTransport:
+    """Delivers through the Firebase Admin SDK"""
+
+    name = 'firebase'
+    requires_firebase = True
+
+    def send(self, message: messaging.Message) -> str:
+        return messaging.send(message)
+
+    def send_each_for_multicast(self, message: messaging.MulticastMessage) -> messaging.BatchResponse:
+        return messaging.send_each_for_multicast(message)
+
+    def subscribe_to_topic(self, tokens: List[str], topic: str) -> messaging.TopicManagementResponse:
+        return messaging.subscribe_to_topic(tokens, topic)
+
+    def unsubscribe_from_topic(self, tokens: List[str], topic: str) -> messaging.TopicManagementResponse:
+        return messaging.unsubscribe_from_topic(tokens, topic)
+
+class HttpTransport:
+    """Delivers to an FCM stand-in such as mock_fcm_server.py"""
+
+    name = 'http'
+    requires_firebase = False
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # One connection pool per sender thread
+        self._local = threading.local()
+
+    def _post(self, path: str, payload: dict) -> dict:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        try:
+            response = session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        except requests.Timeout as e:
+            raise exceptions.DeadlineExceededError(str(e), cause=e)
+        except requests.RequestException as e:
+            raise exceptions.UnavailableError(str(e), cause=e)
+
+        body = response.json() if response.content else {}
+        if response.status_code != 200:
+            error = body.get('error', {})
+            raise error_from_status(error.get('status', ''), error.get('message', f'HTTP {response.status_code}'))
+        return body
+
+    @staticmethod
+    def _message_payload(message) -> dict:
+        notification = message.notification
+        return {
+            'title': notification.title if notification else None,
+            'body': notification.body if notification else None,
+            'data': message.data or {}
+        }
+
+    @staticmethod
+    def _send_response(result: dict) -> messaging.SendResponse:
+        error = result.get('error')
+        if error:
+            return messaging.SendResponse(None, error_from_status(error.get('status', ''), error.get('message', '')))
+        return messaging.SendResponse({'name': result.get('name')}, None)
+
+    def send(self, message: messaging.Message) -> str:
+        payload = self._message_payload(message)
+        payload.update({'token': message.token, 'topic': message.topic})
+        return self._post('/v1/send', payload)['name']
+
+    def send_each_for_multicast(self, message: messaging.MulticastMessage) -> messaging.BatchResponse:
+        payload = self._message_payload(message)
+        # Newer SDKs call the token list fids and deprecate .tokens
+        payload['tokens'] = getattr(message, 'fids', None) or message.tokens
+        body = self._post('/v1/send_multicast', payload)
+        return messaging.BatchResponse([self._send_response(result) for result in body['responses']])
+
+    def subscribe_to_topic(self, tokens: List[str], topic: str) -> messaging.TopicManagementResponse:
+        return messaging.TopicManagementResponse(self._post('/v1/topics:subscribe', {'tokens': tokens, 'topic': topic}))
+
+    def unsubscribe_from_topic(self, tokens: List[str], topic: str) -> messaging.TopicManagementResponse:
+        return messaging.TopicManagementResponse(self._post('/v1/topics:unsubscribe', {'tokens': tokens, 'topic': topic}))
+
+def get_transport():
+    """Transport selected by FCM_TRANSPORT, defaulting to Firebase"""
+    if os.getenv('FCM_TRANSPORT', 'firebase') == 'http':
+        return HttpTransport(os.getenv('FCM_MOCK_URL', 'http://127.0.0.1:8099'))
+    return FirebaseTransport()
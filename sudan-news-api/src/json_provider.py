@@ -0,0 +1,28 @@
+"""
+Flask JSON provider backed by shared_models.json_utils.
+
+Produces the same bytes as the pipeline's snapshot files, whether orjson is
+installed or not.
+"""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+from shared_models.json_utils import dumps_bytes
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes response bodies straight to bytes"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, default=self.default).decode('utf-8').rstrip('\n')
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Pretty-printed debug output keeps the stdlib path
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, default=self.default), mimetype=self.mimetype)
@@ -6,24 +6,83 @@ ONLY FCM is used. Expo notifications have been completely removed.
 """
 
 import os
+import time
+import random
+import zlib
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, messaging, exceptions
 
 from shared_models.repositories.token_repository import TokenRepository
-from shared_models.repositories.cluster_repository import ClusterRepository
+from shared_models.repositories.cluster_repository import ClusterRepository, CATEGORY_MAPPING
+from shared_models.repositories.app_state_repository import AppStateRepository, TOPICS_SIGNATURE
+from shared_models.repositories.notification_log_repository import NotificationLogRepository, POPULAR_CLUSTER
 from shared_models.db import get_session
+from .fcm_transport import get_transport
 
 logger = logging.getLogger(__name__)
 
+# Batched delivery: tokens per send_each_for_multicast call (FCM allows at most 500),
+# batches in flight at once, and retries of transient failures with exponential backoff
+FCM_BATCH_SIZE = min(int(os.getenv('FCM_BATCH_SIZE', 500)), 500)
+FCM_MAX_WORKERS = int(os.getenv('FCM_MAX_WORKERS', 4))
+FCM_MAX_RETRIES = int(os.getenv('FCM_MAX_RETRIES', 3))
+FCM_RETRY_BACKOFF = float(os.getenv('FCM_RETRY_BACKOFF', 1.0))
+
+# Errors worth retrying: the token is fine, FCM was busy or unreachable
+TRANSIENT_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    exceptions.ResourceExhaustedError,
+)
+
+# Errors meaning the token itself is dead (app uninstalled, malformed token);
+# such tokens are deleted after the send
+INVALID_TOKEN_ERRORS = (
+    messaging.UnregisteredError,
+    exceptions.InvalidArgumentError,
+)
+
+# Topic fan-out: every token is subscribed to ALL_TOPIC, so a broadcast is one
+# message to FCM. Cluster pushes are targeted by category and city through
+# token_interests instead, so there are no per-category topics to keep in sync
+FCM_USE_TOPICS = os.getenv('FCM_USE_TOPICS', '1') == '1'
+ALL_TOPIC = 'all'
+SUBSCRIBED_TOPICS = [ALL_TOPIC]
+# Category slugs a device may choose when registering
+CATEGORY_TOPICS = list(CATEGORY_MAPPING)
+# Tokens per subscribe_to_topic / unsubscribe_from_topic call (FCM allows at most 1000)
+TOPIC_BATCH_SIZE = 1000
+# Topic management errors meaning the token itself is dead
+# (firebase-admin 7 reports the IID status, older releases a mapped reason string)
+INVALID_TOPIC_TOKEN_REASONS = ('NOT_FOUND', 'INVALID_ARGUMENT',
+                               'registration-token-not-registered', 'invalid-argument')
+
+# A popular cluster already pushed is only pushed again once it has gained at
+# least POPULAR_RESEND_MIN_ARTICLES articles and POPULAR_RESEND_GROWTH (a fraction)
+# of its size at the last push
+POPULAR_RESEND_MIN_ARTICLES = int(os.getenv('POPULAR_RESEND_MIN_ARTICLES', 2))
+POPULAR_RESEND_GROWTH = float(os.getenv('POPULAR_RESEND_GROWTH', 0.5))
+
+def has_grown(article_count: int, last_sent_count: int) -> bool:
+    """Whether a cluster has grown enough since its last push to be worth another"""
+    gained = article_count - last_sent_count
+    return gained >= POPULAR_RESEND_MIN_ARTICLES and gained >= last_sent_count * POPULAR_RESEND_GROWTH
+
 class NotificationService:
     """Service for sending push notifications via Firebase Cloud Messaging"""
 
-    def __init__(self):
+    def __init__(self, transport=None):
         self._initialized = False
-        self._initialize_firebase()
+        # Firebase in production; FCM_TRANSPORT=http sends to a local stand-in instead
+        self.transport = transport or get_transport()
+        if self.transport.requires_firebase:
+            self._initialize_firebase()
 
     def _initialize_firebase(self):
         """Initialize Firebase Admin SDK"""
@@ -62,52 +121,201 @@ class NotificationService:
             return '/var/www/sudanese_news/shared/firebase_key.json'
 
     def _is_initialized(self) -> bool:
+        if not self.transport.requires_firebase:
+            return True
         return self._initialized and firebase_admin._apps
 
     # ------------------------------------------------------------------
     # PUBLIC - Send to all tokens
     # ------------------------------------------------------------------
-    def send_to_all_users(self, title: str, body: str, data: Dict[str, str] = None) -> Dict[str, Any]:
+    def send_to_all_users(self, title: str, body: str, data: Dict[str, str] = None,
+                          progress=None) -> Dict[str, Any]:
+        """Broadcast to every registered token. ``progress`` (see notification_worker.JobProgress)
+        is told the recipient count and each batch's result as the send proceeds."""
 
         if not self._is_initialized():
             logger.error("Firebase not initialized")
             return {'success': 0, 'failure': 0, 'error': 'Firebase not initialized'}
 
         try:
-            with get_session() as session:
-                token_repo = TokenRepository(session)
-                tokens = token_repo.get_all_active_tokens()
+            if FCM_USE_TOPICS:
+                return self._send_to_all_via_topic(title, body, data, progress)
 
-            if not tokens:
+            result = self.send_to_token_shard(title, body, data, progress)
+            if not result['batches']:
                 logger.info("No active tokens found")
                 return {'success': 0, 'failure': 0, 'message': 'No active tokens'}
+            return result
 
-            success = 0
-            failure = 0
+        except Exception as e:
+            logger.error(f"Error sending notifications: {e}")
+            return {'success': 0, 'failure': 0, 'error': str(e)}
 
-            for t in tokens:
-                token = t["token"]
-                try:
-                    self._send_single_fcm_notification(token, title, body, data)
-                    success += 1
-                except Exception as e:
-                    logger.error(f"Failed to send to {token[:20]}...: {e}")
-                    failure += 1
+    def send_to_token_shard(self, title: str, body: str, data: Dict[str, str] = None, progress=None,
+                            shard: int = 0, shard_count: int = 1) -> Dict[str, Any]:
+        """
+        Send one notification to every token in a shard (all tokens by default).
 
-            return {'success': success, 'failure': failure}
+        Tokens are read FCM_BATCH_SIZE at a time and each batch is sent as soon
+        as it is read, so memory stays bounded however many tokens there are.
+        Workers each given a different ``shard`` of the same ``shard_count``
+        split a broadcast between them.
+        """
+        with get_session() as session:
+            chunks = TokenRepository(session).iter_token_chunks(FCM_BATCH_SIZE, shard, shard_count)
+            batches = ([t['token'] for t in chunk] for chunk in chunks)
+            return self._send_batches(batches, title, body, data, progress, count_recipients=True)
+
+    def send_to_interested_users(self, categories: List[str], cities: List[str], title: str, body: str,
+                                 data: Dict[str, str] = None, progress=None) -> Dict[str, Any]:
+        """
+        Send to tokens following any of these categories or cities (and those
+        following every category), streamed FCM_BATCH_SIZE at a time like
+        send_to_token_shard.
+        """
+        if not self._is_initialized():
+            logger.error("Firebase not initialized")
+            return {'success': 0, 'failure': 0, 'error': 'Firebase not initialized'}
+
+        try:
+            with get_session() as session:
+                chunks = TokenRepository(session).iter_interested_token_chunks(categories, cities, FCM_BATCH_SIZE)
+                batches = ([t['token'] for t in chunk] for chunk in chunks)
+                result = self._send_batches(batches, title, body, data, progress, count_recipients=True)
+
+            targeting = {'categories': categories, 'cities': cities,
+                         'tokens': sum(b['tokens'] for b in result['batches'])}
+            if not result['batches']:
+                logger.info(f"No tokens interested in {targeting}")
+                return {'success': 0, 'failure': 0, 'message': 'No interested tokens', 'targeting': targeting}
+
+            result['targeting'] = targeting
+            return result
 
         except Exception as e:
-            logger.error(f"Error sending notifications: {e}")
+            logger.error(f"Error sending targeted notifications: {e}")
             return {'success': 0, 'failure': 0, 'error': str(e)}
 
+    def _send_for_cluster(self, cluster_id: int, title: str, body: str,
+                          data: Dict[str, str], progress=None) -> Dict[str, Any]:
+        """Send a cluster notification to the tokens interested in its categories and cities"""
+        with get_session() as session:
+            categories, cities = ClusterRepository(session).get_cluster_interests(cluster_id)
+        return self.send_to_interested_users(categories, cities, title, body, data, progress)
+
+    def send_to_topic(self, topic: str, title: str, body: str, data: Dict[str, str] = None) -> str:
+        """Publish one message to an FCM topic. Returns the FCM message id."""
+        message = messaging.Message(topic=topic, **self._message_fields(title, body, data))
+        return self.transport.send(message)
+
+    def _send_to_all_via_topic(self, title: str, body: str, data: Dict[str, str] = None,
+                               progress=None) -> Dict[str, Any]:
+        """One message to the "all" topic, plus a multicast to tokens not yet subscribed to it"""
+        if progress:
+            progress.start(1)
+        message_id = self.send_to_topic(ALL_TOPIC, title, body, data)
+        if progress:
+            progress.batch_done({'success': 1, 'failure': 0})
+        logger.info(f"FCM topic '{ALL_TOPIC}' message sent: {message_id}")
+
+        result = {'success': 1, 'failure': 0, 'topic': ALL_TOPIC, 'message_id': message_id}
+
+        with get_session() as session:
+            chunks = TokenRepository(session).iter_unsubscribed_token_chunks(FCM_BATCH_SIZE)
+            batches = ([t['token'] for t in chunk] for chunk in chunks)
+            fallback = self._send_batches(batches, title, body, data, progress, count_recipients=True)
+        if fallback['batches']:
+            result['success'] += fallback['success']
+            result['failure'] = fallback['failure']
+            result['unsubscribed_fallback'] = fallback
+        return result
+
+    # ------------------------------------------------------------------
+    # Topic subscriptions
+    # ------------------------------------------------------------------
+    def sync_topic_subscriptions(self) -> Dict[str, int]:
+        """
+        Subscribe one batch of new tokens to SUBSCRIBED_TOPICS with FCM.
+
+        Every API worker process runs this; each batch is claimed first so
+        workers never send the same subscriptions.
+
+        Subscriptions and unsubscriptions are grouped per topic, so a batch costs
+        one FCM call per topic rather than one per token. When the topic list
+        itself has changed since the last run every token is queued again.
+        Returns counts; 'has_more' is set when more dirty tokens may be waiting.
+        """
+        counts = {'tokens': 0, 'synced': 0, 'failed': 0, 'pruned': 0, 'has_more': False}
+        if not self._is_initialized():
+            return counts
+
+        with get_session() as session:
+            token_repo = TokenRepository(session)
+            self._check_topic_signature(session, token_repo)
+
+            rows = token_repo.claim_topic_sync_batch(TOPIC_BATCH_SIZE)
+            if not rows:
+                return counts
+            counts['tokens'] = len(rows)
+
+            # Unsubscribes drop topics a token was given by an older topic list
+            changes = defaultdict(list)  # (subscribe?, topic) -> rows
+            for row in rows:
+                current = set(row.subscribed_topics or [])
+                for topic in set(SUBSCRIBED_TOPICS) - current:
+                    changes[(True, topic)].append(row)
+                for topic in current - set(SUBSCRIBED_TOPICS):
+                    changes[(False, topic)].append(row)
+
+            failed_ids = set()
+            invalid = set()
+            for (subscribe, topic), topic_rows in changes.items():
+                call = self.transport.subscribe_to_topic if subscribe else self.transport.unsubscribe_from_topic
+                try:
+                    response = call([row.token for row in topic_rows], topic)
+                except Exception as e:
+                    logger.warning(f"FCM topic {'subscribe' if subscribe else 'unsubscribe'} '{topic}' failed: {e}")
+                    failed_ids.update(row.id for row in topic_rows)
+                    continue
+                for error in response.errors:
+                    row = topic_rows[error.index]
+                    if error.reason in INVALID_TOPIC_TOKEN_REASONS:
+                        invalid.add(row.token)
+                    else:
+                        failed_ids.add(row.id)
+
+            # Failed tokens are handed back and retried on the next pass
+            synced = {row.id: SUBSCRIBED_TOPICS for row in rows
+                      if row.id not in failed_ids and row.token not in invalid}
+            token_repo.mark_topics_synced(synced, failed_ids)
+            counts['synced'] = len(synced)
+            counts['failed'] = len(failed_ids)
+            # Stop draining when FCM rejected the whole batch; it is retried next poll
+            counts['has_more'] = len(rows) >= TOPIC_BATCH_SIZE and len(failed_ids) < len(rows)
+
+        if invalid:
+            counts['pruned'] = self.cleanup_invalid_tokens(list(invalid))
+        logger.info(f"FCM topic sync: {counts}")
+        return counts
+
+    def _check_topic_signature(self, session, token_repo: TokenRepository):
+        """Queue all tokens for re-subscription when the topic list has changed"""
+        signature = zlib.crc32(','.join(SUBSCRIBED_TOPICS).encode('utf-8')) & 0x7fffffff
+        app_state = AppStateRepository(session)
+        if app_state.get(TOPICS_SIGNATURE) != signature:
+            queued = token_repo.mark_all_topics_dirty()
+            app_state.set(TOPICS_SIGNATURE, signature)
+            session.commit()
+            logger.info(f"FCM topic list changed, {queued} tokens queued for re-subscription")
+
     # ------------------------------------------------------------------
     # Send new cluster notification
     # ------------------------------------------------------------------
-    def send_new_cluster_notification(self, cluster_id: int) -> Dict[str, Any]:
+    def send_new_cluster_notification(self, cluster_id: int, progress=None) -> Dict[str, Any]:
         try:
             with get_session() as session:
                 repo = ClusterRepository(session)
-                cluster = repo.get_cluster_details(cluster_id)
+                cluster = repo.get_cluster_details(cluster_id, fields=['title'])
 
             if not cluster:
                 return {'error': f'Cluster {cluster_id} not found'}
@@ -117,7 +325,7 @@ class NotificationService:
 
             data = {"clusterId": str(cluster_id), "type": "new_cluster"}
 
-            return self.send_to_all_users(title, body, data)
+            return self._send_for_cluster(cluster_id, title, body, data, progress)
 
         except Exception as e:
             logger.error(f"Error sending new cluster notification: {e}")
@@ -130,38 +338,8 @@ class NotificationService:
         """Get clusters that have 2 or more articles (considered 'popular/developing' news)"""
         try:
             with get_session() as session:
-                repo = ClusterRepository(session)
-                # Get recent clusters from last 48 hours
-                from datetime import datetime, timedelta
-                cutoff = datetime.now() - timedelta(hours=48)
-
-                # Get recent clusters and filter those with 2+ articles
-                recent_clusters = repo.get_recent_clusters(limit=100)  # Get more to filter
-                popular_clusters = []
-
-                for cluster in recent_clusters:
-                    # Check if cluster was created within last 48 hours
-                    try:
-                        cluster_date = datetime.fromisoformat(cluster.created_at.replace('Z', '+00:00'))
-                        if cluster_date < cutoff:
-                            continue
-                    except:
-                        continue
-
-                    # Get cluster details to check article count
-                    cluster_details = repo.get_cluster_details(cluster.id)
-                    if cluster_details and len(cluster_details.get('articles', [])) >= 2:
-                        popular_clusters.append({
-                            'id': cluster.id,
-                            'title': cluster.title,
-                            'number_of_sources': cluster.number_of_sources,
-                            'article_count': len(cluster_details['articles']),
-                            'created_at': cluster.created_at
-                        })
-
-                # Sort by article count (most articles first) and limit to top 10
-                popular_clusters.sort(key=lambda x: x['article_count'], reverse=True)
-                return popular_clusters[:10]
+                # Top 10 clusters from the last 48 hours by article count
+                return ClusterRepository(session).get_popular_clusters(hours=48, min_articles=2, limit=10)
 
         except Exception as e:
             logger.error(f"Error getting popular clusters for notification: {e}")
@@ -170,11 +348,13 @@ class NotificationService:
     # ------------------------------------------------------------------
     # Send popular cluster notification
     # ------------------------------------------------------------------
-    def send_popular_cluster_notification(self, cluster_id: int) -> Dict[str, Any]:
+    def send_popular_cluster_notification(self, cluster_id: int, progress=None) -> Dict[str, Any]:
         try:
             with get_session() as session:
                 repo = ClusterRepository(session)
-                cluster = repo.get_cluster_details(cluster_id)
+                cluster = repo.get_cluster_details(
+                    cluster_id, fields=['title', 'articles.headline', 'articles.published_at']
+                )
 
             if not cluster:
                 return {'error': f'Cluster {cluster_id} not found'}
@@ -216,44 +396,224 @@ class NotificationService:
                 "articleCount": str(article_count)
             }
 
-            return self.send_to_all_users(title, body, data)
+            return self._send_for_cluster(cluster_id, title, body, data, progress)
 
         except Exception as e:
             logger.error(f"Error sending popular cluster notification: {e}")
             return {'error': str(e)}
 
+    def send_popular_clusters_notifications(self, progress=None) -> Dict[str, Any]:
+        """
+        Notify popular clusters that are new or have grown since they were last
+        pushed (see has_grown). Each send is recorded in the notification log.
+        """
+        popular_clusters = self.get_popular_clusters_for_notification()
+
+        with get_session() as session:
+            sent_counts = NotificationLogRepository(session).get_sent_counts(
+                POPULAR_CLUSTER, [cluster['id'] for cluster in popular_clusters]
+            )
+
+        results = []
+        skipped = []
+        for cluster in popular_clusters:
+            last_sent_count = sent_counts.get(cluster['id'])
+            if last_sent_count is not None and not has_grown(cluster['article_count'], last_sent_count):
+                skipped.append(cluster['id'])
+                continue
+
+            result = self.send_popular_cluster_notification(cluster['id'], progress)
+            if 'error' not in result:
+                with get_session() as session:
+                    NotificationLogRepository(session).record_sent(
+                        POPULAR_CLUSTER, cluster['id'], cluster['article_count']
+                    )
+                    session.commit()
+            results.append({
+                'cluster_id': cluster['id'],
+                'title': cluster['title'],
+                'sources': cluster['number_of_sources'],
+                'article_count': cluster['article_count'],
+                'previous_article_count': last_sent_count,
+                'notification_result': result
+            })
+
+        if skipped:
+            logger.info(f"Skipped {len(skipped)} popular clusters already notified: {skipped}")
+        return {
+            'total_clusters': len(popular_clusters),
+            'sent_clusters': len(results),
+            'skipped_clusters': skipped,
+            'results': results
+        }
+
     # ------------------------------------------------------------------
     # INTERNAL - FCM ONLY (Expo removed)
     # ------------------------------------------------------------------
-    def _send_single_fcm_notification(self, token: str, title: str, body: str, data: Dict[str, str] = None):
-        """
-        Sends a SINGLE FCM notification.
-        This is the only notification method that remains.
+    def _send_multicast(self, tokens: List[str], title: str, body: str,
+                        data: Dict[str, str] = None, progress=None) -> Dict[str, Any]:
+        """Send one notification to a list of tokens in batches of FCM_BATCH_SIZE"""
+        if progress:
+            progress.start(len(tokens))
+        batches = (tokens[i:i + FCM_BATCH_SIZE] for i in range(0, len(tokens), FCM_BATCH_SIZE))
+        return self._send_batches(batches, title, body, data, progress)
+
+    def _send_batches(self, batches: Iterable[List[str]], title: str, body: str,
+                      data: Dict[str, str] = None, progress=None,
+                      count_recipients: bool = False) -> Dict[str, Any]:
         """
+        Send one notification to each batch of tokens.
 
-        # Ensure we always send a proper FCM notification payload:
-        message = messaging.Message(
-            token=token,
-            notification=messaging.Notification(
+        Batches go out concurrently on up to FCM_MAX_WORKERS threads. At most
+        twice that many are in flight, so a lazily read ``batches`` is only
+        consumed as fast as FCM accepts it. With ``count_recipients`` progress
+        is told each batch's size as it is read rather than a total up front.
+        Returns the overall success/failure counts plus per-batch counts and latency.
+        """
+        started = time.perf_counter()
+        max_in_flight = max(1, FCM_MAX_WORKERS) * 2
+        results = []
+
+        def collect(futures):
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if progress:
+                    progress.batch_done(result)
+
+        with ThreadPoolExecutor(max_workers=max(1, FCM_MAX_WORKERS)) as pool:
+            in_flight = set()
+            for index, batch in enumerate(batches):
+                if progress and count_recipients:
+                    progress.start(len(batch))
+                in_flight.add(pool.submit(self._send_batch, index, batch, title, body, data))
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(as_completed(in_flight))
+        results.sort(key=lambda r: r['batch'])
+
+        success = sum(r['success'] for r in results)
+        failure = sum(r['failure'] for r in results)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"FCM multicast: {success} sent, {failure} failed in {len(results)} batches, {elapsed_ms}ms")
+
+        # Stop paying to send to uninstalled devices on the next broadcast
+        invalid = [token for r in results for token in r.pop('invalid_tokens')]
+        pruned = self.cleanup_invalid_tokens(invalid) if invalid else 0
+        if progress and pruned:
+            progress.tokens_pruned(pruned)
+
+        return {
+            'success': success,
+            'failure': failure,
+            'pruned': pruned,
+            'batches': results,
+            'elapsed_ms': elapsed_ms
+        }
+
+    def _send_batch(self, index: int, tokens: List[str], title: str, body: str,
+                    data: Dict[str, str] = None) -> Dict[str, Any]:
+        """Send one multicast batch, retrying transient failures with backoff"""
+        started = time.perf_counter()
+        pending = tokens
+        success = 0
+        failure = 0
+        attempt = 0
+        invalid = []
+
+        while pending:
+            retry = []
+            try:
+                response = self.transport.send_each_for_multicast(self._build_multicast(pending, title, body, data))
+                rejected = []
+                for token, result in zip(pending, response.responses):
+                    if result.success:
+                        success += 1
+                    elif isinstance(result.exception, TRANSIENT_ERRORS):
+                        retry.append(token)
+                    else:
+                        failure += 1
+                        if isinstance(result.exception, INVALID_TOKEN_ERRORS):
+                            rejected.append(token)
+                        logger.debug(f"FCM send to {token[:20]}... failed: {result.exception}")
+
+                # INVALID_ARGUMENT for every token points at the message, not the tokens
+                if len(pending) > 1 and len(rejected) == len(pending):
+                    logger.error(f"FCM batch {index}: every token rejected, not pruning: "
+                                 f"{response.responses[0].exception}")
+                else:
+                    invalid.extend(rejected)
+            except TRANSIENT_ERRORS as e:
+                logger.warning(f"FCM batch {index} attempt {attempt + 1} failed: {e}")
+                retry = pending
+            except Exception as e:
+                logger.error(f"FCM batch {index} failed: {e}")
+                failure += len(pending)
+                break
+
+            if retry and attempt < FCM_MAX_RETRIES:
+                time.sleep(FCM_RETRY_BACKOFF * (2 ** attempt) * (1 + random.random() / 2))
+                attempt += 1
+                pending = retry
+            else:
+                failure += len(retry)
+                break
+
+        return {
+            'batch': index,
+            'tokens': len(tokens),
+            'success': success,
+            'failure': failure,
+            'attempts': attempt + 1,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            'invalid_tokens': invalid
+        }
+
+    def _build_multicast(self, tokens: List[str], title: str, body: str,
+                         data: Dict[str, str] = None) -> messaging.MulticastMessage:
+        """Same payload as _send_single_fcm_notification, for many tokens"""
+        return messaging.MulticastMessage(tokens=tokens, **self._message_fields(title, body, data))
+
+    def _message_fields(self, title: str, body: str, data: Dict[str, str] = None) -> Dict[str, Any]:
+        """Notification, data and Android options shared by every message kind"""
+        return {
+            'notification': messaging.Notification(
                 title=title,
                 body=body
             ),
-            data=data or {},
-            android=messaging.AndroidConfig(
+            'data': data or {},
+            'android': messaging.AndroidConfig(
                 priority="high",
                 notification=messaging.AndroidNotification(
                     channel_id="default",
                 )
             )
-        )
+        }
 
-        response = messaging.send(message)
+    def _send_single_fcm_notification(self, token: str, title: str, body: str, data: Dict[str, str] = None):
+        """
+        Sends a SINGLE FCM notification.
+        Broadcasts go through _send_multicast instead.
+        """
+
+        # Ensure we always send a proper FCM notification payload:
+        message = messaging.Message(token=token, **self._message_fields(title, body, data))
+
+        response = self.transport.send(message)
         logger.debug(f"FCM sent: {response}")
 
     # ------------------------------------------------------------------
-    def cleanup_invalid_tokens(self) -> int:
-        logger.info("Token cleanup not implemented yet")
-        return 0
+    def cleanup_invalid_tokens(self, tokens: List[str]) -> int:
+        """Delete tokens FCM reported as unregistered or invalid. Returns the number deleted."""
+        try:
+            with get_session() as session:
+                pruned = TokenRepository(session).delete_tokens(tokens)
+            logger.info(f"Pruned {pruned} invalid FCM tokens")
+            return pruned
+        except Exception as e:
+            logger.error(f"Error pruning invalid tokens: {e}")
+            return 0
 
 
 # Global instance
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Background sender for queued push notification jobs.
+
+The notification endpoints only enqueue a row in notification_jobs and return
+its id; this worker claims queued jobs one at a time, sends them through the
+NotificationService and records progress after every FCM batch, so
+/api/notification_jobs/<id> can report how far a broadcast has got. Between
+jobs it also applies pending FCM topic subscriptions in bulk.
+
+By default each API worker process runs a sender thread (NOTIFICATION_WORKER_ENABLED=1).
+Claiming is atomic, so several senders never run the same job. To send from a
+dedicated process instead, set NOTIFICATION_WORKER_ENABLED=0 for the API and run:
+
+    python -m src.notification_worker
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Add parent directory to path for shared_models import when run standalone
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from shared_models.db import get_session
+from shared_models.repositories.notification_job_repository import NotificationJobRepository
+
+logger = logging.getLogger(__name__)
+
+# Job types accepted by the notification endpoints
+BROADCAST = 'broadcast'
+NEW_CLUSTER = 'new_cluster'
+POPULAR_CLUSTERS = 'popular_clusters'
+
+# Running jobs with no progress for this long are assumed abandoned by a dead worker
+STALE_JOB_MINUTES = 30
+
+class JobProgress:
+    """Writes a job's progress counters as the NotificationService reports them"""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+    def _add(self, **counters):
+        try:
+            with get_session() as session:
+                NotificationJobRepository(session).add_progress(self.job_id, **counters)
+        except Exception as e:
+            # Progress is informational; never fail the send over it
+            logger.warning(f"Could not record progress of notification job {self.job_id}: {e}")
+
+    def start(self, recipients: int):
+        self._add(total=recipients)
+
+    def batch_done(self, result: Dict[str, Any]):
+        self._add(success=result['success'], failure=result['failure'], batches=1)
+
+    def tokens_pruned(self, count: int):
+        self._add(pruned=count)
+
+class NotificationWorker:
+    """Claims queued notification jobs and sends them"""
+
+    def __init__(self, service, poll_interval: float = 2.0):
+        self.service = service
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_job(self, job_type: str, payload: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+        """Send one job's notifications and return the service result"""
+        if job_type == BROADCAST:
+            return self.service.send_to_all_users(payload['title'], payload['body'], payload.get('data'), progress)
+        if job_type == NEW_CLUSTER:
+            return self.service.send_new_cluster_notification(payload['cluster_id'], progress)
+        if job_type == POPULAR_CLUSTERS:
+            return self.service.send_popular_clusters_notifications(progress)
+        return {'error': f'Unknown job type: {job_type}'}
+
+    def run_once(self) -> bool:
+        """Process the next queued job. Returns False when the queue is empty."""
+        with get_session() as session:
+            job_repo = NotificationJobRepository(session)
+            job = job_repo.claim_next()
+            if job is None:
+                return False
+            job_id, job_type, payload = job.id, job.job_type, job.payload or {}
+
+        logger.info(f"Running notification job {job_id} ({job_type})")
+        try:
+            result = self.run_job(job_type, payload, JobProgress(job_id))
+            error = result.get('error')
+        except Exception as e:
+            logger.error(f"Notification job {job_id} failed: {e}")
+            result, error = None, str(e)
+
+        with get_session() as session:
+            if not NotificationJobRepository(session).finish(job_id, result, error):
+                logger.warning(f"Notification job {job_id} was already marked failed; outcome not recorded")
+                return True
+        logger.info(f"Notification job {job_id} {'failed: ' + error if error else 'done'}")
+        return True
+
+    def run_forever(self):
+        """Process jobs as they arrive, polling the queue while it is empty"""
+        while True:
+            try:
+                with get_session() as session:
+                    stale = NotificationJobRepository(session).fail_stale(STALE_JOB_MINUTES)
+                if stale:
+                    logger.warning(f"Marked {stale} abandoned notification jobs as failed")
+
+                while self.run_once():
+                    pass
+
+                # Apply topic changes from token registrations, a batch at a time
+                while self.service.sync_topic_subscriptions()['has_more']:
+                    pass
+            except Exception as e:
+                logger.error(f"Notification worker error: {e}")
+            time.sleep(self.poll_interval)
+
+    def start(self):
+        """Run the worker in a daemon thread of this process (once)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run_forever, name='notification-worker', daemon=True)
+                self._thread.start()
+
+def main():
+    from .notification_service import notification_service
+
+    parser = argparse.ArgumentParser(description='Send queued push notification jobs')
+    parser.add_argument('--once', action='store_true', help='Process the queued jobs and exit')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue checks')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    worker = NotificationWorker(notification_service, args.poll_interval)
+    if args.once:
+        while worker.run_once():
+            pass
+    else:
+        worker.run_forever()
+
+if __name__ == '__main__':
+    main()
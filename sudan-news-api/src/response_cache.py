@@ -0,0 +1,330 @@
+"""
+Response cache for the read-only API endpoints.
+
+Cached responses are keyed by the global data version (bumped by the pipeline
+when it finishes writing, see AppStateRepository), the request path and the
+query string. A pipeline run therefore invalidates every entry at once without
+any explicit purge; entries for older versions simply stop being looked up and
+age out.
+
+Two tiers:
+- an in-process LRU with a TTL, checked first;
+- an optional shared SQLite file that every gunicorn worker on the host reads
+  and writes, so a response computed by one worker is reused by the others.
+
+Each cached response also gets a strong ETag derived from its key, so clients
+revalidating with If-None-Match get a 304 without the view or the cache running.
+
+Concurrent misses for the same key in one process are collapsed: one thread
+computes the response while the others wait for it (single-flight), so a hot
+key expiring does not send every waiting request to the database.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, NamedTuple, Optional
+
+from flask import request, current_app
+
+from shared_models.snapshots import SnapshotReader, snapshot_key, iter_chunks
+from .compression import ETAG_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+# Response headers stored with a cached body
+CACHED_HEADERS = ('Content-Type', 'Cache-Control', 'X-Next-Cursor')
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    status: int
+    headers: Dict[str, str]
+    expires_at: float
+
+class SharedStore:
+    """Cache entries in a local SQLite file shared by all worker processes"""
+
+    # Delete expired rows once every this many writes
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL, status INTEGER, headers TEXT, body BLOB)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        row = self._connection().execute(
+            "SELECT body, status, headers, expires_at FROM response_cache "
+            "WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        if not row:
+            return None
+        body, status, headers, expires_at = row
+        return CachedResponse(bytes(body), status, json.loads(headers), expires_at)
+
+    def set(self, key: str, entry: CachedResponse):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, expires_at, status, headers, body) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, entry.expires_at, entry.status, json.dumps(entry.headers), entry.body)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM response_cache")
+
+class ResponseCache:
+    """Versioned LRU response cache with an optional shared store and single-flight misses"""
+
+    def __init__(self, version_loader: Callable[[], Optional[int]], max_entries: int = 512,
+                 ttl: int = 300, version_ttl: float = 5.0, shared_path: Optional[str] = None):
+        self.version_loader = version_loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> (lock, number of requests holding or waiting on it)
+        self._inflight: Dict[str, list] = {}
+        self._version = None
+        self._version_checked = 0.0
+        self._counters = {'hits': 0, 'shared_hits': 0, 'coalesced': 0, 'misses': 0, 'bypassed': 0,
+                          'not_modified': 0, 'snapshot_hits': 0}
+
+        self.shared = None
+        if shared_path:
+            try:
+                self.shared = SharedStore(shared_path)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared response cache unavailable at {shared_path}: {e}")
+
+    def current_version(self) -> Optional[int]:
+        """The data version, re-read from the database at most every version_ttl seconds"""
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= self.version_ttl:
+            try:
+                self._version = self.version_loader()
+            except Exception as e:
+                logger.warning(f"Could not read data version, bypassing response cache: {e}")
+                self._version = None
+            self._version_checked = now
+        return self._version
+
+    def make_key(self, version: int, path: str, args) -> str:
+        """Cache key for a request: data version, path and normalized query string"""
+        query = '&'.join(f'{name}={value}' for name, value in sorted(args.items(multi=True)))
+        return f'v{version}:{path}?{query}'
+
+    def _get_local(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], CachedResponse]) -> CachedResponse:
+        """Return the cached entry for key, computing it once if no one else is"""
+        entry = self._get_local(key)
+        if entry:
+            self._count('hits')
+            return entry
+
+        with self._lock:
+            slot = self._inflight.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+
+        try:
+            with slot[0]:
+                # Filled in by another request while this one waited
+                entry = self._get_local(key)
+                if entry:
+                    self._count('coalesced')
+                    return entry
+
+                if self.shared:
+                    entry = self._shared_get(key)
+                    if entry:
+                        self._count('shared_hits')
+                        self._set_local(key, entry)
+                        return entry
+
+                self._count('misses')
+                entry = compute()
+                if entry.status == 200:
+                    self._set_local(key, entry)
+                    if self.shared:
+                        self._shared_set(key, entry)
+                return entry
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._inflight[key]
+
+    def _shared_get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            return self.shared.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache read failed: {e}")
+            return None
+
+    def _shared_set(self, key: str, entry: CachedResponse):
+        try:
+            self.shared.set(key, entry)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache write failed: {e}")
+
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters for this worker process"""
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+        lookups = counters['hits'] + counters['shared_hits'] + counters['coalesced'] + counters['misses']
+        served = lookups - counters['misses']
+        return {
+            **counters,
+            'hit_ratio': round(served / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'data_version': self._version,
+            'shared_store': self.shared.path if self.shared else None
+        }
+
+    def clear(self):
+        """Drop every cached entry (both tiers)"""
+        with self._lock:
+            self._entries.clear()
+        if self.shared:
+            self.shared.clear()
+
+    def snapshot_hit(self):
+        """Record a response served from a pipeline snapshot file"""
+        self._count('snapshot_hits')
+
+    def not_modified(self):
+        """Record a conditional request answered with 304"""
+        self._count('not_modified')
+
+    def bypass(self):
+        """Record a request served without the cache (no data version available)"""
+        self._count('bypassed')
+
+def make_etag(key: str) -> str:
+    """Strong ETag for a cache key. The key already carries the data version, so
+    the tag changes exactly when the pipeline publishes new data; the body is never hashed."""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+def cached_response(cache: ResponseCache, ttl: Optional[int] = None,
+                    snapshots: Optional[SnapshotReader] = None):
+    """
+    Cache a GET view's successful responses in ``cache``, keyed on the data version.
+
+    Responses carry an ETag derived from the same key, and a matching
+    If-None-Match is answered with 304 Not Modified before the view runs.
+    ``If-None-Match: *`` gets a 304 once the response is known to be a 200.
+    With ``snapshots``, requests matching a pipeline snapshot for the current
+    data version are served from the pre-rendered file (gzip when accepted).
+    """
+    def decorator(view):
+        # Cache-Control last sent by this view, repeated on 304 responses
+        view_headers = {}
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = cache.current_version() if request.method == 'GET' else None
+            if version is None:
+                cache.bypass()
+                return view(*args, **kwargs)
+
+            key = cache.make_key(version, request.path, request.args)
+            etag = make_etag(key)
+            etags = request.if_none_match
+
+            def not_modified(candidate):
+                cache.not_modified()
+                response = current_app.response_class(status=304, headers=view_headers)
+                response.set_etag(candidate)
+                return response
+
+            # Compressed bodies are separate representations with suffixed tags
+            for candidate in [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]:
+                if etags.is_strong(candidate) or etags.is_weak(candidate):
+                    return not_modified(candidate)
+
+            if snapshots is not None:
+                gzipped = request.accept_encodings['gzip'] > 0
+                found = snapshots.get(snapshot_key(request.path, request.args), version, gzipped)
+                if found:
+                    body, headers = found
+                    if etags.star_tag:
+                        return not_modified(etag + ETAG_SUFFIXES['gzip'] if gzipped else etag)
+                    cache.snapshot_hit()
+                    response = current_app.response_class(iter_chunks(body), headers=headers,
+                                                          mimetype='application/json', direct_passthrough=True)
+                    response.content_length = len(body)
+                    if gzipped:
+                        response.headers['Content-Encoding'] = 'gzip'
+                    response.vary.add('Accept-Encoding')
+                    response.set_etag(etag + ETAG_SUFFIXES['gzip'] if gzipped else etag)
+                    return response
+
+            def compute() -> CachedResponse:
+                response = current_app.make_response(view(*args, **kwargs))
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                return CachedResponse(
+                    response.get_data(), response.status_code, headers,
+                    time.time() + (ttl or cache.ttl)
+                )
+
+            entry = cache.get_or_compute(key, compute)
+            if entry.status == 200 and 'Cache-Control' in entry.headers:
+                view_headers['Cache-Control'] = entry.headers['Cache-Control']
+            # "*" matches any current representation (RFC 9110 13.1.2), which only
+            # a 200 is; errors are sent in full
+            if etags.star_tag and entry.status == 200:
+                return not_modified(etag)
+            response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+            if entry.status == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,88 @@
+"""
+Write-coalescing buffer for /api/register_token.
+
+Apps re-register their push token on every launch, so a burst of app opens
+becomes a burst of single-row writes, each taking the SQLite write lock the
+pipeline also needs. With TOKEN_BUFFER_ENABLED=1 registrations are held in
+memory per worker process, repeats of a token are merged, and a background
+thread writes them every TOKEN_BUFFER_FLUSH_SECONDS (or as soon as
+TOKEN_BUFFER_MAX_PENDING tokens are waiting) with one upsert per batch.
+
+Registrations still pending when a worker is killed are lost. The app
+registers again on its next launch, so buffering is off by default.
+"""
+
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from shared_models.repositories.token_repository import merge_registration
+
+logger = logging.getLogger(__name__)
+
+class TokenRegistrationBuffer:
+    """Coalesces token registrations and writes them in batches from one thread per process"""
+
+    def __init__(self, writer: Callable[[List[Dict[str, Any]]], None],
+                 flush_interval: float = 2.0, max_pending: int = 500):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._condition = threading.Condition()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {'received': 0, 'written': 0, 'batches': 0, 'errors': 0}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='token-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def add(self, registration: Dict[str, Any]):
+        """Queue a registration; a pending one for the same token is merged into it"""
+        token = registration['token']
+        with self._condition:
+            self._ensure_started()
+            self._pending[token] = merge_registration(self._pending.get(token), registration)
+            self._counters['received'] += 1
+            if len(self._pending) >= self.max_pending:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._pending) >= self.max_pending, self.flush_interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every pending registration now. Returns the number written."""
+        with self._condition:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        try:
+            self.writer(list(batch.values()))
+        except Exception as e:
+            logger.error(f"Could not store {len(batch)} buffered token registrations: {e}")
+            with self._condition:
+                # Retry next flush; registrations that arrived meanwhile are newer
+                for token, registration in batch.items():
+                    self._pending[token] = merge_registration(registration, self._pending[token]) \
+                        if token in self._pending else registration
+                self._counters['errors'] += 1
+            return 0
+
+        with self._condition:
+            self._counters['written'] += len(batch)
+            self._counters['batches'] += 1
+        return len(batch)
+
+    def stats(self):
+        """Buffer counters for this worker process"""
+        with self._condition:
+            return {'pending': len(self._pending), **self._counters}
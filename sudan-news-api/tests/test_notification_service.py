@@ -0,0 +1,179 @@
+"""
+Unit tests for batched FCM delivery in NotificationService.
+
+Sends go through a fake transport, so retries, pruning decisions and
+concurrency are exercised without Firebase or a database.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from firebase_admin import messaging, exceptions
+
+import src.notification_service as notification_service_module
+from src.notification_service import NotificationService
+
+
+class FakeTransport:
+    """Answers multicasts from a per-token script of outcomes"""
+
+    name = 'fake'
+    requires_firebase = False
+
+    def __init__(self, outcomes=None, fail_requests=0, delay=0.0):
+        # token -> list of outcomes for successive sends (None = delivered);
+        # the last outcome repeats
+        self.outcomes = outcomes or {}
+        self.fail_requests = fail_requests
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.finished = 0
+        self._lock = threading.Lock()
+        self._sent = {}
+
+    def send_each_for_multicast(self, message):
+        tokens = list(getattr(message, 'fids', None) or message.tokens)
+        with self._lock:
+            self.requests.append(tokens)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = len(self.requests) <= self.fail_requests
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if fail:
+                raise exceptions.UnavailableError('FCM is down')
+            return messaging.BatchResponse([self._response(token) for token in tokens])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.finished += 1
+
+    def _response(self, token):
+        with self._lock:
+            script = self.outcomes.get(token, [None])
+            attempt = self._sent.get(token, 0)
+            self._sent[token] = attempt + 1
+        error = script[min(attempt, len(script) - 1)]
+        if error is None:
+            return messaging.SendResponse({'name': f'messages/{token}'}, None)
+        return messaging.SendResponse(None, error)
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(notification_service_module, 'FCM_RETRY_BACKOFF', 0)
+    monkeypatch.setattr(notification_service_module, 'FCM_MAX_RETRIES', 2)
+
+
+def unavailable():
+    return exceptions.UnavailableError('try again')
+
+
+def unregistered():
+    return messaging.UnregisteredError('gone')
+
+
+def invalid():
+    return exceptions.InvalidArgumentError('bad')
+
+
+class TestSendBatch:
+    """Test one multicast batch: retries and which tokens are reported invalid"""
+
+    def test_transient_errors_are_retried(self, fast_retries):
+        """Test a failed request and per-token UNAVAILABLE results are sent again"""
+        transport = FakeTransport({'b': [unavailable(), None]}, fail_requests=1)
+        result = NotificationService(transport)._send_batch(0, ['a', 'b', 'c'], 'Title', 'Body')
+
+        assert transport.requests == [['a', 'b', 'c'], ['a', 'b', 'c'], ['b']]
+        assert (result['success'], result['failure'], result['attempts']) == (3, 0, 3)
+        assert result['invalid_tokens'] == []
+
+    def test_retries_give_up(self, fast_retries):
+        """Test tokens still unavailable after FCM_MAX_RETRIES count as failures"""
+        transport = FakeTransport({'b': [unavailable()]})
+        result = NotificationService(transport)._send_batch(0, ['a', 'b'], 'Title', 'Body')
+
+        assert len(transport.requests) == 3
+        assert (result['success'], result['failure'], result['attempts']) == (1, 1, 3)
+
+    def test_dead_tokens_reported(self, fast_retries):
+        """Test UNREGISTERED and INVALID_ARGUMENT tokens are reported for pruning, not retried"""
+        transport = FakeTransport({'gone': [unregistered()], 'bad': [invalid()]})
+        result = NotificationService(transport)._send_batch(0, ['ok', 'gone', 'bad'], 'Title', 'Body')
+
+        assert len(transport.requests) == 1
+        assert (result['success'], result['failure']) == (1, 2)
+        assert result['invalid_tokens'] == ['gone', 'bad']
+
+    def test_whole_batch_rejected_not_pruned(self, fast_retries):
+        """Test a batch with every token rejected blames the message, not the tokens"""
+        transport = FakeTransport({token: [invalid()] for token in ['a', 'b', 'c']})
+        result = NotificationService(transport)._send_batch(0, ['a', 'b', 'c'], 'Title', 'Body')
+
+        assert (result['success'], result['failure']) == (0, 3)
+        assert result['invalid_tokens'] == []
+
+
+class TestSendBatches:
+    """Test concurrent delivery of many batches"""
+
+    def test_counts_progress_and_pruning(self, fast_retries, monkeypatch):
+        """Test totals, per-batch results, progress callbacks and pruning of dead tokens"""
+        monkeypatch.setattr(notification_service_module, 'FCM_BATCH_SIZE', 2)
+        transport = FakeTransport({'t1': [unregistered()], 't4': [unavailable()]})
+        service = NotificationService(transport)
+        pruned = []
+        monkeypatch.setattr(service, 'cleanup_invalid_tokens', lambda tokens: pruned.extend(tokens) or len(tokens))
+
+        class Progress:
+            def __init__(self):
+                self.total = 0
+                self.batches = []
+                self.pruned = 0
+
+            def start(self, recipients):
+                self.total += recipients
+
+            def batch_done(self, result):
+                self.batches.append(result['batch'])
+
+            def tokens_pruned(self, count):
+                self.pruned += count
+
+        progress = Progress()
+        result = service._send_multicast([f't{i}' for i in range(5)], 'Title', 'Body', progress=progress)
+
+        assert (result['success'], result['failure'], result['pruned']) == (3, 2, 1)
+        assert [b['batch'] for b in result['batches']] == [0, 1, 2]
+        assert [b['tokens'] for b in result['batches']] == [2, 2, 1]
+        assert all('invalid_tokens' not in b for b in result['batches'])
+        assert pruned == ['t1']
+        assert (progress.total, sorted(progress.batches), progress.pruned) == (5, [0, 1, 2], 1)
+
+    def test_in_flight_batches_bounded(self, monkeypatch):
+        """Test a lazy batch source is read no faster than batches complete"""
+        monkeypatch.setattr(notification_service_module, 'FCM_MAX_WORKERS', 2)
+        transport = FakeTransport(delay=0.01)
+        service = NotificationService(transport)
+        max_in_flight = 2 * 2
+        ahead = []
+
+        def batches():
+            for index in range(20):
+                ahead.append(index - transport.finished)
+                yield [f't{index}']
+
+        result = service._send_batches(batches(), 'Title', 'Body', count_recipients=True)
+
+        assert result['success'] == 20
+        assert max(ahead) <= max_in_flight
+        assert transport.max_in_flight <= 2
@@ -0,0 +1,56 @@
+"""
+Unit tests for the cached_response decorator's conditional GET handling.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.response_cache import ResponseCache, cached_response
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    cache = ResponseCache(lambda: 1)
+    calls = []
+
+    @app.route('/found')
+    @cached_response(cache)
+    def found():
+        calls.append('found')
+        return {'ok': True}
+
+    @app.route('/missing')
+    @cached_response(cache)
+    def missing():
+        return {'error': 'not found'}, 404
+
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+class TestIfNoneMatch:
+    """Test which If-None-Match headers are answered with 304"""
+
+    def test_listed_tag_matches(self, client):
+        """Test the tag a client received gets a 304 without running the view again"""
+        etag = client.get('/found').headers['ETag']
+        response = client.get('/found', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert client.calls == ['found']
+        assert client.get('/found', headers={'If-None-Match': '"other"'}).status_code == 200
+
+    def test_star_matches_current_representation(self, client):
+        """Test "*" gets a 304 for a 200 response but not for an error"""
+        response = client.get('/found', headers={'If-None-Match': '*'})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == client.get('/found').headers['ETag']
+
+        assert client.get('/missing', headers={'If-None-Match': '*'}).status_code == 404
@@ -0,0 +1,92 @@
+"""
+Unit tests for TokenRegistrationBuffer.
+
+flush is called directly with a scripted writer; the background thread is
+never started.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.token_buffer import TokenRegistrationBuffer
+
+
+class FlakyWriter:
+    """Records each batch written; raises for the first ``failures`` calls.
+
+    ``during_write`` runs inside every call, standing in for registrations
+    that arrive while a write is in progress.
+    """
+
+    def __init__(self, failures=0, during_write=None):
+        self.failures = failures
+        self.during_write = during_write
+        self.calls = 0
+        self.batches = []
+
+    def __call__(self, registrations):
+        self.calls += 1
+        if self.during_write:
+            self.during_write()
+            self.during_write = None
+        if self.calls <= self.failures:
+            raise RuntimeError('database is locked')
+        self.batches.append(registrations)
+
+
+def registration(token, **fields):
+    return {'device_id': f'device-{token}', 'token': token, 'platform': 'android', **fields}
+
+
+@pytest.fixture
+def make_buffer(monkeypatch):
+    def make(writer):
+        buffer = TokenRegistrationBuffer(writer, flush_interval=3600)
+        monkeypatch.setattr(buffer, '_ensure_started', lambda: None)
+        return buffer
+    return make
+
+
+class TestFlush:
+    """Test batched writes and what happens to a batch the writer rejects"""
+
+    def test_repeats_merged_into_one_write(self, make_buffer):
+        """Test repeated registrations of a token are written once, keeping earlier choices"""
+        writer = FlakyWriter()
+        buffer = make_buffer(writer)
+        buffer.add(registration('a', topics=['sports']))
+        buffer.add(registration('b'))
+        buffer.add(registration('a', cities=['Khartoum']))
+
+        assert buffer.flush() == 2
+        assert buffer.flush() == 0
+        assert writer.batches == [[registration('a', topics=['sports'], cities=['Khartoum']), registration('b')]]
+        assert buffer.stats() == {'pending': 0, 'received': 3, 'written': 2, 'batches': 1, 'errors': 0}
+
+    def test_failed_write_requeued_and_merged(self, make_buffer):
+        """Test a rejected batch is retried, with registrations that arrived during the write winning"""
+        buffer = None
+
+        def arrive():
+            buffer.add(registration('a', platform='ios', topics=['economy']))
+            buffer.add(registration('c'))
+
+        writer = FlakyWriter(failures=1, during_write=arrive)
+        buffer = make_buffer(writer)
+        buffer.add(registration('a', topics=['sports'], cities=['Khartoum']))
+        buffer.add(registration('b', topics=['politics']))
+
+        assert buffer.flush() == 0
+        assert buffer.stats() == {'pending': 3, 'received': 4, 'written': 0, 'batches': 0, 'errors': 1}
+
+        assert buffer.flush() == 3
+        written = {r['token']: r for r in writer.batches[0]}
+        assert written == {
+            'a': registration('a', platform='ios', topics=['economy'], cities=['Khartoum']),
+            'b': registration('b', topics=['politics']),
+            'c': registration('c'),
+        }
+        assert buffer.stats() == {'pending': 0, 'received': 4, 'written': 3, 'batches': 1, 'errors': 1}
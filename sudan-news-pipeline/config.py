@@ -38,6 +38,16 @@ BATCH_SIZE = int(os.getenv('BATCH_SIZE', '10'))
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
 REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '15'))
 
+# Snapshot Settings (pre-rendered API responses, see shared_models/snapshots.py)
+SNAPSHOT_CITY_LIMIT = int(os.getenv('SNAPSHOT_CITY_LIMIT', '50'))
+
+# Event Stream Settings (cluster_events change log served by the API's /api/stream)
+EVENT_RETENTION_DAYS = int(os.getenv('EVENT_RETENTION_DAYS', '7'))
+
+# Push Token Settings (age-based cleanup of tokens the app stopped refreshing)
+TOKEN_MAX_AGE_DAYS = int(os.getenv('TOKEN_MAX_AGE_DAYS', '90'))
+TOKEN_CLEANUP_INTERVAL_HOURS = int(os.getenv('TOKEN_CLEANUP_INTERVAL_HOURS', '24'))
+
 # RSS Feed URLs
 FEEDS = [
     {"url": "https://sudanile.com/feed/", "source": "https://sudanile.com/"},
@@ -23,21 +23,10 @@ from shared_models.repositories.source_repository import SourceRepository
 from shared_models.repositories.article_repository import ArticleRepository
 from shared_models.repositories.entity_repository import EntityRepository
 from shared_models.timezone_utils import to_app_timezone
+from shared_models.text_utils import normalize_arabic  # Same folding as the search index
 
 logger = logging.getLogger(__name__)
 
-def normalize_arabic(text):
-    """Normalize Arabic text by removing diacritics and standardizing characters."""
-    # Remove diacritics (Tashkeel)
-    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
-    # Convert أ,إ,آ to ا
-    text = re.sub(r'[أإآ]', 'ا', text)
-    # Convert ة to ه
-    text = re.sub(r'ة', 'ه', text)
-    # Convert ى to ي
-    text = re.sub(r'ى', 'ي', text)
-    return text
-
 def parse_feed(feed_url, source_name):
     """
     Fetches and parses an XML feed from a given URL.
@@ -1,4 +1,5 @@
 import json
+import itertools
 import os
 import re
 import platform
@@ -171,25 +172,14 @@ def main():
         article_repo = ArticleRepository(session)
         cluster_repo = ClusterRepository(session)
 
-        # Get recent unclustered articles using repository
+        # Stream recent unclustered articles using repository
         articles_raw = article_repo.get_recent_unclustered(hours=168)  # Last 7 days
 
-        if not articles_raw:
+        first_article = next(articles_raw, None)
+        if first_article is None:
             print("No unclustered articles found in database. Exiting.")
             return
-
-        # Convert Article objects to dictionaries for processing
-        articles_list = []
-        for article in articles_raw:
-            articles_list.append({
-                'id': article.id,
-                'source': article.source.url if article.source else '',
-                'headline': article.headline,
-                'description': article.description or '',
-                'published_at': article.published_at,
-                'article_url': article.article_url,
-                'image_url': article.image_url
-            })
+        articles_list = itertools.chain([first_article], articles_raw)
 
         # 1. Pre-process articles (generate embeddings, parse dates)
         print("Step 1: Pre-processing articles and generating embeddings...")
@@ -234,6 +224,7 @@ def main():
             # Calculate and update blindspot metrics
             session.flush()  # Ensure articles are linked before calculation
             cluster_repo.update_cluster_blindspot(cluster.id)
+            cluster_repo.refresh_cluster_card(cluster.id)
 
         session.commit()
         print(f"Clustering complete. Saved {len(clustered_events)} clusters to database.")
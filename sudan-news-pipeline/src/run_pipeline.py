@@ -8,6 +8,7 @@ Command-line interface for running the news aggregation and clustering pipeline.
 import os
 import sys
 import json
+import itertools
 import logging
 import time
 from pathlib import Path
@@ -29,7 +30,14 @@ from shared_models.repositories.article_repository import ArticleRepository
 from shared_models.repositories.cluster_repository import ClusterRepository
 from shared_models.repositories.source_repository import SourceRepository
 from shared_models.repositories.entity_repository import EntityRepository
+from shared_models.repositories.search_repository import SearchRepository
+from shared_models.repositories.app_state_repository import AppStateRepository, TOKENS_CLEANUP_TS
+from shared_models.repositories.token_repository import TokenRepository
+from shared_models.repositories.event_repository import EventRepository, CLUSTER_CREATED, TRENDING_CHANGED
 from shared_models.models import Cluster
+from shared_models.cluster_feed import CATEGORIES, build_cluster_feed
+from shared_models.snapshots import SnapshotWriter, get_snapshot_dir, snapshot_key
+from shared_models.timezone_utils import now, to_epoch
 
 import config
 from .aggregator import parse_feed, is_sudan_related, normalize_arabic
@@ -154,35 +162,24 @@ def cluster_news():
     with get_session() as session:
         article_repo = ArticleRepository(session)
         cluster_repo = ClusterRepository(session)
+        event_repo = EventRepository(session)
 
-        # Get unclustered articles
+        # Stream unclustered articles from the last 24 hours straight into preprocessing
         unclustered_articles = article_repo.get_recent_unclustered(hours=24)
 
-        if not unclustered_articles:
+        first_article = next(unclustered_articles, None)
+        if first_article is None:
             logger.info("No unclustered articles found")
             return
 
-        logger.info(f"Processing {len(unclustered_articles)} unclustered articles")
-
-        # Convert to format expected by clustering
-        articles_raw = []
-        for article in unclustered_articles:
-            articles_raw.append({
-                'id': article.id,
-                'source': article.source.url if article.source else '',
-                'headline': article.headline,
-                'description': article.description,
-                'published_at': article.published_at,
-                'article_url': article.article_url,
-                'image_url': article.image_url
-            })
-
         # Preprocess and cluster
-        processed_articles = preprocess_articles(articles_raw)
+        processed_articles = preprocess_articles(itertools.chain([first_article], unclustered_articles))
         if not processed_articles:
             logger.warning("No processable articles after preprocessing")
             return
 
+        logger.info(f"Processing {len(processed_articles)} unclustered articles")
+
         clustered_events = cluster_articles(processed_articles)
 
         # Save clusters to database
@@ -205,6 +202,17 @@ def cluster_news():
             session.flush()
             cluster_repo.update_cluster_blindspot(db_cluster.id)
 
+            # Refresh the denormalized list-view card
+            cluster_repo.refresh_cluster_card(db_cluster.id)
+
+            # Streamed to /api/stream clients once committed
+            event_repo.publish(CLUSTER_CREATED, db_cluster.id, {
+                'cluster_id': db_cluster.id,
+                'title': db_cluster.title,
+                'published_at': db_cluster.published_at,
+                'number_of_sources': db_cluster.number_of_sources
+            })
+
         session.commit()
         logger.info(f"Clustering complete: {len(clustered_events)} clusters created")
 
@@ -214,24 +222,129 @@ def update_trending():
     
     with get_session() as session:
         cluster_repo = ClusterRepository(session)
+        event_repo = EventRepository(session)
         
         # Get recent clusters to check for trending status (last 48 hours)
-        # FIXED: Imported datetime to resolve NameError on 'now()'
-        from datetime import datetime, timedelta
+        from datetime import timedelta
         
-        cutoff = datetime.now() - timedelta(hours=48)
+        cutoff_ts = to_epoch(now() - timedelta(hours=48))
         
         recent_clusters = session.query(Cluster).filter(
-            Cluster.published_at >= cutoff.isoformat()
+            Cluster.published_ts >= cutoff_ts
         ).all()
         
         count = 0
+        changed = 0
         for cluster in recent_clusters:
+            was_trending = bool(cluster.is_trending)
             if cluster_repo.calculate_trending(cluster.id):
                 count += 1
-        
+                if bool(cluster.is_trending) != was_trending:
+                    event_repo.publish(TRENDING_CHANGED, cluster.id, {
+                        'cluster_id': cluster.id,
+                        'title': cluster.title,
+                        'is_trending': bool(cluster.is_trending),
+                        'coverage_velocity': cluster.coverage_velocity
+                    })
+                    changed += 1
+
+        # Streams only replay recent history on reconnect
+        pruned = event_repo.prune(config.EVENT_RETENTION_DAYS)
+
+        session.commit()
+        logger.info(f"Trending updates complete. Checked {len(recent_clusters)} clusters, "
+                    f"{changed} changed trending status, {pruned} old events pruned.")
+
+def refresh_cluster_cards(batch_size: int = 200):
+    """Rebuild the denormalized cluster cards for every cluster (backfill/repair)"""
+    logger.info("Refreshing cluster cards...")
+
+    with get_session() as session:
+        cluster_repo = ClusterRepository(session)
+
+        last_id = 0
+        refreshed = 0
+        while True:
+            cluster_ids = [row.id for row in session.query(Cluster.id).filter(
+                Cluster.id > last_id
+            ).order_by(Cluster.id).limit(batch_size).all()]
+            if not cluster_ids:
+                break
+
+            for cluster_id in cluster_ids:
+                if cluster_repo.refresh_cluster_card(cluster_id):
+                    refreshed += 1
+
+            session.commit()
+            last_id = cluster_ids[-1]
+
+        logger.info(f"Cluster card refresh complete: {refreshed} cards written")
+
+def delete_clusters(cluster_ids):
+    """Remove clusters, leaving tombstones so delta-sync clients drop them too"""
+    with get_session() as session:
+        cluster_repo = ClusterRepository(session)
+        deleted = [cluster_id for cluster_id in cluster_ids if cluster_repo.delete_cluster(cluster_id)]
+        session.commit()
+
+    logger.info(f"Deleted {len(deleted)} of {len(cluster_ids)} clusters: {deleted}")
+
+def rebuild_search_index():
+    """Rebuild the full-text search tables from all clusters and articles"""
+    logger.info("Rebuilding search index...")
+
+    with get_session() as session:
+        counts = SearchRepository(session).rebuild()
+
+    logger.info(f"Search index rebuilt: {counts['clusters']} clusters, {counts['articles']} articles")
+
+def cleanup_expired_tokens(force: bool = False):
+    """Delete push tokens not refreshed for TOKEN_MAX_AGE_DAYS, at most once per TOKEN_CLEANUP_INTERVAL_HOURS"""
+    with get_session() as session:
+        if not force:
+            last_run = AppStateRepository(session).get(TOKENS_CLEANUP_TS)
+            if time.time() - last_run < config.TOKEN_CLEANUP_INTERVAL_HOURS * 3600:
+                return
+        deleted = TokenRepository(session).cleanup_expired_tokens(config.TOKEN_MAX_AGE_DAYS)
+
+    logger.info(f"Token cleanup complete: {deleted} tokens older than {config.TOKEN_MAX_AGE_DAYS} days deleted")
+
+def bump_data_version():
+    """Mark served data as changed so API response caches drop their entries"""
+    with get_session() as session:
+        version = AppStateRepository(session).bump_data_version()
         session.commit()
-        logger.info(f"Trending updates complete. Checked {len(recent_clusters)} clusters.")
+
+    logger.info(f"Data version bumped to {version}")
+
+def publish_snapshots():
+    """Render the hottest API responses to versioned, pre-compressed JSON files for the API to serve"""
+    logger.info("Publishing API snapshots...")
+
+    try:
+        with get_session() as session:
+            cluster_repo = ClusterRepository(session)
+            version = AppStateRepository(session).get_data_version()
+            writer = SnapshotWriter(get_snapshot_dir(), version)
+
+            # First page of the feed: unfiltered, per category and per most mentioned city
+            cities = EntityRepository(session).get_top_values('cities', config.SNAPSHOT_CITY_LIMIT)
+            variants = [{}] + [{'category': category} for category in CATEGORIES] + [{'city': city} for city in cities]
+            for args in variants:
+                items, next_cursor = build_cluster_feed(cluster_repo, **args)
+                headers = {'Cache-Control': 'max-age=300'}
+                if next_cursor:
+                    headers['X-Next-Cursor'] = next_cursor
+                writer.add(snapshot_key('/api/clusters', args), items, headers)
+
+            writer.add('/api/cities', cluster_repo.get_all_cities(), {'Cache-Control': 'max-age=3600'})
+            writer.add('/api/categories', CATEGORIES, {'Cache-Control': 'max-age=3600'})
+
+        writer.publish()
+        logger.info(f"Published {len(writer.entries)} snapshots for data version {version}")
+    except OSError as e:
+        # The API falls back to live queries without snapshots
+        logger.warning(f"Failed to publish snapshots: {e}")
 
 def send_pipeline_completion_notification():
     """Send notification about successful pipeline completion via API"""
@@ -259,9 +372,9 @@ def send_pipeline_completion_notification():
             timeout=10
         )
 
-        if response.status_code == 200:
+        if response.ok:
             result = response.json()
-            logger.info(f"Pipeline completion notification sent: {result}")
+            logger.info(f"Pipeline completion notification queued as job {result.get('job_id')}")
         else:
             logger.warning(f"Failed to send notification: HTTP {response.status_code} - {response.text}")
 
@@ -283,13 +396,9 @@ def send_popular_clusters_notification():
             timeout=10
         )
 
-        if response.status_code == 200:
+        if response.ok:
             result = response.json()
-            total_clusters = result.get('total_clusters', 0)
-            if total_clusters > 0:
-                logger.info(f"Popular clusters notifications sent for {total_clusters} clusters")
-            else:
-                logger.info("No popular clusters found for notification")
+            logger.info(f"Popular clusters notifications queued as job {result.get('job_id')}")
         else:
             logger.warning(f"Failed to send popular clusters notification: HTTP {response.status_code} - {response.text}")
 
@@ -305,6 +414,9 @@ def run_full_pipeline():
             aggregate_news()
             cluster_news()
             update_trending()
+            bump_data_version()
+            publish_snapshots()
+            cleanup_expired_tokens()
             send_pipeline_completion_notification()
             send_popular_clusters_notification()
             logger.info("Full pipeline run completed successfully")
@@ -322,6 +434,8 @@ def backfill_news(days):
             # This is a simplified version - in production you'd want more sophisticated backfill logic
             aggregate_news()
             cluster_news()
+            bump_data_version()
+            publish_snapshots()
             logger.info(f"Backfill for {days} days completed")
     except RuntimeError as e:
         logger.error(f"Backfill failed: {e}")
@@ -342,6 +456,22 @@ def main():
     # cluster-only command
     subparsers.add_parser('cluster-only', help='Run only event clustering')
 
+    # refresh-cards command
+    subparsers.add_parser('refresh-cards', help='Rebuild denormalized cluster cards for all clusters')
+
+    # publish-snapshots command
+    subparsers.add_parser('publish-snapshots', help='Render API snapshot files for the current data version')
+
+    # rebuild-search-index command
+    subparsers.add_parser('rebuild-search-index', help='Rebuild the full-text search index')
+
+    # delete-clusters command
+    delete_parser = subparsers.add_parser('delete-clusters', help='Delete clusters by id')
+    delete_parser.add_argument('cluster_ids', type=int, nargs='+', help='Ids of the clusters to delete')
+
+    # cleanup-tokens command
+    subparsers.add_parser('cleanup-tokens', help='Delete push tokens not refreshed within TOKEN_MAX_AGE_DAYS')
+
     # backfill command
     backfill_parser = subparsers.add_parser('backfill', help='Backfill news from last N days')
     backfill_parser.add_argument('--days', type=int, default=7, help='Number of days to backfill')
@@ -358,6 +488,8 @@ def main():
         try:
             with pipeline_lock():
                 aggregate_news()
+                bump_data_version()
+                publish_snapshots()
         except RuntimeError as e:
             logger.error(f"Aggregation failed: {e}")
             sys.exit(1)
@@ -365,9 +497,42 @@ def main():
         try:
             with pipeline_lock():
                 cluster_news()
+                bump_data_version()
+                publish_snapshots()
         except RuntimeError as e:
             logger.error(f"Clustering failed: {e}")
             sys.exit(1)
+    elif args.command == 'refresh-cards':
+        try:
+            with pipeline_lock():
+                refresh_cluster_cards()
+                bump_data_version()
+                publish_snapshots()
+        except RuntimeError as e:
+            logger.error(f"Card refresh failed: {e}")
+            sys.exit(1)
+    elif args.command == 'rebuild-search-index':
+        try:
+            with pipeline_lock():
+                rebuild_search_index()
+                bump_data_version()
+                publish_snapshots()
+        except RuntimeError as e:
+            logger.error(f"Search index rebuild failed: {e}")
+            sys.exit(1)
+    elif args.command == 'delete-clusters':
+        try:
+            with pipeline_lock():
+                delete_clusters(args.cluster_ids)
+                bump_data_version()
+                publish_snapshots()
+        except RuntimeError as e:
+            logger.error(f"Cluster deletion failed: {e}")
+            sys.exit(1)
+    elif args.command == 'cleanup-tokens':
+        cleanup_expired_tokens(force=True)
+    elif args.command == 'publish-snapshots':
+        publish_snapshots()
     elif args.command == 'backfill':
         backfill_news(args.days)
 